@@ -0,0 +1,150 @@
+# auger.py - Auger drive with stall detection and jam recovery
+#
+# Each auger motor is switched by one active-low pin (off() runs it). Run
+# for a fixed time without feedback, a jammed auger dispensed nothing and
+# the portion was booked anyway. Auger.run() watches a sensor while the
+# motor turns:
+#
+#   PlateFlow     the plate scale; stalled when the weight has not risen by
+#                 MIN_RISE_DG for stall_ms. The run also ends once the
+#                 target weight is on the plate, and the grams are reported.
+#   MotorCurrent  an ADC on a current shunt; stalled when the reading stays
+#                 above the limit for stall_ms.
+#
+# A stall stops the motor for a recovery: PULSES short backward/forward
+# pulses through the H-bridge direction pin if one is fitted, otherwise
+# stop/start pulses. After more than `attempts` stalls the run ends as
+# JAMMED. Time without flow does not count against the portion time.
+# Without a sensor the auger simply runs for the time, as before.
+
+import time
+
+OK = "ok"
+RECOVERED = "recovered"
+JAMMED = "jammed"
+UNMONITORED = "unmonitored"
+
+MIN_RISE_DG = 5          # 0.5 g more on the plate counts as flowing
+FIRST_FLOW_MS = 1000     # pellets need this long from a (re)started auger to the plate
+PULSE_MS = 150
+PULSES = 3               # per recovery
+POLL_MS = 20             # between samples; an HX711 read itself waits ~100 ms for a conversion
+
+
+class PlateFlow:
+    def __init__(self, hx):
+        self.hx = hx
+        self.dg = 0
+        self.start_dg = 0
+        self._ref_dg = 0
+        self._ref_ms = 0        # last rise (or restart + FIRST_FLOW_MS)
+        self._flow_ms = 0       # last rise (or restart)
+
+    def start(self, now):
+        self.start_dg = self.dg = self.hx.read_dg()
+        self.restart(now)
+
+    def restart(self, now):
+        self._ref_dg = self.dg
+        self._flow_ms = now
+        self._ref_ms = time.ticks_add(now, FIRST_FLOW_MS)
+
+    def stalled(self, now, stall_ms):
+        self.dg = self.hx.read_dg()
+        if self.dg - self._ref_dg >= MIN_RISE_DG:
+            self._ref_dg = self.dg
+            self._ref_ms = self._flow_ms = now
+            return False
+        return time.ticks_diff(now, self._ref_ms) >= stall_ms
+
+    def idle_ms(self, now):
+        return time.ticks_diff(now, self._flow_ms)
+
+    def dispensed_dg(self):
+        return self.dg - self.start_dg
+
+
+class MotorCurrent:
+    def __init__(self, adc, limit):
+        self.adc = adc
+        self.limit = limit
+        self._over_since = None
+
+    def start(self, now):
+        self._over_since = None
+
+    restart = start
+
+    def stalled(self, now, stall_ms):
+        if self.adc.read_u16() < self.limit:
+            self._over_since = None
+            return False
+        if self._over_since is None:
+            self._over_since = now
+        return time.ticks_diff(now, self._over_since) >= stall_ms
+
+    def idle_ms(self, now):
+        return time.ticks_diff(now, self._over_since)
+
+    def dispensed_dg(self):
+        return None
+
+
+class Auger:
+    def __init__(self, motor, reverse=None):
+        self.motor = motor
+        self.reverse = reverse      # direction pin, 1 = backwards; None if the motor cannot reverse
+
+    def _unjam(self):
+        for _ in range(PULSES):
+            self.motor.on()
+            if self.reverse is None:
+                time.sleep_ms(PULSE_MS)
+            else:
+                self.reverse(1)
+                self.motor.off()
+                time.sleep_ms(PULSE_MS)
+                self.motor.on()
+                self.reverse(0)
+            self.motor.off()
+            time.sleep_ms(PULSE_MS)
+
+    def run(self, seconds, sensor=None, target_dg=0, stall_ms=400, attempts=3):
+        """Dispenses for `seconds` of flow, or until target_dg is on the plate (PlateFlow).
+
+        Returns (outcome, ms of flow, dg dispensed or None, stalls).
+        """
+        if self.reverse is not None:
+            self.reverse(0)
+        if sensor is None:
+            self.motor.off()
+            time.sleep(seconds)
+            self.motor.on()
+            return UNMONITORED, int(seconds * 1000), None, 0
+        budget = int(seconds * 1000)
+        flowed = stalls = 0
+        outcome = OK
+        last = time.ticks_ms()
+        sensor.start(last)
+        self.motor.off()
+        try:
+            while flowed < budget:
+                time.sleep_ms(POLL_MS)
+                now = time.ticks_ms()
+                flowed += time.ticks_diff(now, last)
+                last = now
+                if sensor.stalled(now, stall_ms):
+                    stalls += 1
+                    flowed = max(0, flowed - sensor.idle_ms(now))
+                    if stalls > attempts:
+                        outcome = JAMMED
+                        break
+                    outcome = RECOVERED
+                    self._unjam()
+                    last = time.ticks_ms()
+                    sensor.restart(last)
+                elif target_dg and sensor.dispensed_dg() >= target_dg:
+                    break
+        finally:
+            self.motor.on()
+        return outcome, flowed, sensor.dispensed_dg(), stalls
@@ -0,0 +1,65 @@
+# bodyweight.py - Stable body weight from the entry scale samples of one visit
+
+from array import array
+
+
+class PlateauDetector:
+    """Finds the steadiest stretch of entry scale readings while the cat is inside.
+
+    Every reading goes through ``add()`` in decigrams (integer, as returned
+    by ``HX711.read_dg()``). Once ``samples`` consecutive readings above
+    ``min_grams`` stay within ``tolerance`` (grams, or ``relative_pct``
+    percent of the weight if larger) of each other, their mean is a
+    candidate; the candidate with the smallest spread wins. Stepping on/off,
+    turning around or leaning on the door shows up as a wider spread and
+    loses. All arithmetic is on small ints and the ring buffer is allocated
+    once, so sampling does not allocate.
+    """
+
+    def __init__(self, samples=3, min_grams=500, tolerance=30, relative_pct=2):
+        self.samples = samples
+        self.min_dg = min_grams * 10
+        self.tolerance_dg = tolerance * 10
+        self.relative_pct = relative_pct
+        self._ring = array("i", [0] * samples)
+        self.reset()
+
+    def reset(self):
+        """Starts a new visit."""
+        self._count = 0
+        self._pos = 0
+        self.best_dg = -1
+        self.best_spread = -1
+
+    def add(self, dg):
+        if dg < self.min_dg:
+            self._count = 0  # off the scale, the plateau is broken
+            return
+        self._ring[self._pos] = dg
+        self._pos = (self._pos + 1) % self.samples
+        if self._count < self.samples:
+            self._count += 1
+            if self._count < self.samples:
+                return
+        ring = self._ring
+        low = high = total = ring[0]
+        for i in range(1, self.samples):
+            v = ring[i]
+            total += v
+            if v < low:
+                low = v
+            elif v > high:
+                high = v
+        mean = total // self.samples
+        spread = high - low
+        if spread > self.tolerance_dg and spread * 100 > mean * self.relative_pct:
+            return
+        if self.best_spread < 0 or spread <= self.best_spread:
+            self.best_dg = mean
+            self.best_spread = spread
+
+    def estimate(self):
+        """Body weight in grams for this visit, or None if the cat never stood still."""
+        if self.best_dg < 0:
+            return None
+        return self.best_dg / 10
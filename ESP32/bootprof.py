@@ -0,0 +1,80 @@
+# bootprof.py - Import time and heap profile of the feeder boot
+#
+# install() wraps builtins.__import__, so every module loaded for the first
+# time afterwards is timed, including the ones it imports itself. report()
+# prints, per module, the time and heap spent in the module's own import
+# (children excluded) and in total, slowest first. A source module is
+# compiled on the device at this point; a precompiled .mpy (build.py mpy)
+# or frozen module skips that, which is what the numbers are for comparing.
+#
+#     import bootprof
+#     bootprof.install()
+#     import wifi, petfooddispenser
+#     bootprof.mark("imports done")
+#     bootprof.report()
+
+import builtins
+import gc
+import sys
+import time
+
+_original = None
+_stack = []       # [child us, child bytes] per import in progress
+_results = []     # [name, self us, self bytes, total us, total bytes, frozen/mpy/py]
+_marks = []       # [label, ms since reset, heap allocated]
+
+
+def _kind(module):
+    path = getattr(module, "__file__", None)
+    if path is None:
+        return "frozen"
+    return "mpy" if path.endswith(".mpy") else "py"
+
+
+def _import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original(name, globals, locals, fromlist, level)
+    _stack.append([0, 0])
+    start = time.ticks_us()
+    heap = gc.mem_alloc()
+    try:
+        module = _original(name, globals, locals, fromlist, level)
+    finally:
+        us = time.ticks_diff(time.ticks_us(), start)
+        used = gc.mem_alloc() - heap  # negative if a collection ran meanwhile
+        child_us, child_bytes = _stack.pop()
+        if _stack:
+            _stack[-1][0] += us
+            _stack[-1][1] += used
+    _results.append([name, us - child_us, used - child_bytes, us, used, _kind(module)])
+    return module
+
+
+def install():
+    global _original
+    if _original is None:
+        _original = builtins.__import__
+        builtins.__import__ = _import
+    mark("profiler installed")
+
+
+def uninstall():
+    global _original
+    if _original is not None:
+        builtins.__import__ = _original
+        _original = None
+
+
+def mark(label):
+    """Records a boot milestone (ms since reset)."""
+    _marks.append([label, time.ticks_ms(), gc.mem_alloc()])
+
+
+def report():
+    print("module               kind     self ms   self KB   total ms  total KB")
+    for name, self_us, self_bytes, us, used, kind in sorted(_results, key=lambda r: -r[1]):
+        print("%-20s %-6s %9.1f %9.1f %9.1f %9.1f" % (
+            name, kind, self_us / 1000, self_bytes / 1024, us / 1000, used / 1024))
+    for label, ms, heap in _marks:
+        print("%-30s at %6d ms, %6.1f KB allocated" % (label, ms, heap / 1024))
+    print("free heap: %.1f KB" % (gc.mem_free() / 1024))
@@ -0,0 +1,90 @@
+"""Host-side build steps for the files uploaded to the ESP32 (runs on CPython).
+
+    python build.py assets    # writes index.html.gz next to index.html
+    python build.py mpy       # precompiles the firmware modules to build/*.mpy
+
+The config portal in wifi.py serves "<file>.gz" with Content-Encoding: gzip
+whenever the browser accepts it, so upload the .gz files together with the
+originals.
+
+MicroPython compiles every imported .py on each boot, which costs time and
+heap. The mpy step runs mpy-cross (``pip install mpy-cross``, matching the
+MicroPython version on the feeder) over FIRMWARE_MODULES and also writes
+build/manifest.py to freeze the same modules into a custom firmware image.
+Upload the .mpy files and remove the .py copies from the device; MicroPython
+prefers a .py of the same name. main.py stays source, it is run, not imported.
+"""
+import argparse
+import gzip
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BUILD_DIR = os.path.join(HERE, "build")
+MARCH = "rv32imc"  # ESP32-C6; hx711 has @micropython.native code
+
+# Text assets served by the config portal; images are already compressed.
+PORTAL_ASSETS = ["index.html"]
+
+# Everything main.py imports, directly or through petfooddispenser
+FIRMWARE_MODULES = [
+    "ota", "bootprof", "wifi", "log", "devconfig", "devproto", "sign", "bodyweight", "connectivity", "push",
+    "mfrc522", "hcsr04", "hx711", "auger", "petfooddispenser",
+]
+
+
+def gzip_assets(names=PORTAL_ASSETS):
+    for name in names:
+        path = os.path.join(HERE, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(path + ".gz", "wb") as f:
+            f.write(packed)
+        print("%-20s %6d -> %6d bytes" % (name, len(data), len(packed)))
+
+
+def _mpy_cross():
+    if importlib.util.find_spec("mpy_cross") is not None:
+        return [sys.executable, "-m", "mpy_cross"]
+    if shutil.which("mpy-cross"):
+        return ["mpy-cross"]
+    sys.exit("mpy-cross not found: pip install mpy-cross (same version as the feeder's MicroPython)")
+
+
+def compile_mpy(names=FIRMWARE_MODULES, opt=0, march=MARCH):
+    """Cross-compiles the modules to build/<name>.mpy and writes build/manifest.py."""
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    cmd = _mpy_cross()
+    extra = ["-O%d" % opt, "-march=" + march]
+    for name in names:
+        src = os.path.join(HERE, name + ".py")
+        out = os.path.join(BUILD_DIR, name + ".mpy")
+        subprocess.run(cmd + extra + ["-o", out, src], check=True)
+        print("%-20s %6d -> %6d bytes" % (name + ".py", os.path.getsize(src), os.path.getsize(out)))
+    with open(os.path.join(BUILD_DIR, "manifest.py"), "w") as f:
+        f.write("# Freeze the feeder modules: make BOARD=ESP32_GENERIC_C6 FROZEN_MANIFEST=<this file>\n")
+        f.write('include("$(PORT_DIR)/boards/manifest.py")\n')
+        for name in names:
+            f.write('module("%s.py", base_path="%s")\n' % (name, HERE.replace("\\", "/")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("step", choices=["assets", "mpy"])
+    parser.add_argument("-O", dest="opt", type=int, default=0,
+                        help="mpy-cross optimisation level (1+ drops asserts, 3 drops line numbers)")
+    parser.add_argument("--march", default=MARCH, help="native code target for @micropython.native functions")
+    args = parser.parse_args(argv)
+    if args.step == "assets":
+        gzip_assets()
+    elif args.step == "mpy":
+        compile_mpy(opt=args.opt, march=args.march)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# connectivity.py - Background Wi-Fi / backend health supervisor for the feeder
+
+import _thread
+import log
+import random
+import sign
+import time
+import urequests
+import wifi
+
+
+class Supervisor:
+    """Keeps a cached view of Wi-Fi and backend health.
+
+    A background thread probes /backend/health every ``interval`` seconds
+    while healthy and backs off exponentially (with jitter) while not,
+    reconnecting Wi-Fi when the link is gone. The feeding loop only reads
+    ``backend_ok`` and never waits on the network itself.
+    """
+
+    def __init__(self, api_base, interval=15, min_backoff=1, max_backoff=60, probe_timeout=3):
+        self.health_url = f"{api_base}/backend/health"
+        self.interval = interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self.wifi_ok = False
+        self.backend_ok = False
+        self.failures = 0
+        self.next_probe = time.ticks_ms()
+        self.running = False
+
+    def delay(self):
+        """Seconds until the next probe."""
+        if not self.failures:
+            return self.interval
+        cap = min(self.max_backoff, self.min_backoff * (1 << min(self.failures - 1, 16)))
+        # "Equal jitter": half fixed, half random, so feeders don't retry in lockstep
+        return cap / 2 + random.random() * cap / 2
+
+    def probe(self):
+        """Runs one blocking health check and updates the cached state."""
+        if not wifi.is_connected():
+            self.wifi_ok = False
+            self.backend_ok = False
+            log.info("WiFi down, reconnecting...")
+            if not wifi.reconnect_wifi():
+                self.failures += 1
+                return False
+        self.wifi_ok = True
+
+        ok = False
+        try:
+            resp = urequests.get(self.health_url, timeout=self.probe_timeout)
+            ok = resp.status_code == 200
+            if ok:
+                # The backend's clock, for signed request timestamps (older backends send none)
+                server_time = resp.json().get("time")
+                if server_time:
+                    sign.sync_time(server_time)
+            resp.close()
+        except Exception as e:
+            log.error("Health probe failed: %s", e)
+
+        if ok:
+            if not self.backend_ok:
+                log.info("Backend reachable")
+            self.failures = 0
+        else:
+            self.failures += 1
+            wifi.forget_lease()
+        self.backend_ok = ok
+        return ok
+
+    def report_failure(self):
+        """Called by the feeding path after a failed request: mark down, probe soon."""
+        self.backend_ok = False
+        wifi.forget_lease()
+        self.next_probe = time.ticks_ms()
+
+    def _run(self):
+        while self.running:
+            if time.ticks_diff(time.ticks_ms(), self.next_probe) >= 0:
+                self.probe()
+                self.next_probe = time.ticks_add(time.ticks_ms(), int(self.delay() * 1000))
+            time.sleep_ms(100)
+
+    def start(self):
+        """Starts the probe thread; the first probe follows the current delay."""
+        if self.running:
+            return
+        self.running = True
+        self.next_probe = time.ticks_add(time.ticks_ms(), int(self.delay() * 1000))
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,177 @@
+# devconfig.py - The feeder's settings, from the backend and cached in flash
+#
+# The backend keeps a typed config document per feeder (backend/device_config.py,
+# GET /device/config). The last one received is kept in CONFIG_FILE together
+# with its ETag, so the feeder starts with its own settings while the backend
+# is down; DEFAULTS fill in whatever is missing (first boot). fetch() sends the
+# cached ETag, so checking an unchanged config costs a 304 and no parsing.
+# With a device key, a new document is only taken if the backend signed it
+# for this feeder, the ETag sent and now (sign.check), like a firmware plan.
+#
+# petfooddispenser builds its hardware from the pins, apiBase and plateScale
+# when it is imported; needs_restart() tells whether a new document changed
+# any of those. All other settings are taken over between two feeding cycles.
+#
+# A document that needs a restart is booted on trial, like a firmware update
+# (ota.py): the one before it is kept in the same file. load() counts the
+# boots, fail() is called by main.py when the import raises (a pin the board
+# rejects), and the first answer of the backend to fetch() confirms it. A
+# trial that fails, is not confirmed within MAX_TRIAL_BOOTS boots, or does
+# not reach a backend within CONFIRM_WITHIN seconds (a wrong apiBase) goes
+# back to the previous document; its ETag is remembered as rejected, so the
+# same document is not taken again until the backend's config changes.
+import os
+import ujson
+
+import sign
+
+CONFIG_FILE = "device_config.json"
+
+# Same defaults as models.DeviceConfig on the backend
+DEFAULTS = {
+    "apiBase": "http://192.168.2.169:8000",  # Replace with your actual Windows IP
+    "pins": {
+        "servoEntry": 9, "auger1": 1, "auger2": 7,
+        "hxEntryDt": 15, "hxEntrySck": 4, "hxPlatesDt": 12, "hxPlatesSck": 4,
+        "rfidSck": 18, "rfidMosi": 23, "rfidMiso": 19, "rfidCs": 5,
+        "silo1Trigger": 20, "silo1Echo": 22, "silo2Trigger": 10, "silo2Echo": 2,
+        "tray1Ctrl": 11, "tray2Ctrl": 8, "trayPower": 3,
+        "auger1Reverse": None, "auger2Reverse": None, "augerCurrent": None,
+    },
+    "catThreshold": 50,
+    "servoLock": 120,
+    "servoUnlocked": 30,
+    "siloEmptyDistance": 30,
+    "siloFullDistance": 5,
+    "entryTimeout": 30,
+    "plateScale": False,
+    "stallMs": 400,
+    "unjamAttempts": 3,
+    "stallCurrent": 45000,
+}
+
+MAX_TRIAL_BOOTS = 2
+CONFIRM_WITHIN = 300         # seconds a document on trial has to reach the backend
+
+etag = None
+trial = False                # running a document that changed pins/apiBase, not confirmed yet
+
+
+def _merge(doc):
+    config = dict(DEFAULTS)
+    config["pins"] = dict(DEFAULTS["pins"])
+    for key, value in doc.items():
+        if key == "pins":
+            config["pins"].update(value)
+        elif value is not None:      # apiBase None: keep the built-in address
+            config[key] = value
+    return config
+
+
+def _read():
+    try:
+        with open(CONFIG_FILE) as f:
+            return ujson.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(cached):
+    with open(CONFIG_FILE + ".tmp", "w") as f:
+        ujson.dump(cached, f)
+    try:
+        os.rename(CONFIG_FILE + ".tmp", CONFIG_FILE)   # replaces atomically on littlefs
+    except OSError:
+        os.remove(CONFIG_FILE)
+        os.rename(CONFIG_FILE + ".tmp", CONFIG_FILE)
+
+
+def _rollback(cached):
+    global etag, trial
+    previous = cached.get("previous") or {}
+    _save({"etag": previous.get("etag"), "config": previous.get("config") or {},
+           "rejected": cached.get("etag")})
+    etag = previous.get("etag")
+    trial = False
+
+
+def load():
+    """The cached config, or DEFAULTS if there is none; counts a boot of a document on trial."""
+    global etag, trial
+    cached = _read()
+    if "boots" in cached:
+        cached["boots"] += 1
+        if cached["boots"] > MAX_TRIAL_BOOTS:
+            _rollback(cached)
+            cached = _read()
+        else:
+            _save(cached)
+            trial = True
+    etag = cached.get("etag")
+    try:
+        return _merge(cached.get("config") or {})
+    except (AttributeError, ValueError):
+        return _merge({})
+
+
+def fail():
+    """Goes back to the previous document if the one on trial broke the start; True if it did."""
+    cached = _read()
+    if "boots" not in cached:
+        return False
+    _rollback(cached)
+    return True
+
+
+def _confirm(cached):
+    global trial
+    if "boots" in cached:
+        cached.pop("boots")
+        cached.pop("previous", None)
+        _save(cached)
+    trial = False
+    return cached
+
+
+def fetch(get, headers, current):
+    """The backend's config if it changed since the cached one (then cached), else None.
+
+    `get(path, headers)` returns a (signed) backend response; raises on
+    errors, leaving the cache as it was. Any answer confirms a document on
+    trial: it reached the backend. `current` is the config running now; a
+    new document that needs a restart against it is cached on trial.
+    Raises ValueError for a document without a valid signature.
+    """
+    global etag
+    asked = etag or ""
+    if etag:
+        headers["If-None-Match"] = etag
+    resp = get("/device/config", headers)
+    try:
+        if resp.status_code not in (200, 304):
+            raise OSError("config: HTTP %d" % resp.status_code)
+        body = resp.content if resp.status_code == 200 else None
+        new_etag = resp.headers.get("etag")
+        signature = resp.headers.get("x-signature")
+        stamp = resp.headers.get("x-timestamp")
+    finally:
+        resp.close()
+    if body is not None and sign.has_key() and not sign.check(body, signature, asked, stamp):
+        raise ValueError("config signature")
+    doc = ujson.loads(body) if body is not None else None
+    cached = _confirm(_read())
+    if doc is None or (new_etag and new_etag == cached.get("rejected")):
+        return None                  # unchanged, or rolled back from this one before
+    new = _merge(doc)
+    entry = {"etag": new_etag, "config": doc, "rejected": cached.get("rejected")}
+    if needs_restart(current, new):
+        entry["previous"] = {"etag": cached.get("etag"), "config": cached.get("config") or {}}
+        entry["boots"] = 0
+    _save(entry)
+    etag = new_etag
+    return new
+
+
+def needs_restart(old, new):
+    return (old["pins"] != new["pins"] or old["apiBase"] != new["apiBase"]
+            or old["plateScale"] != new["plateScale"])
@@ -0,0 +1,87 @@
+# devproto.py - Compact binary frames for the feeder <-> backend hot path
+#
+# Mirrors backend/device_protocol.py. Requests are packed into module-level
+# buffers that are allocated once, so a scan does not build URLs, JSON or
+# dicts. All integers are little endian, weights in 0.1 g, lengths in mm.
+
+import ustruct
+
+VERSION = 1
+
+MSG_CHECK = 1
+MSG_CONFIRM = 2
+MSG_TELEMETRY = 3
+
+# Status byte in every response
+OK = 0
+DENIED = 1
+UNKNOWN_PET = 2
+NO_SCHEDULE = 3
+NO_SILO = 4
+BUSY = 5  # rate limited, scan again later
+BAD_FRAME = 255
+
+UID_LEN = 10
+
+CHECK_REQUEST = "<BBB10s"
+CHECK_RESPONSE = "<BBBBH"
+CONFIRM_REQUEST = "<BBB10siHii"
+TELEMETRY_REQUEST = "<BB6sHHiibII"
+STATUS_RESPONSE = "<BBB"
+
+HEADERS = {"Content-Type": "application/octet-stream"}
+
+_check_buf = bytearray(ustruct.calcsize(CHECK_REQUEST))
+_confirm_buf = bytearray(ustruct.calcsize(CONFIRM_REQUEST))
+_telemetry_buf = bytearray(ustruct.calcsize(TELEMETRY_REQUEST))
+
+
+def _uid(uid):
+    # uid is the raw list/bytes from MFRC522.anticoll()
+    n = len(uid)
+    if n > UID_LEN:
+        n = UID_LEN
+    return n, bytes(uid[:n])
+
+
+def encode_check(uid):
+    n, raw = _uid(uid)
+    ustruct.pack_into(CHECK_REQUEST, _check_buf, 0, VERSION, MSG_CHECK, n, raw)
+    return _check_buf
+
+
+def decode_check(data):
+    """Returns (status, silo, seconds of dispensing)."""
+    if len(data) != ustruct.calcsize(CHECK_RESPONSE):
+        return BAD_FRAME, 0, 0
+    version, kind, status, silo, centis = ustruct.unpack_from(CHECK_RESPONSE, data)
+    if version != VERSION or kind != MSG_CHECK:
+        return BAD_FRAME, 0, 0
+    return status, silo, centis / 100
+
+
+def encode_confirm(uid, height_cm, body_grams=None, eaten_dg=None, stock_grams=None):
+    # -1: not measured (the feeder has no silo scale; eaten needs the plate scale)
+    n, raw = _uid(uid)
+    ustruct.pack_into(CONFIRM_REQUEST, _confirm_buf, 0, VERSION, MSG_CONFIRM, n, raw,
+                      -1 if stock_grams is None else int(stock_grams * 10),
+                      max(0, min(0xFFFF, int(height_cm * 10))),
+                      int(body_grams * 10) if body_grams else 0, -1 if eaten_dg is None else eaten_dg)
+    return _confirm_buf
+
+
+def encode_telemetry(mac, silo1_cm, silo2_cm, entry_grams, plate_grams, rssi, free_heap, uptime_s):
+    ustruct.pack_into(TELEMETRY_REQUEST, _telemetry_buf, 0, VERSION, MSG_TELEMETRY, mac,
+                      max(0, min(0xFFFF, int(silo1_cm * 10))), max(0, min(0xFFFF, int(silo2_cm * 10))),
+                      int(entry_grams * 10), int(plate_grams * 10),
+                      max(-128, min(127, rssi)), free_heap, uptime_s)
+    return _telemetry_buf
+
+
+def decode_status(data, msg_type):
+    if len(data) != ustruct.calcsize(STATUS_RESPONSE):
+        return BAD_FRAME
+    version, kind, status = ustruct.unpack_from(STATUS_RESPONSE, data)
+    if version != VERSION or kind != msg_type:
+        return BAD_FRAME
+    return status
@@ -22,6 +22,7 @@ class HX711:
         self.powerUp()
         self.tare()
         self.value = 0
+        self.value_dg = 0
 
     # Prepares the hx711 sensor for reading
     def powerUp(self):
@@ -42,6 +43,7 @@ class HX711:
 
     # Function for getting raw value from sensor
     # Designed for internal use only - read() should be used by humans
+    # Returns signed ADC counts as a small int, so no float is allocated
     def raw_read(self):
         if not self.powered:
             return("Error: Cannot read, HX711 not powered")
@@ -60,14 +62,19 @@ class HX711:
                 my = ( my << 1) | data
         toggle(self.pdsckPin)
         if neg: my = my - (1<<23)
-        return round(my/self.SCALING_FACTOR, 1)
+        return my
     
-    # Sets the zero point of the sensor
+    # Sets the zero point of the sensor (in counts)
     def tare(self):
         self.offset = self.raw_read()
         return self.offset
     
+    # Returns the current weight in 0.1 g as an int (fixed point, allocation-free)
+    def read_dg(self):
+        self.value_dg = (self.raw_read() - self.offset) * 10 // self.SCALING_FACTOR
+        return self.value_dg
+    
     # Returns the current weight value, in grams
     def read(self):
-        self.value = round(self.raw_read() - self.offset, 1)
-        return self.value
\ No newline at end of file
+        self.value = self.read_dg() / 10
+        return self.value
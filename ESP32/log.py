@@ -0,0 +1,143 @@
+# log.py - Leveled logging for the feeder firmware
+#
+# Messages below LEVEL are dropped before they are formatted, and the format
+# arguments are passed positionally (no *args tuple), so a filtered call does
+# not allocate. Debug output inside hot loops is additionally written as
+#
+#     _DEBUG = const(0)
+#     ...
+#     if _DEBUG:
+#         log.debug("weight %d", weight)
+#
+# in the calling module; with a const 0 the MicroPython compiler drops the
+# whole statement, arguments included.
+#
+# Every message that passes is printed to the REPL (if ECHO) and kept in a
+# fixed ring of the last RING_SIZE lines, readable with recent(). The same
+# format string is let through at most RATE_BURST times per RATE_MS window;
+# further repeats are only counted and reported with the next one that
+# passes, so a message in a polling loop costs a dict lookup instead of UART
+# time. Messages at SHIP_LEVEL and above are also queued for upload, each
+# with a sequence number: the feeder posts a snapshot() to the backend and
+# calls shipped() with its last sequence once it was accepted. Lines logged
+# (or dropped from a full queue) by another thread meanwhile stay queued.
+
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL = INFO
+SHIP_LEVEL = WARNING
+ECHO = True          # print to the REPL as well
+
+RING_SIZE = 32       # lines kept in RAM
+RATE_MS = 10000      # rate limiting window per format string
+RATE_BURST = 3       # messages let through per window
+RATE_KEYS = 32       # distinct format strings tracked before the table is reset
+OUTBOX_SIZE = 20     # queued for upload; the oldest are dropped when full
+
+_PREFIX = {DEBUG: "D ", INFO: "I ", WARNING: "W ", ERROR: "E "}
+_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+_UNSET = object()
+
+_ring = [None] * RING_SIZE
+_ring_pos = 0
+_rate = {}           # format string -> [window start ticks_ms, passed, suppressed]
+_outbox = []         # [level name, uptime s, message, repeats, seq]
+_seq = 0             # of the last queued message
+dropped = 0          # queued messages lost because the outbox was full, not yet reported
+
+
+def _allow(msg, now):
+    entry = _rate.get(msg)
+    if entry is None:
+        if len(_rate) >= RATE_KEYS:
+            _rate.clear()
+        _rate[msg] = [now, 1, 0]
+        return True
+    if time.ticks_diff(now, entry[0]) >= RATE_MS:
+        entry[0] = now
+        entry[1] = 0
+    if entry[1] >= RATE_BURST:
+        entry[2] += 1
+        return False
+    entry[1] += 1
+    return True
+
+
+def _emit(level, msg, a, b, c):
+    global _ring_pos, _seq, dropped
+    now = time.ticks_ms()
+    if not _allow(msg, now):
+        return
+    entry = _rate[msg]
+    repeats, entry[2] = entry[2], 0
+    text = msg
+    if a is not _UNSET:
+        if b is _UNSET:
+            text = msg % (a,)
+        elif c is _UNSET:
+            text = msg % (a, b)
+        else:
+            text = msg % (a, b, c)
+    if repeats:
+        text = "%s (+%d suppressed)" % (text, repeats)
+    if ECHO:
+        print(_PREFIX[level], text, sep="")
+    _ring[_ring_pos] = _PREFIX[level] + text
+    _ring_pos = (_ring_pos + 1) % RING_SIZE
+    if level >= SHIP_LEVEL:
+        if len(_outbox) >= OUTBOX_SIZE:
+            _outbox.pop(0)
+            dropped += 1
+        _seq += 1
+        _outbox.append([_NAMES[level], now // 1000, text, repeats, _seq])
+
+
+def debug(msg, a=_UNSET, b=_UNSET, c=_UNSET):
+    if LEVEL <= DEBUG:
+        _emit(DEBUG, msg, a, b, c)
+
+
+def info(msg, a=_UNSET, b=_UNSET, c=_UNSET):
+    if LEVEL <= INFO:
+        _emit(INFO, msg, a, b, c)
+
+
+def warning(msg, a=_UNSET, b=_UNSET, c=_UNSET):
+    if LEVEL <= WARNING:
+        _emit(WARNING, msg, a, b, c)
+
+
+def error(msg, a=_UNSET, b=_UNSET, c=_UNSET):
+    if LEVEL <= ERROR:
+        _emit(ERROR, msg, a, b, c)
+
+
+def recent():
+    """The kept lines, oldest first."""
+    return [line for line in _ring[_ring_pos:] + _ring[:_ring_pos] if line is not None]
+
+
+def pending():
+    """Queued entries for upload as [level, uptime s, message, repeats, seq]; the list is live."""
+    return _outbox
+
+
+def snapshot():
+    """(entries as [level, uptime s, message, repeats], seq of the last one, dropped) for an upload."""
+    entries = _outbox[:]
+    if not entries:
+        return [], 0, dropped
+    return [e[:4] for e in entries], entries[-1][4], dropped
+
+
+def shipped(seq, reported):
+    """Drops the entries up to seq and the `reported` drops once the backend accepted a snapshot()."""
+    global dropped
+    while _outbox and _outbox[0][4] <= seq:
+        _outbox.pop(0)
+    dropped = max(0, dropped - reported)
@@ -1,21 +1,45 @@
 # boot.py
-import wifi
+import ota
+ota.boot()  # counts the boots of an updated firmware, rolls back one that keeps failing (ota.py)
+
 import time
 import machine
 
-print("🚀 Pet Food Dispenser Starting...")
+try:
+    import bootprof
+    bootprof.install()  # import time/heap per module, printed before the feeding loop starts
+
+    import wifi
+    print("🚀 Pet Food Dispenser Starting...")
 
-# Initialize WiFi connection
-if wifi.init_wifi():
+    # Initialize WiFi connection
+    configured = wifi.init_wifi()
+except Exception as e:
+    print(f"❌ Startup failed: {e}")
+    ota.fail(repr(e))
+    time.sleep(10)
+    machine.reset()
+
+if configured:
+    bootprof.mark("wifi ready")
     print("✅ WiFi ready, starting dispenser...")
-    time.sleep(1)
-    
+
     # Import and run the pet food dispenser
     try:
         import petfooddispenser
+        bootprof.mark("dispenser loaded")
+        bootprof.report()
+        bootprof.uninstall()
         print("✅ Pet food dispenser module loaded successfully")
+        print("Starting Pet Food Dispenser...")
+        petfooddispenser.main()
     except Exception as e:
         print(f"❌ Failed to start pet food dispenser: {e}")
+        if ota.fail(repr(e)):
+            print("↩️ Update rolled back")
+        import devconfig
+        if devconfig.fail():  # new pins or apiBase from the backend broke the start
+            print("↩️ Config rolled back")
         print("🔄 System will restart in 10 seconds...")
         time.sleep(10)
         machine.reset()
@@ -33,6 +33,7 @@ __version__ = "1.0.0"
 __repo__ = "https://github.com/mytechnotalent/MicroPython_MFRC522.git"
 
 MAX_LEN = 16
+_ANTICOLL_CMD = b'\x93\x20'
 CALCULATE_CRC = 0x03
 ANTICOLL = 0x93
 SELECT_TAG = 0x93
@@ -99,6 +100,13 @@ class MFRC522:
 		"""
 		self.spi = spi
 		self.cs = cs
+		# Preallocated so polling for tags does not allocate
+		self._wbuf = bytearray(1)
+		self._rbuf = bytearray(1)
+		self._req = bytearray(1)
+		self._recv = bytearray(MAX_LEN)
+		self.recv_len = 0
+		self.bits = 0
 		self.cs.value(1)
 		self.spi.init()
 		self.init()
@@ -117,9 +125,12 @@ class MFRC522:
 		-------
 		None
 		"""
+		buf = self._wbuf
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & ((reg << 1) & 0x7e)))
-		self.spi.write(b'%c' % int(0xff & val))
+		buf[0] = (reg << 1) & 0x7e
+		self.spi.write(buf)
+		buf[0] = val & 0xff
+		self.spi.write(buf)
 		self.cs.value(1)
 
 	def _read_reg(self, reg):
@@ -134,11 +145,12 @@ class MFRC522:
 		-------
 		None
 		"""
+		self._wbuf[0] = ((reg << 1) & 0x7e) | 0x80
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & (((reg << 1) & 0x7e) | 0x80)))
-		val = self.spi.read(1)
+		self.spi.write(self._wbuf)
+		self.spi.readinto(self._rbuf)
 		self.cs.value(1)
-		return val[0]
+		return self._rbuf[0]
 
 	def _set_bit_mask(self, reg, mask):
 		"""Set the bit mask
@@ -187,7 +199,22 @@ class MFRC522:
 		tuple
 			Returns a tuple of status, recv, bits
 		"""
-		recv = []
+		status = self._tocard_into(cmd, send)
+		return status, list(self._recv[:self.recv_len]), self.bits
+
+	def _tocard_into(self, cmd, send):
+		"""To card without allocating
+
+		The answer is left in self._recv[:self.recv_len], the bit count in
+		self.bits.
+
+		Returns
+		-------
+		int
+			Status
+		"""
+		recv = self._recv
+		self.recv_len = 0
 		bits = irq_en = wait_irq = n = 0
 		status = self.ERR
 		if cmd == AUTHENTICATE:
@@ -228,11 +255,13 @@ class MFRC522:
 						n = 1
 					elif n > MAX_LEN:
 						n = MAX_LEN
-					for _ in range(n):
-						recv.append(self._read_reg(MFRC522_FIFO_DATA_REG))
+					for i in range(n):
+						recv[i] = self._read_reg(MFRC522_FIFO_DATA_REG)
+					self.recv_len = n
 			else:
 				status = self.ERR
-		return status, recv, bits
+		self.bits = bits
+		return status
 
 	def _calculate_crc(self, data):
 		"""Calculate CRC
@@ -324,6 +353,50 @@ class MFRC522:
 			status = self.ERR
 		return status, bits
 
+	def poll(self, mode):
+		"""Allocation-free request(): only returns the status
+
+		Parameters
+		----------
+		mode : int
+			Mode
+
+		Returns
+		-------
+		int
+			Returns an int of the status
+		"""
+		self._write_reg(MFRC522_BIT_FRAMING_REG, 0x07)
+		self._req[0] = mode
+		status = self._tocard_into(MFRC522_CONTROL_REG, self._req)
+		if (status != self.OK) | (self.bits != 0x10):
+			status = self.ERR
+		return status
+
+	def anticoll_into(self, buf):
+		"""Allocation-free anticoll(): copies the 5 byte serial number into buf
+
+		Parameters
+		----------
+		buf : bytearray
+			At least 5 bytes
+
+		Returns
+		-------
+		int
+			Returns an int of the status
+		"""
+		self._write_reg(MFRC522_BIT_FRAMING_REG, 0x00)
+		status = self._tocard_into(TRANSCEIVE, _ANTICOLL_CMD)
+		if status == self.OK:
+			recv = self._recv
+			if self.recv_len == 5 and recv[0] ^ recv[1] ^ recv[2] ^ recv[3] == recv[4]:
+				for i in range(5):
+					buf[i] = recv[i]
+			else:
+				status = self.ERR
+		return status
+
 	def anticoll(self):
 		"""Anticoll
 
@@ -0,0 +1,282 @@
+# ota.py - Firmware and config updates from the backend, with rollback
+#
+# backend/firmware.py keeps versioned bundles of files (precompiled modules,
+# config documents). update() asks GET /device/firmware with the version in
+# MANIFEST and gets back the files that differ in the latest bundle, each as
+# a delta against the local file or in full, zlib-compressed if this build
+# has the deflate module. The plan is signed with the feeder's key and names
+# the SHA-256 of every file, so nothing is installed that the backend did
+# not send for this feeder.
+#
+#   1. stage: every file is streamed into STAGE in CHUNK-sized pieces (a
+#      delta is applied against the current file on the way) and hashed;
+#      any mismatch or network error aborts the update.
+#   2. swap: STATE is written in phase "swap", every replaced or removed
+#      file is moved to BACKUP and the staged one moved in, MANIFEST is
+#      updated and STATE goes to phase "trial". The caller resets.
+#   3. trial: boot(), the first thing main.py runs, counts the boots of a
+#      version on trial and rolls it back from BACKUP after MAX_TRIAL_BOOTS,
+#      or at once if the swap was cut short. fail() rolls back when the new
+#      firmware raises on startup. confirm() keeps it once it ran a while.
+#
+# This module only imports built-ins, and main.py, boot.py and ota.py are
+# never part of a bundle, so the code that rolls back is not the code that
+# broke. The outcome waits in REPORT until the backend has taken it.
+
+import hashlib
+import os
+import struct
+import ubinascii
+import ujson
+
+try:
+    import deflate
+except ImportError:  # older MicroPython: files come uncompressed
+    deflate = None
+
+MANIFEST = "firmware.json"   # {"version": ..., "files": {name: sha256}}
+STATE = "ota_state.json"
+REPORT = "ota_report.json"
+STAGE = "ota_stage"
+BACKUP = "ota_backup"
+PINNED = ("main.py", "boot.py", "ota.py", "ota.mpy")
+MAX_TRIAL_BOOTS = 2
+CONFIRM_AFTER = 120          # seconds a new version has to run before it is kept
+CHUNK = 512
+
+trial = False                # running a version that is not confirmed yet
+
+
+def _exists(path):
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return ujson.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(path, data):
+    with open(path + ".tmp", "w") as f:
+        ujson.dump(data, f)
+    try:
+        os.rename(path + ".tmp", path)   # replaces atomically on littlefs
+    except OSError:
+        os.remove(path)
+        os.rename(path + ".tmp", path)
+
+
+def _clear(folder):
+    try:
+        for name in os.listdir(folder):
+            os.remove(folder + "/" + name)
+    except OSError:
+        os.mkdir(folder)
+
+
+def installed():
+    return _load(MANIFEST) or {"version": None, "files": {}}
+
+
+def _report(version, status, detail=None):
+    print("OTA %s %s %s" % (version, status, detail or ""))
+    _save(REPORT, {"version": version, "status": status, "detail": detail})
+
+
+def pending_report():
+    return _load(REPORT)
+
+
+def report_sent():
+    if _exists(REPORT):
+        os.remove(REPORT)
+
+
+# ----------- download -----------
+
+def _exact(stream, n):
+    data = b""
+    while len(data) < n:
+        chunk = stream.read(n - len(data))
+        if not chunk:
+            raise OSError("short read")
+        data += chunk
+    return data
+
+
+def _pipe(src, n, out, digest):
+    while n > 0:
+        chunk = src.read(min(n, CHUNK))
+        if not chunk:
+            raise OSError("short read")
+        out.write(chunk)
+        digest.update(chunk)
+        n -= len(chunk)
+
+
+def _patch(stream, name, out, digest):
+    """Applies a COPY/INSERT delta (backend/firmware.py make_delta) to the current file."""
+    magic, old_size, size = struct.unpack("<4sII", _exact(stream, 12))
+    if magic != b"NXD1" or old_size != os.stat(name)[6]:
+        raise ValueError("delta does not fit " + name)
+    with open(name, "rb") as old:
+        while size > 0:
+            op = _exact(stream, 1)
+            if op == b"C":
+                offset, n = struct.unpack("<II", _exact(stream, 8))
+                old.seek(offset)
+                _pipe(old, n, out, digest)
+            elif op == b"I":
+                n = struct.unpack("<I", _exact(stream, 4))[0]
+                _pipe(stream, n, out, digest)
+            else:
+                raise ValueError("bad delta")
+            size -= n
+
+
+def _fetch(get, entry):
+    resp = get(entry["path"])
+    try:
+        if resp.status_code != 200:
+            raise OSError("HTTP %d for %s" % (resp.status_code, entry["name"]))
+        stream = resp.raw
+        if entry["encoding"] == "zlib":
+            stream = deflate.DeflateIO(stream, deflate.ZLIB)
+        digest = hashlib.sha256()
+        with open(STAGE + "/" + entry["name"], "wb") as out:
+            if entry["delta"]:
+                _patch(stream, entry["name"], out, digest)
+            else:
+                _pipe(stream, entry["size"], out, digest)
+    finally:
+        resp.close()
+    if ubinascii.hexlify(digest.digest()).decode() != entry["sha256"]:
+        raise ValueError("hash mismatch " + entry["name"])
+
+
+def update(get):
+    """Stages and swaps in the latest bundle; True if the feeder has to reset into it.
+
+    `get(path)` returns a (signed) backend response. Raises on failure, with
+    the current firmware left untouched.
+    """
+    import sign
+    if trial or _exists(STATE):
+        return False
+    current = installed()
+    path = "/device/firmware?encoding=" + ("zlib" if deflate else "identity")
+    if current["version"]:
+        path += "&version=" + current["version"]
+    resp = get(path)
+    status, body = resp.status_code, resp.content
+    signature = resp.headers.get("x-signature")
+    stamp = resp.headers.get("x-timestamp")
+    resp.close()
+    if status != 200:
+        raise OSError("firmware plan: HTTP %d" % status)
+    # Signed for this feeder, the version it asked with and now: no replayed (rollback) plans
+    if sign.has_key() and not sign.check(body, signature, current["version"] or "", stamp):
+        raise ValueError("firmware plan signature")
+    plan = ujson.loads(body)
+    files = [e for e in plan["files"] if e["name"] not in PINNED]
+    if plan["version"] == current["version"] or not (files or plan["remove"]):
+        return False
+    try:
+        _clear(STAGE)
+        for entry in files:
+            _fetch(get, entry)
+    except Exception as e:
+        _clear(STAGE)
+        _report(plan["version"], "failed", str(e))
+        raise
+    _swap(current, plan["version"], files, plan["remove"])
+    return True
+
+
+# ----------- swap and rollback -----------
+
+def _swap(current, version, files, remove):
+    names = [e["name"] for e in files]
+    removed = [n for n in remove if n not in PINNED]
+    for name in names:
+        # MicroPython imports a .py before a .mpy of the same name
+        source = name[:-4] + ".py"
+        if name.endswith(".mpy") and source not in removed and source not in PINNED and _exists(source):
+            removed.append(source)
+    manifest = {n: sha for n, sha in current["files"].items() if n not in removed}
+    for entry in files:
+        manifest[entry["name"]] = entry["sha256"]
+    state = {"phase": "swap", "version": version, "boots": 0, "names": names, "removed": removed,
+             "existing": [n for n in names + removed if _exists(n)], "previous": current}
+    _save(STATE, state)
+    _clear(BACKUP)
+    for name in state["existing"]:
+        os.rename(name, BACKUP + "/" + name)
+    for name in names:
+        os.rename(STAGE + "/" + name, name)
+    _save(MANIFEST, {"version": version, "files": manifest})
+    state["phase"] = "trial"
+    _save(STATE, state)
+
+
+def _rollback(state, reason):
+    global trial
+    for name in state["names"] + state["removed"]:
+        backup = BACKUP + "/" + name
+        if _exists(backup):
+            if _exists(name):
+                os.remove(name)
+            os.rename(backup, name)
+        elif name not in state["existing"] and _exists(name):
+            os.remove(name)   # came with the new version
+    _save(MANIFEST, state["previous"])
+    os.remove(STATE)
+    _clear(BACKUP)
+    _clear(STAGE)
+    trial = False
+    _report(state["version"], "rolled-back", reason)
+
+
+def boot():
+    """Counts a boot of a version on trial; rolls it back if it keeps failing."""
+    global trial
+    state = _load(STATE)
+    if state is None:
+        return
+    if state["phase"] != "trial":
+        _rollback(state, "swap interrupted")
+        return
+    state["boots"] += 1
+    if state["boots"] > MAX_TRIAL_BOOTS:
+        _rollback(state, "no confirmed start in %d boots" % MAX_TRIAL_BOOTS)
+        return
+    _save(STATE, state)
+    trial = True
+
+
+def fail(reason):
+    """Rolls back at once if the firmware on trial failed to start; True if it did."""
+    state = _load(STATE)
+    if state is None:
+        return False
+    _rollback(state, reason)
+    return True
+
+
+def confirm():
+    """Keeps the version on trial."""
+    global trial
+    state = _load(STATE)
+    trial = False
+    if state is None:
+        return
+    os.remove(STATE)
+    _clear(BACKUP)
+    _report(state["version"], "installed")
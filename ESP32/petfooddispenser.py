@@ -1,32 +1,65 @@
 # dispenser_main.py - Pet Food Dispenser Controller for ESP32-C6 (MicroPython)
 
+import gc
 import machine
 import time
+import ubinascii
+import ujson
 import urequests
-from machine import Pin, PWM
+import wifi
+import auger
+import devconfig
+import devproto
+import log
+import ota
+import sign
+from bodyweight import PlateauDetector
+from connectivity import Supervisor
+from push import PushClient
+from machine import ADC, Pin, PWM
 from mfrc522 import MFRC522
 from hcsr04 import HCSR04
 from hx711 import HX711
 from machine import Pin, SoftSPI
+from micropython import const
 
-# --- CONFIGURATION ---
-API_BASE = "http://192.168.2.169:8000"  # Replace with your actual Windows IP
-print("🔧 Initializing Pet Food Dispenser...")
-print(f"📡 Backend API: {API_BASE}")
+_DEBUG = const(0)  # 1: per-poll trace output from the idle and cat detection loops
 
-SERVO_ENTRY_LOCK_PIN = 9    # GPIO6 - Entry servo
-SERVO_LOCK = 120
-SERVO_UNLOCKED = 30
-SCHNECKE1_PIN = 1         # GPIO10 - Motor to dispense food (silo 1)
-SCHNECKE2_PIN = 7          # GPIO11 - Motor to dispense food (silo 2)
+# --- CONFIGURATION ---
+# Settings from the backend (devconfig.py), as cached on the last fetch. Pins and
+# API_BASE are used at import and need a restart; the rest is updated between cycles.
+# A document that changed them runs on trial and is rolled back if it breaks the start.
+cfg = devconfig.load()
+pins = cfg["pins"]
+API_BASE = cfg["apiBase"]
+log.info("Initializing Pet Food Dispenser...")
+log.info("Backend API: %s", API_BASE)
+REQUEST_TIMEOUT = 5  # seconds for device -> backend calls
+USE_BINARY_PROTOCOL = True  # compact /device/* frames instead of JSON
+TELEMETRY_INTERVAL = 60  # seconds between telemetry frames while idle
+LOG_SHIP_INTERVAL = 30  # seconds between log uploads while idle
+LOG_SHIP_BATCH = 10  # ship at once when this many warnings/errors are queued
+CONFIG_CHECK_INTERVAL = 600  # seconds between config checks while idle, or on "config.updated"
+FIRMWARE_CHECK_INTERVAL = 3600  # seconds between update checks while idle (ota.py), or on "firmware.published"
+
+SERVO_ENTRY_LOCK_PIN = pins["servoEntry"]  # Entry servo
+SERVO_LOCK = cfg["servoLock"]
+SERVO_UNLOCKED = cfg["servoUnlocked"]
+SCHNECKE1_PIN = pins["auger1"]  # Motor to dispense food (silo 1)
+SCHNECKE2_PIN = pins["auger2"]  # Motor to dispense food (silo 2)
 
 # HX711 pins
-HX_ENTRY_DT = 15             # Eingangs-Waage
-HX_ENTRY_SCK = 4
-HX_PLATES_DT = 12          # Waage unter den Näpfen
-HX_PLATES_SCK = 4
+HX_ENTRY_DT = pins["hxEntryDt"]      # Eingangs-Waage
+HX_ENTRY_SCK = pins["hxEntrySck"]
+HX_PLATES_DT = pins["hxPlatesDt"]    # Waage unter den Näpfen
+HX_PLATES_SCK = pins["hxPlatesSck"]
 HX_channel = 3
-threshhold = 50
+CAT_THRESHOLD = int(cfg["catThreshold"])  # grams on the entry scale that count as a cat inside (int: no float math per poll)
+SILO_EMPTY_CM = cfg["siloEmptyDistance"]  # level sensor distance when the silo is empty
+SILO_FULL_CM = cfg["siloFullDistance"]    # ... when it is full
+ENTRY_TIMEOUT = cfg["entryTimeout"]  # seconds the open door waits for the cat
+STALL_MS = cfg["stallMs"]            # auger without flow (or over-current) for this long is stalled
+UNJAM_ATTEMPTS = cfg["unjamAttempts"]
 
 Pin(HX_ENTRY_SCK, Pin.IN)   # high-Z
 Pin(HX_ENTRY_DT, Pin.IN)     # high-Z
@@ -34,38 +67,67 @@ Pin(HX_PLATES_SCK, Pin.IN)  # high-Z
 #Pin(HX_PLATES_DT, Pin.IN)    # high-Z
 
 # RFID (SPI: sck, mosi, miso, rst, cs)
-sck = Pin(18, Pin.OUT)
-copi = Pin(23, Pin.OUT)  # Controller out, peripheral in
-cipo = Pin(19, Pin.OUT)  # Controller in, peripheral out
+sck = Pin(pins["rfidSck"], Pin.OUT)
+copi = Pin(pins["rfidMosi"], Pin.OUT)  # Controller out, peripheral in
+cipo = Pin(pins["rfidMiso"], Pin.OUT)  # Controller in, peripheral out
 spi = SoftSPI(baudrate=100000, polarity=0, phase=0,
               sck=sck, mosi=copi, miso=cipo)
-sda = Pin(5, Pin.OUT)
+sda = Pin(pins["rfidCs"], Pin.OUT)
 reader = MFRC522(spi, sda)
+uid_buf = bytearray(5)  # filled by reader.anticoll_into(), reused for every poll
 
 # HC-SR04 ultrasonic sensors for silo fill-level detection
-ultra_silo1 = HCSR04(trigger_pin=20, echo_pin=22)  # HC-SR005 links
-ultra_silo2 = HCSR04(trigger_pin=10, echo_pin=2)  # HC-SR004 rechts
+ultra_silo1 = HCSR04(trigger_pin=pins["silo1Trigger"], echo_pin=pins["silo1Echo"])  # HC-SR005 links
+ultra_silo2 = HCSR04(trigger_pin=pins["silo2Trigger"], echo_pin=pins["silo2Echo"])  # HC-SR004 rechts
 
 # CD-ROM Laufwerkssteuerung
-CD1_CTRL = Pin(11, Pin.OUT, value=1)
-CD2_CTRL = Pin(8, Pin.OUT, value=1)
+CD1_CTRL = Pin(pins["tray1Ctrl"], Pin.OUT, value=1)
+CD2_CTRL = Pin(pins["tray2Ctrl"], Pin.OUT, value=1)
 time.sleep(0.2)
-CD_POWER = Pin(3, Pin.OUT, value=0)
+CD_POWER = Pin(pins["trayPower"], Pin.OUT, value=0)
 
 # --- INIT ---
-print("🏗️ Initializing hardware components...")
+log.info("Initializing hardware components...")
 entry_servo = PWM(Pin(SERVO_ENTRY_LOCK_PIN), freq=50)
 entry_servo.duty(SERVO_LOCK)  # Set initial position to closed
 schnecke1 = Pin(SCHNECKE1_PIN, Pin.OUT, value=1)
 schnecke2 = Pin(SCHNECKE2_PIN, Pin.OUT, value=1)
+augers = {
+    1: auger.Auger(schnecke1, None if pins["auger1Reverse"] is None else Pin(pins["auger1Reverse"], Pin.OUT, value=0)),
+    2: auger.Auger(schnecke2, None if pins["auger2Reverse"] is None else Pin(pins["auger2Reverse"], Pin.OUT, value=0)),
+}
 hx_entry = HX711(HX_ENTRY_SCK, HX_ENTRY_DT)
-#hx_plate = HX711(HX_PLATES_SCK, HX_PLATES_DT)
-print("✅ Hardware initialization complete")
+body_weight = PlateauDetector()  # fed by cat_inside() while a cat is on the entry scale
+hx_plate = HX711(HX_PLATES_SCK, HX_PLATES_DT) if cfg["plateScale"] else None
+# Stall detection while dispensing (auger.py): plate weight if the scale is fitted, else motor current, else none
+if hx_plate is not None:
+    flow_sensor = auger.PlateFlow(hx_plate)
+elif pins["augerCurrent"] is not None:
+    flow_sensor = auger.MotorCurrent(ADC(Pin(pins["augerCurrent"]), atten=ADC.ATTN_11DB), cfg["stallCurrent"])
+else:
+    flow_sensor = None
+log.info("Hardware initialization complete")
+
+# Background Wi-Fi/backend health, read by the feeding loop without blocking
+supervisor = Supervisor(API_BASE)
+# Backend change notifications (schedule edits, remote commands)
+push = PushClient(API_BASE, wifi.device_id(), supervisor)
+# Request signing (sign.py); without a device.key requests go out unsigned
+if not sign.init(push.device_id):
+    log.warning("No device key, backend requests are not signed")
+# One dict per kind of request, reused; they name the feeder (rate limiting) and carry the signature
+BINARY_HEADERS = {"Content-Type": "application/octet-stream", "X-Device-Id": push.device_id}
+JSON_HEADERS = {"Content-Type": "application/json", "X-Device-Id": push.device_id}
+QUERY_HEADERS = {"X-Device-Id": push.device_id}
+CONFIG_HEADERS = {"X-Device-Id": push.device_id}  # + If-None-Match (devconfig.py)
+portion_seconds = None  # remote "portion" override for the dispense time
+config_due = False  # the backend announced a config change
+firmware_due = False  # a new bundle was published, check before the interval is up
 
 # --- FUNCTIONS ---
 def read_weight(sensor):
     """Reads and prints the weight from the HX711 sensor."""
-    print("⚖️ Reading weight sensor...")
+    log.info("Reading weight sensor...")
     sensor.power_on()
 
     while sensor.is_ready():
@@ -77,222 +139,380 @@ def read_weight(sensor):
         pass
 
     raw_measurement = sensor.read(True)
-    print(f"📊 Raw measurement: {raw_measurement}")
+    log.info("Raw measurement: %s", raw_measurement)
 
     weight = raw_measurement / 420
-    print(f'⚖️ Total Weight: {weight}g')
+    log.info("Total Weight: %sg", weight)
     return weight
 
 
 def read_rfid():
-    """Reads the RFID UID using the MFRC522 module."""
-    print("🔍 Scanning for RFID card...")
-    (stat, tag_type) = reader.request(reader.CARD_REQIDL)  # Request RFID tag
-    if stat == reader.OK:
-        (stat, raw_uid) = reader.anticoll()  # Get UID
-        if stat == reader.OK:
-            # Convert UID to string
-            uid_str = "".join("%02X" % b for b in raw_uid)
-            print(f"🏷️ RFID UID detected: {uid_str}")
+    """Reads the RFID UID using the MFRC522 module.
+
+    Polled twice a second while idle, so nothing is allocated unless a tag
+    answers; the UID string is only built once per detection.
+    """
+    if _DEBUG:
+        log.debug("Scanning for RFID card...")
+    if reader.poll(reader.CARD_REQIDL) == reader.OK:  # Request RFID tag
+        if reader.anticoll_into(uid_buf) == reader.OK:  # Get UID
+            uid_str = ubinascii.hexlify(uid_buf).decode().upper()
+            log.info("RFID UID detected: %s", uid_str)
             return uid_str
     return None
 
 
-def check_connection(retries=3, delay=2):
-    print("🌐 Checking backend connection...")
-    for attempt in range(retries):
-        try:
-            url = f"{API_BASE}/backend/health"
-            print(f"🔗 Attempting API call to: {url}")
-            resp = urequests.get(url, timeout=10)
-            if resp.status_code == 200:
-                data = resp.json()
-                resp.close()
-                print(f"✅ Backend response: {data.get('status', 'Unknown')}")
-                return True
-            else:
-                print(f"❌ Backend error: {resp.status_code} - {resp.text}")
-                resp.close()
-        except OSError as e:
-            if e.errno == 104:  # ECONNRESET
-                print(f"❌ Connection reset - backend may be down (attempt {attempt + 1}/{retries})")
-            elif e.errno == 113:  # EHOSTUNREACH  
-                print(f"❌ Host unreachable - check IP address and firewall (attempt {attempt + 1}/{retries})")
-            elif e.errno == 110:  # ETIMEDOUT
-                print(f"❌ Connection timeout - check network (attempt {attempt + 1}/{retries})")
-            else:
-                print(f"❌ Network error {e.errno}: {e} (attempt {attempt + 1}/{retries})")
-        except Exception as e:
-            print(f"❌ Backend unreachable (attempt {attempt + 1}/{retries}): {e}")
-        
-        if attempt < retries - 1:
-            print(f"⏳ Waiting {delay} seconds before retry...")
-            time.sleep(delay)
-    
-    print("❌ All connection attempts failed")
-    return False
+def post(path, body, headers):
+    """POSTs to the backend, signed if the feeder has a key."""
+    resp = urequests.post(API_BASE + path, data=body, headers=sign.apply(headers, "POST", path, body),
+                          timeout=REQUEST_TIMEOUT)
+    if resp.status_code == 401:
+        log.error("Backend rejected the request signature: %s", resp.text)
+    return resp
+
+
+def get(path, headers=QUERY_HEADERS):
+    """GETs from the backend, signed if the feeder has a key."""
+    resp = urequests.get(API_BASE + path, headers=sign.apply(headers, "GET", path),
+                         timeout=REQUEST_TIMEOUT)
+    if resp.status_code == 401:
+        log.error("Backend rejected the request signature: %s", resp.text)
+    return resp
 
 
 def get_pet(rfid):
-    print(f"👤 Looking up pet with RFID: {rfid}")
+    log.info("Looking up pet with RFID: %s", rfid)
     try:
         resp = urequests.get(f"{API_BASE}/pet/get/{rfid}")
         #resp = urequests.get(f"{API_BASE}/feeding/check/{rfid}")
         pet_data = resp.json()
-        print(f"✅ Pet found: {pet_data}")
+        log.info("Pet found: %s", pet_data)
         return pet_data
     except Exception as e:
-        print(f"❌ Pet lookup failed: {e}")
+        log.error("Pet lookup failed: %s", e)
+        return None
+
+def confirm_feeding(rfid, height=0, body_grams=None, eaten_dg=None):
+    log.info("Confirming feeding for RFID %s, eaten: %sdg, body weight: %sg", rfid, eaten_dg, body_grams)
+    try:
+        if USE_BINARY_PROTOCOL:
+            frame = devproto.encode_confirm(ubinascii.unhexlify(rfid), height, body_grams, eaten_dg)
+            resp = post("/device/feeding/confirm", frame, BINARY_HEADERS)
+            status = devproto.decode_status(resp.content, devproto.MSG_CONFIRM)
+            resp.close()
+            if status != devproto.OK:
+                log.error("Backend rejected feeding confirmation: %s", status)
+                return
+        else:
+            path = f"/feeding/confirm?rfid={rfid}&currentHeight={height}"
+            if body_grams:
+                path += f"&bodyWeight={body_grams:.0f}"
+            if eaten_dg is not None:
+                path += f"&eaten={eaten_dg / 10}"
+            post(path, b"", QUERY_HEADERS).close()
+        log.info("Feeding confirmed with backend")
+    except Exception as e:
+        log.error("Failed to confirm feeding: %s", e)
+        supervisor.report_failure()
+
+
+def request_feeding_check(rfid):
+    """Asks the backend about a scan.
+
+    Returns (status, silo, seconds) with a devproto status, or None if the
+    backend is (known to be) down.
+    """
+    if not supervisor.backend_ok:
+        log.warning("Backend unreachable, ignoring scan")
         return None
+    try:
+        if USE_BINARY_PROTOCOL:
+            frame = devproto.encode_check(ubinascii.unhexlify(rfid))
+            resp = post("/device/feeding/check", frame, BINARY_HEADERS)
+            result = devproto.decode_check(resp.content)
+        else:
+            resp = post(f"/feeding/check/{rfid}", b"", QUERY_HEADERS)
+            if resp.status_code == 404:
+                missing = devproto.UNKNOWN_PET if "Pet" in resp.text else devproto.NO_SCHEDULE
+                result = (missing, 0, 0)
+            elif resp.status_code == 429:
+                result = (devproto.BUSY, 0, 0)
+            elif resp.status_code == 200:
+                data = resp.json()
+                result = (devproto.OK if data["allowed"] else devproto.DENIED, data["siloId"], data["amount"])
+            else:
+                result = (devproto.BAD_FRAME, 0, 0)
+        resp.close()
+        return result
+    except Exception as e:
+        log.error("Feeding check failed: %s", e)
+        supervisor.report_failure()
+        return None
+
+
+def send_telemetry():
+    """Posts silo levels, scale reading and device health as one binary frame."""
+    if not (USE_BINARY_PROTOCOL and supervisor.backend_ok):
+        return
+    try:
+        sta = wifi.wlan_sta
+        frame = devproto.encode_telemetry(
+            sta.config("mac"), max(0, check_silo_fill(1)), max(0, check_silo_fill(2)),
+            hx_entry.value_dg / 10, 0, sta.status("rssi"), gc.mem_free(), time.ticks_ms() // 1000)
+        resp = post("/device/telemetry", frame, BINARY_HEADERS)
+        resp.close()
+    except Exception as e:
+        log.error("Telemetry failed: %s", e)
+        supervisor.report_failure()
+
+
+def ship_logs():
+    """Posts queued warnings/errors to the backend; kept for the next try on failure."""
+    if not (log.pending() and supervisor.backend_ok):
+        return
+    batch, last_seq, dropped = log.snapshot()
+    try:
+        resp = post("/device/logs", ujson.dumps({
+            "device": push.device_id, "uptime": time.ticks_ms() // 1000,
+            "dropped": dropped, "entries": batch}).encode(), JSON_HEADERS)
+        ok = resp.status_code == 200
+        resp.close()
+    except Exception as e:
+        # info, not error: a failed upload must not queue more lines to upload
+        log.info("Log upload failed: %s", e)
+        supervisor.report_failure()
+        return
+    if ok:
+        log.shipped(last_seq, dropped)
+
+
+def apply_config(new):
+    """Takes over the settings that can change between cycles; True if the rest needs a restart."""
+    global cfg, SERVO_LOCK, SERVO_UNLOCKED, CAT_THRESHOLD, SILO_EMPTY_CM, SILO_FULL_CM, ENTRY_TIMEOUT
+    global STALL_MS, UNJAM_ATTEMPTS
+    restart = devconfig.needs_restart(cfg, new)
+    cfg = new
+    SERVO_LOCK = new["servoLock"]
+    SERVO_UNLOCKED = new["servoUnlocked"]
+    CAT_THRESHOLD = int(new["catThreshold"])
+    SILO_EMPTY_CM = new["siloEmptyDistance"]
+    SILO_FULL_CM = new["siloFullDistance"]
+    ENTRY_TIMEOUT = new["entryTimeout"]
+    STALL_MS = new["stallMs"]
+    UNJAM_ATTEMPTS = new["unjamAttempts"]
+    if isinstance(flow_sensor, auger.MotorCurrent):
+        flow_sensor.limit = new["stallCurrent"]
+    entry_servo.duty(SERVO_LOCK)
+    return restart
+
+
+def update_config():
+    """Fetches the config if it changed; only called between cycles."""
+    if not supervisor.backend_ok:
+        return
+    try:
+        new = devconfig.fetch(get, CONFIG_HEADERS, cfg)
+    except Exception as e:
+        log.error("Config fetch failed: %s", e)
+        supervisor.report_failure()
+        return
+    if new is None:
+        return
+    log.info("Config updated: threshold %sg, entry timeout %ss", new["catThreshold"], new["entryTimeout"])
+    if apply_config(new):
+        log.info("Pins or backend address changed, restarting")
+        machine.reset()
 
-def confirm_feeding(rfid, scale_value):
-    print(f"📝 Confirming feeding for RFID {rfid}, scale weight: {scale_value}g")
+
+def check_firmware():
+    """Installs a newer bundle from the backend and resets into it (ota.py)."""
+    if not supervisor.backend_ok or ota.trial:
+        return
+    try:
+        if ota.update(get):
+            log.info("Firmware %s installed, restarting", ota.installed()["version"])
+            machine.reset()
+    except Exception as e:
+        log.error("Firmware update failed: %s", e)
+        supervisor.report_failure()
+
+
+def report_firmware():
+    """Posts the outcome of the last update (installed, failed, rolled back) once."""
+    report = ota.pending_report()
+    if report is None or not supervisor.backend_ok:
+        return
+    report["device"] = push.device_id
     try:
-        urequests.post(f"{API_BASE}/feeding/confirm?rfid={rfid}&newScaleWeight={scale_value}")
-        print("✅ Feeding confirmed with backend")
+        resp = post("/device/firmware/report", ujson.dumps(report).encode(), JSON_HEADERS)
+        ok = resp.status_code == 200
+        resp.close()
     except Exception as e:
-        print(f"❌ Failed to confirm feeding: {e}")
+        log.info("Firmware report failed: %s", e)
+        supervisor.report_failure()
+        return
+    if ok:
+        ota.report_sent()
+
+
+def apply_push_events():
+    """Applies queued backend notifications; only called between cycles."""
+    global portion_seconds, config_due, firmware_due
+    events, resync = push.pop()
+    if resync:
+        # Boot or backend restart: the settings may have changed unnoticed. Commands
+        # queued with the reset may predate it (a replayed "reboot" would loop), so skip them.
+        log.info("Backend event log restarted, local overrides kept")
+        config_due = True
+    for event in events:
+        kind = event["type"]
+        data = event["data"]
+        if kind == "config.updated":
+            config_due = True
+        elif kind == "firmware.published":
+            firmware_due = True
+        if kind != "command":
+            log.info("%s: %s", kind, data)
+            continue
+        if resync:
+            log.warning("Skipping command from before the resync: %s", data["command"])
+            continue
+        command = data["command"]
+        log.info("Remote command: %s", command)
+        if command == "lock":
+            lock_servo(entry_servo)
+        elif command == "unlock":
+            unlock_servo(entry_servo)
+        elif command == "tare":
+            hx_entry.tare()
+        elif command == "portion":
+            portion_seconds = data["value"]
+        elif command == "reboot":
+            machine.reset()
 
 
 def unlock_servo(servo):
-    print("🔓 Unlocking servo...")
+    log.info("Unlocking servo...")
     servo.duty(SERVO_UNLOCKED)  # Open
-    print("✅ Servo unlocked")
+    log.info("Servo unlocked")
 
 
 def lock_servo(servo):
-    print("🔓 Locking servo...")
+    log.info("Locking servo...")
     servo.duty(SERVO_LOCK)  # closed
-    print("❌ Servo locked")
+    log.info("Servo locked")
 
 
-def dispense_food(schnecke, target_weight_grams, foodDuration):
-    print(f"🥘 Dispensing food until {target_weight_grams}g is reached...")
-    #TODO fix this
+def dispense_food(silo, target_weight_grams, foodDuration):
+    """Runs the silo's auger for foodDuration seconds of flow, or until the plate scale shows the target.
+
+    Stalls are detected and cleared by auger.py; returns its (outcome, ms of
+    flow, dg dispensed or None, stalls).
+    """
+    log.info("Dispensing food until %sg is reached...", target_weight_grams)
     hx_entry.powerDown()
     time.sleep(0.1)  # Allow HX711 to stabilize
-    #hx_plate.powerUp()
-    time.sleep(0.1)  # Allow HX711 to stabilize
-    # Get initial weight
-    #hx_plate.tare()  # Reset tare to zero
-    #initial_weight = 0# abs(hx_plate.read()) * 3.3
-    #if initial_weight == -1:
-    #    print("❌ Cannot read initial weight, aborting dispensing")
-    #    return
-    #
-    #target_total_weight = initial_weight + target_weight_grams
-    #print(f"📊 Initial weight: {initial_weight}g, Target total: {target_total_weight}g")
-    
-    schnecke.off()  # Start dispensing
-    time.sleep(foodDuration)
-    #try:
-    #    while True:
-    #        consecutive_reaches = 0  # Counter for consecutive target weight reaches
-    #        
-    #        while True:
-    #            current_weight = hx_plate.read()
-    #            if current_weight == -1:
-    #                print("❌ Scale reading failed during dispensing")
-    #                break
-    #            
-    #            dispensed_amount = current_weight - initial_weight
-    #            print(f"📊 Current: {current_weight}g, Dispensed: {dispensed_amount}g")
-    #            
-    #            if current_weight >= target_total_weight:
-    #                consecutive_reaches += 1
-    #                if consecutive_reaches >= 2:  # Require two consecutive confirmations
-    #                    print(f"✅ Target weight reached! Dispensed {dispensed_amount}g")
-    #                    break
-    #            else:
-    #                consecutive_reaches = 0  # Reset counter if target not reached
-    #            
-    #            time.sleep(0.5)  # Check weight every 0.5 seconds
-    #        
-    #finally:
-    #    schnecke.on()  # Always turn off the motor
-    #    print("✅ Food dispensing complete")
-    schnecke.on()  # Always turn off the motor
+    if hx_plate is not None:
+        hx_plate.powerUp()
+        time.sleep(0.1)  # Allow HX711 to stabilize
+        hx_plate.tare()  # the run weighs what arrives on the plate from zero
+    result = augers[silo].run(foodDuration, flow_sensor, int(target_weight_grams * 10) if hx_plate else 0,
+                              STALL_MS, UNJAM_ATTEMPTS)
     hx_entry.powerUp()
     time.sleep(0.1)  # Allow HX711 to stabilize
-    print("✅ Food dispensing complete")
+    if result[3]:
+        log.warning("Auger %s stalled %s times: %s", silo, result[3], result[0])
+    log.info("Food dispensing complete")
+    return result
+
+
+def eaten_dg(result):
+    """Decigrams eaten, weighed once the pet has left, or None without a plate scale.
+
+    The plate was tared before the run, so what is left now is the portion
+    that arrived (result of dispense_food) minus what was eaten.
+    """
+    if hx_plate is None or result is None or result[2] is None:
+        return None
+    try:
+        left_dg = hx_plate.read_dg()
+    except Exception as e:
+        log.error("Plate scale read failed: %s", e)
+        return None
+    return max(0, result[2] - left_dg)
+
+
+def report_dispense(rfid, silo, result):
+    """Posts a monitored auger run (flow time, grams, stalls) to the backend."""
+    outcome, flowed_ms, dispensed_dg, stalls = result
+    if outcome == auger.UNMONITORED or not supervisor.backend_ok:
+        return
+    try:
+        resp = post("/device/dispense", ujson.dumps({
+            "device": push.device_id, "rfid": rfid, "silo": silo, "outcome": outcome,
+            "seconds": flowed_ms / 1000, "grams": None if dispensed_dg is None else dispensed_dg / 10,
+            "jams": stalls}).encode(), JSON_HEADERS)
+        resp.close()
+    except Exception as e:
+        log.error("Dispense report failed: %s", e)
+        supervisor.report_failure()
 
 
 def read_scale(hx):
-    print("⚖️ Reading scale...")
+    log.info("Reading scale...")
     try:
         val = hx.read()
         result = val if val is not None else -1
-        print(f"📊 Scale reading: {result}")
+        log.info("Scale reading: %s", result)
         return result
     except Exception as e:
-        print(f"❌ Scale reading failed: {e}")
+        log.error("Scale reading failed: %s", e)
         return -1
 
 
 def cat_inside(catDetectionWeightEvent):
-    try:
-        # Try to get a reading from the HX711
-        try:
-            raw_weight = hx_entry.read()
-        except Exception as read_error:
-            print(f"❌ HX711 read error: {read_error}")
-            return False
-        
-        # Handle None or invalid readings
-        if raw_weight is None:
-            print("❌ No weight reading available")
-            return False
-        
-        # Simple type checking and conversion
-        try:
-            if isinstance(raw_weight, str):
-                # Try to convert string to number
-                weight_num = float(raw_weight)
-            elif isinstance(raw_weight, (int, float)):
-                weight_num = float(raw_weight)
-            else:
-                print(f"❌ Unexpected weight type: {type(raw_weight)}")
-                return False
-            
-            # Apply calibration factor
-            weight = abs(weight_num) * 3.3
-            
-        except (ValueError, TypeError) as conv_error:
-            print(f"❌ Weight conversion error: {conv_error}")
-            return False
-            
-        # Check if cat is inside
-        inside = weight > catDetectionWeightEvent
-        print(f"Cat detection: {'INSIDE' if inside else 'OUTSIDE'} (weight: {weight:.1f}g, threshold: {catDetectionWeightEvent}g)")
-        
-        return inside
+    """Entry scale check, polled every second while the door is open.
 
-    except Exception as e:
-        print(f"❌ Cat detection failed: {e}")
+    Works in integer decigrams throughout (no boxed floats on the heap);
+    the threshold is in grams.
+    """
+    try:
+        # Apply calibration factor (x3.3)
+        weight_dg = abs(hx_entry.read_dg()) * 33 // 10
+    except Exception as read_error:
+        log.error("HX711 read error: %s", read_error)
         return False
 
+    # Check if cat is inside
+    inside = weight_dg > catDetectionWeightEvent * 10
+    body_weight.add(weight_dg if inside else 0)
+    if _DEBUG:
+        log.debug("Cat detection: %s (weight: %d dg, threshold: %d g)",
+                  "INSIDE" if inside else "OUTSIDE", weight_dg, catDetectionWeightEvent)
+    return inside
+
 
 def check_silo_fill(silo):
-    print(f"📏 Checking silo {silo} fill level...")
+    log.info("Checking silo %s fill level...", silo)
     try:
         if silo == 1:
             dist = ultra_silo1.distance_cm()
         elif silo == 2:
             # dist = ultra_silo2.distance_cm()
-            print("⚠️ Silo 2 sensor not functional")
+            log.warning("Silo 2 sensor not functional")
             return 10  # Assume good fill level
         else:
-            print(f"❌ Invalid silo number: {silo}")
+            log.error("Invalid silo number: %s", silo)
             return -1
-        print(f"📏 Silo {silo} distance: {dist}cm")
+        log.info("Silo %s distance: %scm", silo, dist)
         return dist
     except Exception as e:
-        print(f"❌ Silo fill check failed: {e}")
+        log.error("Silo fill check failed: %s", e)
         return -1
 
 
 def close_cd(plate):
-    print(f"📀 Closing CD tray for plate {plate}...")
+    log.info("Closing CD tray for plate %s...", plate)
     if plate == 2:
         CD1_CTRL(0)
         time.sleep(0.2)
@@ -309,133 +529,171 @@ def close_cd(plate):
         CD2_CTRL(1)
     elif plate == 0:
         CD_POWER(0)
-    print(f"✅ CD tray {plate} closed")
+    log.info("CD tray %s closed", plate)
 
 
 # --- MAIN LOOP ---
 def main():
-    print("Starting main feeding loop...")
-    
-    if not check_connection():
-        print("❌ Cannot start - backend not available")
-        return
+    global config_due, firmware_due
+    log.info("Starting main feeding loop...")
+
+    log.info("Checking backend connection...")
+    if not supervisor.probe():
+        log.warning("Backend not available yet - retrying in the background")
+    update_config()
+    supervisor.start()
+    push.start()
+
+    log.info("Main loop started - waiting for RFID scans...")
+    last_telemetry = time.ticks_ms()
+    last_log_ship = last_telemetry
+    last_config_check = last_firmware_check = started = last_telemetry
 
-    print("Main loop started - waiting for RFID scans...")
-    
     while True:
-        print("\n" + "="*50)
-        print("Waiting for RFID...")
+        if _DEBUG:
+            log.debug("Waiting for RFID...")
         rfid = read_rfid()  # Read RFID UID
         
         if rfid:
-            print(f"RFID detected: {rfid}")
+            log.info("RFID detected: %s", rfid)
             # pet = get_pet(rfid)  # Authenticate pet using backend API
-            data = urequests.post(f"{API_BASE}/feeding/check/{rfid}")
-            # for test changed to = 404
-            if data.status_code == 404:
+            check = request_feeding_check(rfid)
+            # for test: run the feeding cycle for tags the backend does not know (404)
+            if check is None:
+                pass  # backend down, the supervisor is already on it
+            elif check[0] in (devproto.UNKNOWN_PET, devproto.NO_SCHEDULE):
                 # Calibrate HX711 scales
-                print("Calibrating scales...")
+                log.info("Calibrating scales...")
                 hx_entry.powerUp()
                 time.sleep(0.1)  # Allow HX711 to stabilize
                 entryScaleInitialWeight = 0 #abs(hx_entry.read()) * 3.3 # Adjusted for calibration factor
-                catDetectionWeightEvent = entryScaleInitialWeight + threshhold
+                catDetectionWeightEvent = entryScaleInitialWeight + CAT_THRESHOLD
                 hx_entry.tare()  # Reset tare to zero
-                print(f"Entry scale initial weight: {entryScaleInitialWeight}")
-                print(f"Cat detection threshold: {catDetectionWeightEvent}")
+                log.info("Entry scale initial weight: %s", entryScaleInitialWeight)
+                log.info("Cat detection threshold: %s", catDetectionWeightEvent)
 
                 data = {"name": "DummyPet", "silo": 2, "foodamount": 100, "foodDuration": 5}
-                print(f"Pet authenticated: {data['name']}")
+                log.info("Pet authenticated: %s", data['name'])
                 assigned_silo = data.get("silo")
-                print(f"Assigned silo: {assigned_silo}")
+                log.info("Assigned silo: %s", assigned_silo)
                 
                 # Check silo fill-level before proceeding
                 fill_distance = check_silo_fill(assigned_silo)
-                max_distance = 30  # Distance when silo is empty
-                min_distance = 5   # Distance when silo is full
 
-                if fill_distance > max_distance:
-                    print(f"Silo {assigned_silo} possibly empty! Distance: {fill_distance}cm")
+                if fill_distance > SILO_EMPTY_CM:
+                    log.warning("Silo %s possibly empty! Distance: %scm", assigned_silo, fill_distance)
                     continue
-                elif fill_distance <= max_distance and fill_distance > min_distance:
-                    fill_percentage = int((max_distance - fill_distance) / (max_distance - min_distance) * 100)
-                    print(f"Silo {assigned_silo} fill level: {fill_percentage}%")
-                elif fill_distance <= min_distance:
-                    print(f"Silo {assigned_silo} is full! Distance: {fill_distance}cm")
+                elif fill_distance <= SILO_EMPTY_CM and fill_distance > SILO_FULL_CM:
+                    fill_percentage = int((SILO_EMPTY_CM - fill_distance) / (SILO_EMPTY_CM - SILO_FULL_CM) * 100)
+                    log.info("Silo %s fill level: %s%%", assigned_silo, fill_percentage)
+                elif fill_distance <= SILO_FULL_CM:
+                    log.info("Silo %s is full! Distance: %scm", assigned_silo, fill_distance)
                 
-                print("Unlocking entry...")
+                log.info("Unlocking entry...")
                 unlock_servo(entry_servo)
                 hx_entry.powerUp()  # Power up the HX711 for entry scale
                 hx_entry.read()
+                body_weight.reset()
                 time.sleep(1)  # Wait for servo to unlock
                 start_time = time.time()
                 consecutive_detections = 0
 
-                while time.time() - start_time < 30:
+                while time.time() - start_time < ENTRY_TIMEOUT:
                     if cat_inside(catDetectionWeightEvent):
                         consecutive_detections += 1
                         if consecutive_detections >= 3:  # Require 3 consecutive detections
-                            print("✅ Cat entered, proceeding with feeding cycle")
+                            log.info("Cat entered, proceeding with feeding cycle")
                             break
                     else:
                         consecutive_detections = 0  # Reset if detection fails
                     time.sleep(1)  # Check every second
                 else:
-                    print("❌ No cat entered within 30 seconds, aborting feeding cycle")
+                    log.warning("No cat entered within %s seconds, aborting feeding cycle", ENTRY_TIMEOUT)
                     continue
                 
-                print("Cat detected inside, proceeding with feeding...")
+                log.info("Cat detected inside, proceeding with feeding...")
                 
                 # Close the entry servo
-                print("Closing entry servo...")
+                log.info("Closing entry servo...")
                 lock_servo(entry_servo)
 
+                dispensed = None
                 if assigned_silo == 1:
-                    print("Opening plate 1 and dispensing from silo 1")
+                    log.info("Opening plate 1 and dispensing from silo 1")
                     close_cd(1)
-                    dispense_food(schnecke1, data['foodamount'], data['foodDuration'])
+                    dispensed = dispense_food(1, data['foodamount'], portion_seconds or data['foodDuration'])
                 elif assigned_silo == 2:
-                    print("Opening plate 2 and dispensing from silo 2")
+                    log.info("Opening plate 2 and dispensing from silo 2")
                     close_cd(2)
-                    dispense_food(schnecke2,data['foodamount'], data['foodDuration'])
+                    dispensed = dispense_food(2, data['foodamount'], portion_seconds or data['foodDuration'])
                 
-                #scale = read_scale(hx_plate)
-                #confirm_feeding(rfid, scale)
-
                 # Warten bis Katze wieder raus ist
-                print("Waiting for cat to exit...")
+                log.info("Waiting for cat to exit...")
                 consecutive_no_detections = 0
 
                 while True:
                     if not cat_inside(catDetectionWeightEvent):
                         consecutive_no_detections += 1
                         if consecutive_no_detections >= 3:  # Require 3 consecutive non-detections
-                            print("✅ Cat has exited")
+                            log.info("Cat has exited")
                             break
                     else:
                         consecutive_no_detections = 0  # Reset if cat still detected
-                        print("Cat still inside...")
+                        log.info("Cat still inside...")  # rate limited by log
                     time.sleep(1)  # Check every second
                 
-                print("✅ Feeding cycle complete")
+                if dispensed is not None:
+                    report_dispense(rfid, assigned_silo, dispensed)
+                if dispensed is not None and dispensed[0] == auger.JAMMED:
+                    # Nothing (or not all) came out: the portion is not booked. The backend releases
+                    # the grant on the jam report, so the pet may try again once the auger is cleared
+                    log.error("Auger %s jammed, feeding not confirmed", assigned_silo)
+                else:
+                    confirm_feeding(rfid, max(0, SILO_EMPTY_CM - fill_distance), body_weight.estimate(),
+                                    eaten_dg(dispensed))
+
+                log.info("Feeding cycle complete")
                 time.sleep(5)
                 close_cd(0)  # Close CD tray after feeding
                 
             else:
-                print(f"Unknown pet with RFID {rfid}, notifying backend")
+                log.info("Unknown pet with RFID %s, notifying backend", rfid)
                 try:
-                    urequests.get(f"{API_BASE}/dashboard/unknown-rfids?rfid={rfid}")
-                    print("✅ Unknown RFID reported to backend")
+                    urequests.get(f"{API_BASE}/dashboard/unknown-rfids?rfid={rfid}",
+                                  timeout=REQUEST_TIMEOUT).close()
+                    log.info("Unknown RFID reported to backend")
                 except Exception as e:
-                    print(f"❌ Failed to report unknown RFID: {e}")
+                    log.error("Failed to report unknown RFID: %s", e)
+                    supervisor.report_failure()
         
+        else:
+            apply_push_events()
+            if time.ticks_diff(time.ticks_ms(), last_telemetry) >= TELEMETRY_INTERVAL * 1000:
+                send_telemetry()
+                report_firmware()
+                last_telemetry = time.ticks_ms()
+            if log.pending() and (len(log.pending()) >= LOG_SHIP_BATCH or
+                                  time.ticks_diff(time.ticks_ms(), last_log_ship) >= LOG_SHIP_INTERVAL * 1000):
+                ship_logs()
+                last_log_ship = time.ticks_ms()
+            if config_due or time.ticks_diff(time.ticks_ms(), last_config_check) >= CONFIG_CHECK_INTERVAL * 1000:
+                config_due = False
+                update_config()
+                last_config_check = time.ticks_ms()
+            if devconfig.trial and time.ticks_diff(time.ticks_ms(), started) >= devconfig.CONFIRM_WITHIN * 1000:
+                # Pins or apiBase changed and no backend answered since: back to the settings that worked
+                log.error("New config did not reach the backend, restoring the previous one")
+                devconfig.fail()
+                machine.reset()
+            if ota.trial and time.ticks_diff(time.ticks_ms(), started) >= ota.CONFIRM_AFTER * 1000:
+                ota.confirm()
+            if firmware_due or time.ticks_diff(time.ticks_ms(), last_firmware_check) >= FIRMWARE_CHECK_INTERVAL * 1000:
+                firmware_due = False
+                check_firmware()
+                last_firmware_check = time.ticks_ms()
+
         time.sleep(0.5)
 
 if __name__ == '__main__':
+    log.info("Starting Pet Food Dispenser...")
     main()
-
-# Actually run the main function
-print("Starting Pet Food Dispenser...")
-main()
-# Actually run the main function
-print("Starting Pet Food Dispenser...")
-main()
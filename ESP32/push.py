@@ -0,0 +1,86 @@
+# push.py - Long-poll client for backend change notifications
+
+import _thread
+import log
+import sign
+import time
+import urequests
+
+_NOTHING = ((), False)
+
+
+class PushClient:
+    """Follows /device/events on a background thread.
+
+    Events are queued and handed to the feeding loop via ``pop()`` so they
+    are only applied between cycles. ``seq`` is the last sequence seen and
+    is sent back on every poll, so a dropped connection resumes without
+    losing events; ``epoch`` identifies the backend's event log that seq
+    belongs to. ``resync`` is set when the backend could not resume (boot,
+    backend restart or too far behind) and local state should be refreshed.
+    """
+
+    def __init__(self, api_base, device_id, supervisor, poll_timeout=25):
+        self.api_base = api_base
+        self.device_id = device_id
+        self.supervisor = supervisor
+        self.poll_timeout = poll_timeout
+        self.seq = -1
+        self.epoch = None
+        self.resync = False
+        self.pending = []
+        self.running = False
+        self._lock = _thread.allocate_lock()
+        self._headers = {"X-Device-Id": device_id}
+
+    def poll_once(self):
+        path = f"/device/events?device={self.device_id}&since={self.seq}&timeout={self.poll_timeout}"
+        if self.epoch:
+            path += "&epoch=" + self.epoch
+        resp = urequests.get(self.api_base + path, headers=sign.apply(self._headers, "GET", path),
+                             timeout=self.poll_timeout + 5)
+        try:
+            if resp.status_code != 200:
+                return False
+            data = resp.json()
+        finally:
+            resp.close()
+        with self._lock:
+            if data["reset"]:
+                self.resync = True
+            self.pending.extend(data["events"])
+            self.seq = data["seq"]
+            self.epoch = data.get("epoch")
+        return True
+
+    def pop(self):
+        """Returns (events, resync) queued since the last call."""
+        if not (self.pending or self.resync):
+            return _NOTHING  # idle loop: no list or tuple to allocate
+        with self._lock:
+            events, self.pending = self.pending, []
+            resync, self.resync = self.resync, False
+        return events, resync
+
+    def _run(self):
+        while self.running:
+            if not self.supervisor.backend_ok:
+                time.sleep(1)
+                continue
+            try:
+                ok = self.poll_once()
+            except Exception as e:
+                log.error("Event poll failed: %s", e)
+                ok = False
+            if not ok:
+                self.supervisor.report_failure()
+                time.sleep(self.supervisor.delay())
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,110 @@
+# sign.py - HMAC-SHA256 signing of the feeder's backend requests
+#
+# Mirrors backend/device_auth.py. The key is read once from KEY_FILE (hex,
+# created on the backend with "python device_auth.py add <device id>");
+# without one, requests go out unsigned. The inner and outer HMAC pads are
+# built once, so a signature costs two SHA-256 runs over the request. The
+# feeder has no real-time clock: the supervisor passes the backend's time
+# from every health probe to sync_time(), and timestamps are derived from it.
+#
+#     sign.apply(headers, "POST", "/device/feeding/check", frame)
+#
+# adds X-Device-Id, X-Timestamp, X-Nonce and X-Signature to `headers`, which
+# is meant to be one dict reused for every request of a kind. check() verifies
+# a response the backend signed for this feeder (the firmware plan, ota.py;
+# the config document, devconfig.py):
+# the HMAC of "<device>\n<what was asked>\n<timestamp>\n" + body, with the
+# timestamp no more than SKEW seconds off now().
+
+import hashlib
+import os
+import time
+import ubinascii
+
+KEY_FILE = "device.key"
+SKEW = 120           # seconds a signed response's timestamp may be off, as on the backend
+
+device_id = None
+_ipad = None
+_opad = None
+_offset = None       # backend unix time - time.time(), set by sync_time()
+
+
+def init(dev_id):
+    """Loads the key; False if the feeder has none (requests stay unsigned)."""
+    global device_id, _ipad, _opad
+    device_id = dev_id
+    try:
+        with open(KEY_FILE) as f:
+            key = ubinascii.unhexlify(f.read().strip())
+    except (OSError, ValueError):
+        return False
+    if len(key) > 64:
+        key = hashlib.sha256(key).digest()
+    key = key + bytes(64 - len(key))
+    _ipad = bytes(b ^ 0x36 for b in key)
+    _opad = bytes(b ^ 0x5C for b in key)
+    return True
+
+
+def sync_time(server_time):
+    global _offset
+    _offset = int(server_time) - int(time.time())
+
+
+def now():
+    """Backend unix time, None before the first sync_time()."""
+    return None if _offset is None else int(time.time()) + _offset
+
+
+def ready():
+    return _ipad is not None and _offset is not None
+
+
+def has_key():
+    return _ipad is not None
+
+
+def _equal(a, b):
+    """Constant-time comparison, like hmac.compare_digest on the backend."""
+    if len(a) != len(b):
+        return False
+    diff = 0
+    for x, y in zip(a, b):
+        diff |= x ^ y
+    return diff == 0
+
+
+def check(body, signature, asked, stamp):
+    """True if `signature` is the backend's HMAC of a recent response to `asked` for this feeder."""
+    current = now()
+    if _ipad is None or not signature or not stamp or current is None:
+        return False
+    try:
+        if abs(int(stamp) - current) > SKEW:
+            return False
+    except ValueError:
+        return False
+    inner = hashlib.sha256(_ipad)
+    inner.update(("%s\n%s\n%s\n" % (device_id, asked, stamp)).encode())
+    inner.update(body)
+    digest = hashlib.sha256(_opad + inner.digest()).digest()
+    return _equal(ubinascii.hexlify(digest), signature.encode())
+
+
+def apply(headers, method, path, body=b""):
+    """Adds the signature headers for this request to `headers` and returns it."""
+    if not ready():
+        return headers
+    stamp = str(now())
+    nonce = ubinascii.hexlify(os.urandom(8)).decode()
+    inner = hashlib.sha256(_ipad)
+    inner.update(("%s\n%s\n%s\n%s\n%s\n" % (device_id, stamp, nonce, method, path)).encode())
+    if body:
+        inner.update(body)
+    signature = hashlib.sha256(_opad + inner.digest()).digest()
+    headers["X-Device-Id"] = device_id
+    headers["X-Timestamp"] = stamp
+    headers["X-Nonce"] = nonce
+    headers["X-Signature"] = ubinascii.hexlify(signature).decode()
+    return headers
@@ -0,0 +1,7 @@
+"""Host-side simulator for the feeder firmware.
+
+Nothing in this package is uploaded to the ESP32. It provides CPython
+stand-ins for the MicroPython modules and peripherals used by
+``petfooddispenser.py`` so the unmodified firmware loop can be driven
+under a simulated clock against the real backend.
+"""
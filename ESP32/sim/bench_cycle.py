@@ -0,0 +1,199 @@
+"""Feeding-cycle benchmark: firmware loop vs. the real backend, simulated clock.
+
+Run from the ESP32 folder:
+
+    python -m sim.bench_cycle --cats 300
+    python -m sim.bench_cycle --scenario hesitant --json results.json
+
+Every scenario imports a fresh ``petfooddispenser`` wired to fake hardware,
+resets the backend datasets and lets simulated cats walk through the loop.
+Phases are measured from hardware events (servo, auger, tray pins), so the
+firmware itself is not instrumented.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sim.backend import InProcessBackend  # noqa: E402
+from sim.fakes import FIRMWARE_DIR, Cat, SimulationComplete, World, load_firmware  # noqa: E402
+from sim.heap import HeapModel  # noqa: E402
+
+# (name, start mark, end mark)
+PHASES = [
+    ("backend_check", "scan", "checked"),
+    ("silo_check", "checked", "unlock"),
+    ("entry", "unlock", "lock"),
+    ("plate_open", "lock", "dispense_start"),
+    ("dispense", "dispense_start", "dispense_end"),
+    ("exit", "dispense_end", "tray_reset"),
+    ("rearm", "tray_reset", "ready"),
+]
+
+# Derived spans that overlap the phases above.
+SPANS = [
+    ("scan_to_lock", "scan", "lock"),
+    ("scan_to_food", "scan", "dispense_end"),
+    ("detect_lag", "cat_enter", "lock"),
+    ("exit_lag", "cat_leave", "tray_reset"),
+    ("total", "scan", "ready"),
+]
+
+
+def _cats(rng, count, entry, eat, never_enters=0.0, registered=False):
+    cats = []
+    for _ in range(count):
+        delay = None if rng.random() < never_enters else rng.uniform(*entry)
+        cats.append(Cat(Cat.random_uid(rng), weight=rng.uniform(3000, 6000),
+                        entry_delay=delay, eat_time=rng.uniform(*eat),
+                        registered=registered))
+    return cats
+
+
+# The firmware currently runs the feeding path for tags the backend answers
+# with 404 (test mode), so unregistered cats exercise the full cycle.
+SCENARIOS = {
+    "baseline": lambda rng, n: _cats(rng, n, entry=(0.5, 5), eat=(20, 120)),
+    "hesitant": lambda rng, n: _cats(rng, n, entry=(5, 25), eat=(20, 120), never_enters=0.1),
+    "quick-snack": lambda rng, n: _cats(rng, n, entry=(0.2, 1), eat=(2, 10)),
+    "registered": lambda rng, n: _cats(rng, n, entry=(0.5, 5), eat=(20, 120), registered=True),
+}
+
+
+def run_scenario(name, cats=200, seed=1, rtt_ms=30.0, heap=False, idle_polls=20):
+    rng = random.Random(seed)
+    world = World(SCENARIOS[name](rng, cats), seed=seed, idle_polls=idle_polls if heap else 0)
+    if heap:
+        world.heap = HeapModel(os.path.join(FIRMWARE_DIR, f) for f in os.listdir(FIRMWARE_DIR) if f.endswith(".py"))
+    backend = InProcessBackend(world, rtt_ms=rtt_ms)
+    for cat in world.queue:
+        if cat.registered:
+            backend.register(cat)
+
+    # Files the firmware writes (config cache, update state) go to a scratch "flash"
+    cwd = os.getcwd()
+    with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as flash:
+        os.chdir(flash)
+        firmware = load_firmware(world)
+        firmware.wifi.wlan_sta = firmware.wifi.network.WLAN(firmware.wifi.network.STA_IF)  # as after init_wifi()
+        world.bind(firmware)
+        if world.heap:
+            world.heap.start()
+        try:
+            firmware.main()
+        except SimulationComplete:
+            pass
+        finally:
+            if world.heap:
+                world.heap.stop()
+            os.chdir(cwd)
+    result = summarize(name, world.cycles, backend.requests)
+    if world.heap:
+        result["heap"] = world.heap.report(len(world.cycles))
+        result["heap"]["idle_polls"] = idle_polls
+    return result
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _stats(values):
+    if not values:
+        return None
+    return {
+        "n": len(values),
+        "mean": sum(values) / len(values),
+        "p50": _percentile(values, 50),
+        "p95": _percentile(values, 95),
+        "max": max(values),
+    }
+
+
+def summarize(name, cycles, requests):
+    spans = {}
+    for label, start, end in PHASES + SPANS:
+        values = [c["marks"][end] - c["marks"][start] for c in cycles
+                  if start in c["marks"] and end in c["marks"]]
+        spans[label] = _stats(values)
+    completed = sum(1 for c in cycles if "tray_reset" in c["marks"])
+    weighed = [c for c in cycles if "tray_reset" in c["marks"] and c.get("body_weight") is not None]
+    weight_error = _stats([abs(c["body_weight"] - c["cat"].weight) for c in weighed])
+    total = spans["total"]["mean"] if spans["total"] else 0
+    share = {}
+    for label, _, _ in PHASES:
+        if spans[label] and total:
+            share[label] = spans[label]["mean"] * spans[label]["n"] / len(cycles) / total
+    return {
+        "scenario": name,
+        "cycles": len(cycles),
+        "completed": completed,
+        "not_fed": len(cycles) - completed,
+        "backend_requests": requests,
+        "spans": spans,
+        "share": share,
+        "weighed": len(weighed),
+        "weight_error": weight_error,
+    }
+
+
+def print_report(result):
+    print("\n== %s: %d cycles, %d fed, %d not fed, %d backend requests =="
+          % (result["scenario"], result["cycles"], result["completed"],
+             result["not_fed"], result["backend_requests"]))
+    print("%-15s %8s %8s %8s %8s %7s" % ("phase", "mean s", "p50 s", "p95 s", "max s", "share"))
+    for label, _, _ in PHASES + SPANS:
+        stats = result["spans"][label]
+        if stats is None:
+            continue
+        share = result["share"].get(label)
+        print("%-15s %8.2f %8.2f %8.2f %8.2f %7s" % (
+            label, stats["mean"], stats["p50"], stats["p95"], stats["max"],
+            "%5.1f%%" % (share * 100) if share is not None else ""))
+    heap = result.get("heap")
+    if heap:
+        print("heap (modelled): %.0f allocations / %.1f KB per cycle incl. %d idle polls, %d GC runs on a %d KB heap"
+              % (heap["per_cycle"], heap["bytes_per_cycle"] / 1024, heap["idle_polls"],
+                 heap["gc_runs"], heap["heap_bytes"] // 1024))
+        print("  %-40s %8s %10s  %s" % ("function", "calls", "allocs/call", "kinds"))
+        for row in heap["functions"][:12]:
+            print("  %-40s %8d %10.1f  %s" % (row["function"], row["calls"], row["per_call"],
+                                                ", ".join("%s %d" % kv for kv in sorted(row["kinds"].items()))))
+    error = result["weight_error"]
+    if error is not None:
+        print("body weight: %d of %d fed cats weighed, abs error mean %.1f g, p95 %.1f g"
+              % (result["weighed"], result["completed"], error["mean"], error["p95"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--cats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rtt-ms", type=float, default=30.0, help="simulated network round trip")
+    parser.add_argument("--json", help="write the results to this file for tracking")
+    parser.add_argument("--heap", action="store_true",
+                        help="trace the firmware and report modelled heap allocations and GC runs")
+    parser.add_argument("--idle-polls", type=int, default=20, help="idle RFID polls per cycle with --heap")
+    args = parser.parse_args(argv)
+
+    names = sorted(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = [run_scenario(n, cats=args.cats, seed=args.seed, rtt_ms=args.rtt_ms, heap=args.heap,
+                            idle_polls=args.idle_polls) for n in names]
+    for result in results:
+        print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+"""Fake MicroPython modules and peripherals backed by a simulated world.
+
+``firmware_modules(world)`` swaps the fakes into ``sys.modules`` while a
+firmware module is imported, so its ``import time``, ``import machine`` etc.
+bind to objects driven by ``World`` instead of real hardware.
+"""
+import asyncio
+import binascii
+import contextlib
+import importlib
+import json
+import os
+import random
+import struct
+import sys
+import types
+from collections import deque
+
+
+class SimulationComplete(Exception):
+    """Raised by the fake RFID reader once every simulated cat was served."""
+
+
+# ----------- Simulated clock -----------
+
+class Clock:
+    """Virtual time source; sleeping advances it instantly."""
+
+    def __init__(self):
+        self.now = 0.0  # seconds since simulation start
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+    def module(self, name="time"):
+        """Build a module object exposing the MicroPython ``time`` API."""
+        clock = self
+        mod = types.ModuleType(name)
+        mod.time = lambda: int(clock.now)  # MicroPython returns whole seconds
+        mod.time_ns = lambda: int(clock.now * 1_000_000_000)
+        mod.sleep = clock.advance
+        mod.sleep_ms = lambda ms: clock.advance(ms / 1000)
+        mod.sleep_us = lambda us: clock.advance(us / 1_000_000)
+        mod.ticks_ms = lambda: int(clock.now * 1000)
+        mod.ticks_us = lambda: int(clock.now * 1_000_000)
+        mod.ticks_add = lambda ticks, delta: ticks + delta
+        mod.ticks_diff = lambda new, old: new - old
+        mod.localtime = lambda secs=None: (2000, 1, 1, 0, 0, int(clock.now if secs is None else secs) % 60, 5, 1)
+        return mod
+
+
+# ----------- Cats and the physical world -----------
+
+class Cat:
+    """One simulated visit: a tag, a body weight and how the cat behaves."""
+
+    def __init__(self, uid, weight, entry_delay, eat_time, registered=False):
+        self.uid = uid                  # 5 raw bytes as returned by anticoll()
+        self.weight = weight            # grams on the entry scale
+        self.entry_delay = entry_delay  # seconds after unlock, None = never enters
+        self.eat_time = eat_time        # seconds on the scale after food arrives
+        self.registered = registered
+
+    @property
+    def rfid(self):
+        return "".join("%02X" % b for b in self.uid)
+
+    @staticmethod
+    def random_uid(rng):
+        uid = [rng.randrange(256) for _ in range(4)]
+        return uid + [uid[0] ^ uid[1] ^ uid[2] ^ uid[3]]
+
+
+class World:
+    """Shared physical state observed and changed by the fake peripherals.
+
+    The world records timestamped marks for every visit so the benchmark can
+    split a cycle into phases without touching the firmware.
+    """
+
+    ENTRY_CALIBRATION = 3.3  # firmware multiplies entry readings by this
+
+    def __init__(self, cats, seed=0, idle_polls=0):
+        self.clock = Clock()
+        self.rng = random.Random(seed)
+        self.queue = deque(cats)
+        self.cycles = []
+        self.active = None
+        self.silo_distance_cm = 12.0
+        self.http_transport = None
+        self.servo_pin = None
+        self.unlock_duty = None
+        self.lock_duty = None
+        self.motor_pins = ()
+        self.tray_power = None
+        self.tray_ctrl = ()
+        self.body_weight = None
+        self.idle_polls = idle_polls  # empty RFID polls between two visits
+        self._idle_left = 0
+        self.heap = None              # sim.heap.HeapModel backing the fake gc module
+
+    def bind(self, firmware):
+        """Learn pin numbers and servo positions from the loaded firmware."""
+        self.servo_pin = firmware.SERVO_ENTRY_LOCK_PIN
+        self.unlock_duty = firmware.SERVO_UNLOCKED
+        self.lock_duty = firmware.SERVO_LOCK
+        self.motor_pins = (firmware.SCHNECKE1_PIN, firmware.SCHNECKE2_PIN)
+        self.tray_power = firmware.CD_POWER
+        self.tray_ctrl = (firmware.CD1_CTRL, firmware.CD2_CTRL)
+        self.body_weight = firmware.body_weight
+
+    # --- cycle bookkeeping ---
+
+    def mark(self, name):
+        if self.active is not None:
+            self.active["marks"].setdefault(name, self.clock.now)
+
+    def _finish_cycle(self):
+        self.mark("ready")
+        if self.body_weight is not None and "unlock" in self.active["marks"]:
+            self.active["body_weight"] = self.body_weight.estimate()
+        self.cycles.append(self.active)
+        self.active = None
+
+    # --- peripherals ---
+
+    def rfid_request(self):
+        if self.active is not None:
+            self._finish_cycle()
+            self._idle_left = self.idle_polls
+        if self._idle_left:
+            self._idle_left -= 1
+            return False
+        if not self.queue:
+            raise SimulationComplete()
+        return True
+
+    def rfid_anticoll(self):
+        cat = self.queue.popleft()
+        self.active = {"cat": cat, "marks": {}, "enter_at": None, "leave_at": None}
+        self.mark("scan")
+        return cat.uid
+
+    def entry_weight(self):
+        """Grams currently on the entry scale, including sensor noise."""
+        noise = self.rng.uniform(-4.0, 4.0)
+        cycle = self.active
+        if cycle is None or cycle["enter_at"] is None:
+            return noise
+        now = self.clock.now
+        if now < cycle["enter_at"]:
+            return noise
+        if cycle["leave_at"] is not None and now >= cycle["leave_at"]:
+            return noise
+        return cycle["cat"].weight + noise
+
+    def silo_distance(self, trigger_pin):
+        return self.silo_distance_cm
+
+    def on_pwm(self, pin, duty):
+        if self.active is None or pin != self.servo_pin:
+            return
+        if duty == self.unlock_duty:
+            self.mark("unlock")
+            cat = self.active["cat"]
+            if cat.entry_delay is not None and self.active["enter_at"] is None:
+                self.active["enter_at"] = self.clock.now + cat.entry_delay
+                self.active["marks"]["cat_enter"] = self.active["enter_at"]
+        elif duty == self.lock_duty and "unlock" in self.active["marks"]:
+            self.mark("lock")
+
+    def on_pin(self, pin, value):
+        if self.active is None:
+            return
+        if pin.id in self.motor_pins:
+            # Motor outputs are active low: off() starts the auger.
+            if value == 0:
+                self.mark("dispense_start")
+            elif "dispense_start" in self.active["marks"]:
+                self.mark("dispense_end")
+                if self.active["leave_at"] is None:
+                    self.active["leave_at"] = self.clock.now + self.active["cat"].eat_time
+                    self.active["marks"]["cat_leave"] = self.active["leave_at"]
+        elif pin is self.tray_power and value == 0:
+            if all(ctrl.value() for ctrl in self.tray_ctrl) and "dispense_end" in self.active["marks"]:
+                self.mark("tray_reset")
+
+    def http(self, method, url, body, headers):
+        if self.http_transport is None:
+            raise OSError(113, "EHOSTUNREACH")
+        return self.http_transport(method, url, body, headers)
+
+
+# ----------- Fake modules -----------
+
+def _machine_module(world):
+    mod = types.ModuleType("machine")
+
+    class Pin:
+        IN = 1
+        OUT = 3
+        PULL_UP = 1
+        PULL_DOWN = 2
+        IRQ_RISING = 1
+        IRQ_FALLING = 2
+
+        def __init__(self, id, mode=None, pull=None, value=None):
+            self.id = id
+            self._value = 0
+            if value is not None:
+                self.value(value)
+
+        def value(self, v=None):
+            if v is None:
+                return self._value
+            self._value = 1 if v else 0
+            world.on_pin(self, self._value)
+
+        def __call__(self, v=None):
+            return self.value(v)
+
+        def on(self):
+            self.value(1)
+
+        def off(self):
+            self.value(0)
+
+        def init(self, *args, **kwargs):
+            pass
+
+    class PWM:
+        def __init__(self, pin, freq=50, duty=None, duty_ns=None):
+            self.pin = pin
+            self._freq = freq
+            self._duty = 0
+            if duty is not None:
+                self.duty(duty)
+
+        def freq(self, value=None):
+            if value is None:
+                return self._freq
+            self._freq = value
+
+        def duty(self, value=None):
+            if value is None:
+                return self._duty
+            self._duty = value
+            world.on_pwm(self.pin.id, value)
+
+        def duty_ns(self, value=None):
+            return self.duty(value)
+
+        def deinit(self):
+            pass
+
+    class SoftSPI:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def init(self, *args, **kwargs):
+            pass
+
+        def write(self, data):
+            pass
+
+        def read(self, n, write=0):
+            return bytes(n)
+
+    class ADC:
+        # No current sense in the simulated feeder: an idle motor
+        ATTN_11DB = 3
+
+        def __init__(self, pin, atten=None):
+            self.pin = pin
+
+        def read_u16(self):
+            return 0
+
+    def reset():
+        raise SimulationComplete("machine.reset()")
+
+    mod.Pin = Pin
+    mod.ADC = ADC
+    mod.PWM = PWM
+    mod.SoftSPI = SoftSPI
+    mod.SPI = SoftSPI
+    mod.reset = reset
+    mod.freq = lambda hz=None: 160_000_000
+    mod.time_pulse_us = lambda pin, level, timeout_us=1_000_000: -1
+    mod.unique_id = lambda: b"\x00\x11\x22\x33\x44\x55"
+    return mod
+
+
+def _micropython_module():
+    mod = types.ModuleType("micropython")
+    mod.native = lambda f: f
+    mod.viper = lambda f: f
+    mod.const = lambda x: x
+    mod.mem_info = lambda *args: None
+    mod.alloc_emergency_exception_buf = lambda size: None
+    return mod
+
+
+def _urequests_module(world):
+    mod = types.ModuleType("urequests")
+
+    class Response:
+        def __init__(self, status_code, content, headers):
+            self.status_code = status_code
+            self.content = content
+            self.headers = headers
+
+        @property
+        def text(self):
+            return self.content.decode("utf-8", "replace")
+
+        def json(self):
+            return json.loads(self.content)
+
+        def close(self):
+            pass
+
+    def request(method, url, data=None, json=None, headers=None, timeout=None):
+        body = data
+        headers = dict(headers or {})
+        if json is not None:
+            body = _json_dumps(json)
+            headers.setdefault("Content-Type", "application/json")
+        if isinstance(body, str):
+            body = body.encode()
+        elif isinstance(body, (bytearray, memoryview)):
+            body = bytes(body)
+        status, content, resp_headers = world.http(method, url, body, headers)
+        return Response(status, content, resp_headers)
+
+    mod.request = request
+    mod.get = lambda url, **kw: request("GET", url, **kw)
+    mod.post = lambda url, **kw: request("POST", url, **kw)
+    mod.put = lambda url, **kw: request("PUT", url, **kw)
+    mod.delete = lambda url, **kw: request("DELETE", url, **kw)
+    mod.Response = Response
+    return mod
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _mfrc522_module(world):
+    mod = types.ModuleType("mfrc522")
+
+    class MFRC522:
+        OK = 0
+        NO_TAG_ERR = 1
+        ERR = 2
+        CARD_REQIDL = 0x26
+        AUTH = 0x60
+
+        def __init__(self, spi, cs):
+            pass
+
+        def request(self, mode):
+            return (self.OK, 0x10) if world.rfid_request() else (self.NO_TAG_ERR, 0)
+
+        def anticoll(self):
+            return self.OK, list(world.rfid_anticoll())
+
+        def poll(self, mode):
+            return self.OK if world.rfid_request() else self.NO_TAG_ERR
+
+        def anticoll_into(self, buf):
+            buf[:5] = bytes(world.rfid_anticoll())
+            return self.OK
+
+    mod.MFRC522 = MFRC522
+    return mod
+
+
+def _hcsr04_module(world):
+    mod = types.ModuleType("hcsr04")
+
+    class HCSR04:
+        def __init__(self, trigger_pin, echo_pin, echo_timeout_us=30000):
+            self.trigger_pin = trigger_pin
+
+        def distance_cm(self):
+            return world.silo_distance(self.trigger_pin)
+
+        def distance_mm(self):
+            return int(world.silo_distance(self.trigger_pin) * 10)
+
+    mod.HCSR04 = HCSR04
+    return mod
+
+
+def _hx711_module(world):
+    mod = types.ModuleType("hx711")
+
+    class HX711:
+        def __init__(self, pd_sck=14, dout=12, gain=128):
+            self.dout = dout
+            self.powered = True
+            self.offset = 0
+            self.value = 0
+            self.value_dg = 0
+
+        def powerUp(self):
+            self.powered = True
+
+        def powerDown(self):
+            self.powered = False
+
+        def isready(self):
+            return self.powered
+
+        def raw_read(self):
+            return round(world.entry_weight() / world.ENTRY_CALIBRATION, 1)
+
+        def tare(self):
+            self.offset = 0
+            return self.offset
+
+        def read(self):
+            self.value = round(self.raw_read() - self.offset, 1)
+            return self.value
+
+        def read_dg(self):
+            self.value_dg = round((world.entry_weight() / world.ENTRY_CALIBRATION - self.offset) * 10)
+            return self.value_dg
+
+    mod.HX711 = HX711
+    return mod
+
+
+def _network_module():
+    mod = types.ModuleType("network")
+    mod.STA_IF = 0
+    mod.AP_IF = 1
+
+    class WLAN:
+        """Always-associated interface; Wi-Fi itself is not simulated."""
+
+        def __init__(self, interface=0):
+            self.interface = interface
+
+        def active(self, value=None):
+            return True
+
+        def isconnected(self):
+            return True
+
+        def status(self, param=None):
+            return -55 if param == "rssi" else 5  # GOT_IP
+
+        def ifconfig(self, config=None):
+            return ("192.168.2.50", "255.255.255.0", "192.168.2.1", "192.168.2.1")
+
+        def config(self, *args, **kwargs):
+            return b"\x40\x4c\xca\x00\x00\x01" if args == ("mac",) else None
+
+        def connect(self, *args, **kwargs):
+            pass
+
+        def disconnect(self):
+            pass
+
+        def scan(self):
+            return []
+
+    mod.WLAN = WLAN
+    return mod
+
+
+def _neopixel_module():
+    mod = types.ModuleType("neopixel")
+
+    class NeoPixel(list):
+        def __init__(self, pin, n):
+            super().__init__([(0, 0, 0)] * n)
+
+        def write(self):
+            pass
+
+    mod.NeoPixel = NeoPixel
+    return mod
+
+
+def _thread_module():
+    # Background threads are not simulated; the firmware falls back to the
+    # state its foreground code establishes.
+    mod = types.ModuleType("_thread")
+    mod.start_new_thread = lambda func, args: None
+    mod.allocate_lock = lambda: contextlib.nullcontext()
+    return mod
+
+
+def _gc_module(world):
+    mod = types.ModuleType("gc")
+    heap = world.heap
+    mod.collect = heap.collect if heap else (lambda: None)
+    mod.mem_free = heap.mem_free if heap else (lambda: 200_000)
+    mod.mem_alloc = heap.mem_alloc if heap else (lambda: 100_000)
+    mod.threshold = lambda *args: -1
+    return mod
+
+
+@contextlib.contextmanager
+def firmware_modules(world):
+    """Temporarily install the fake modules into ``sys.modules``."""
+    fakes = {
+        "machine": _machine_module(world),
+        "micropython": _micropython_module(),
+        "time": world.clock.module("time"),
+        "utime": world.clock.module("utime"),
+        "urequests": _urequests_module(world),
+        "mfrc522": _mfrc522_module(world),
+        "hcsr04": _hcsr04_module(world),
+        "hx711": _hx711_module(world),
+        "network": _network_module(),
+        "neopixel": _neopixel_module(),
+        "_thread": _thread_module(),
+        "uasyncio": asyncio,
+        "ujson": json,
+        "ustruct": struct,
+        "ubinascii": binascii,
+        "gc": _gc_module(world),
+    }
+    saved = {name: sys.modules.get(name) for name in fakes}
+    sys.modules.update(fakes)
+    try:
+        yield fakes
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+FIRMWARE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _is_firmware(module):
+    path = getattr(module, "__file__", None) or ""
+    return os.path.dirname(os.path.abspath(path)) == FIRMWARE_DIR
+
+
+def load_firmware(world, name="petfooddispenser"):
+    """Import a fresh copy of a firmware module wired to ``world``.
+
+    Firmware modules it pulls in (wifi, connectivity, ...) are dropped from
+    ``sys.modules`` again so the next world gets its own copies.
+    """
+    with firmware_modules(world):
+        for mod_name in [n for n, m in sys.modules.items() if _is_firmware(m)]:
+            sys.modules.pop(mod_name)
+        try:
+            module = importlib.import_module(name)
+        finally:
+            for mod_name in [n for n, m in sys.modules.items() if _is_firmware(m)]:
+                sys.modules.pop(mod_name)
+    return module
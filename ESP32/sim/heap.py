@@ -0,0 +1,195 @@
+"""MicroPython heap model for the simulator.
+
+CPython allocates differently from MicroPython (frames, big ints), so
+counting CPython allocations would say little about the feeder. Instead the
+firmware's own bytecode is traced opcode by opcode and every operation that
+allocates on the MicroPython heap is counted:
+
+* ``str`` — f-strings, ``%``/``+`` on strings, ``hexlify``, ``join``, ...
+* ``float`` — true division, arithmetic with a float constant or a result
+  stored as float (floats are boxed on the ESP32 port)
+* ``container`` — list/tuple/dict/set displays, returning several values
+* ``closure`` — lambdas and generator expressions
+* ``exception`` — entering an ``except`` block
+
+Each allocation is charged as whole 16-byte GC blocks to a heap of
+``heap_bytes``; when it fills up a collection is counted, like
+MicroPython's allocator does. The numbers are an estimate, meant to
+compare firmware versions, not to predict exact free memory.
+"""
+import dis
+import os
+import sys
+from collections import defaultdict
+
+BLOCK = 16
+BLOCKS = {"str": 2, "float": 1, "container": 2, "closure": 2, "exception": 4}
+
+_CONTAINER_OPS = {"BUILD_LIST", "BUILD_MAP", "BUILD_SET", "BUILD_CONST_KEY_MAP", "LIST_TO_TUPLE",
+                  "CALL_FUNCTION_EX"}
+_STR_OPS = {"BUILD_STRING", "FORMAT_VALUE"}
+_TRUE_DIVIDE = {11, 24}          # BINARY_OP: a / b, a /= b
+_SEQUENCE_OPS = {0, 5, 6, 13, 18, 19}  # +, *, % and their in-place forms
+_STORE_OPS = {"STORE_FAST"}
+
+# Callables that return a new heap object on MicroPython
+ALLOCATING_CALLS = {
+    "round": "float", "float": "float",
+    "str": "str", "hex": "str", "repr": "str", "format": "str", "join": "str", "upper": "str",
+    "lower": "str", "decode": "str", "encode": "str", "strip": "str", "replace": "str",
+    "hexlify": "str", "unhexlify": "str", "bytes": "str", "bytearray": "str", "pack": "str",
+    "dumps": "str",
+    "split": "container", "list": "container", "dict": "container", "tuple": "container",
+    "sorted": "container", "enumerate": "container", "zip": "container", "loads": "container",
+}
+
+
+def _callable_name(instructions, index):
+    """Name of the callable consumed by the CALL at ``index``, found by stack depth."""
+    need = instructions[index].arg + 2  # NULL/self slot, callable, args
+    depth = 0
+    for j in range(index - 1, -1, -1):
+        ins = instructions[j]
+        if ins.opname in ("PRECALL", "KW_NAMES", "CACHE"):
+            continue
+        try:
+            depth += dis.stack_effect(ins.opcode, ins.arg, jump=False)
+        except ValueError:
+            depth += dis.stack_effect(ins.opcode, jump=False) if ins.opcode < dis.HAVE_ARGUMENT else 0
+        if depth >= need:
+            if ins.opname == "PUSH_NULL" and j + 1 < index:
+                ins = instructions[j + 1]
+            return ins.argval if isinstance(ins.argval, str) else None
+    return None
+
+
+class _CodeInfo:
+    """Per code object: what each instruction offset allocates, decided once."""
+
+    def __init__(self, code):
+        instructions = [i for i in dis.get_instructions(code) if i.opname != "CACHE"]
+        self.static = {}   # offset -> kind
+        self.stores = {}   # offset of a BINARY_OP -> name it is stored to
+        for idx, ins in enumerate(instructions):
+            kind = None
+            if ins.opname in _CONTAINER_OPS:
+                kind = "container"
+            elif ins.opname == "BUILD_TUPLE" and ins.arg:
+                kind = "container"
+            elif ins.opname in _STR_OPS:
+                kind = "str"
+            elif ins.opname == "MAKE_FUNCTION":
+                kind = "closure"
+            elif ins.opname == "PUSH_EXC_INFO":
+                kind = "exception"
+            elif ins.opname == "CALL":
+                kind = ALLOCATING_CALLS.get(_callable_name(instructions, idx))
+            elif ins.opname == "BINARY_OP":
+                operands = [instructions[k].argval for k in (idx - 1, idx - 2)
+                            if k >= 0 and instructions[k].opname == "LOAD_CONST"]
+                if ins.arg in _TRUE_DIVIDE or any(isinstance(v, float) for v in operands):
+                    kind = "float"
+                elif ins.arg in _SEQUENCE_OPS and any(isinstance(v, (str, bytes)) for v in operands):
+                    kind = "str"
+                elif idx + 1 < len(instructions) and instructions[idx + 1].opname in _STORE_OPS:
+                    self.stores[ins.offset] = instructions[idx + 1].argval
+            if kind:
+                self.static[ins.offset] = kind
+
+
+class HeapModel:
+    """Counts modelled allocations per firmware function and simulated GC runs."""
+
+    def __init__(self, files, heap_bytes=120_000):
+        self.files = {os.path.abspath(f) for f in files}
+        self.heap_bytes = heap_bytes
+        self.used = 0
+        self.collections = 0
+        self.allocations = 0
+        self.calls = defaultdict(int)                         # function -> calls
+        self.by_function = defaultdict(lambda: defaultdict(int))  # function -> kind -> count
+        self._codes = {}
+        self._pending = {}   # frame -> local name whose stored value is checked for float
+
+    # --- gc module view ---
+
+    def mem_free(self):
+        return self.heap_bytes - self.used
+
+    def mem_alloc(self):
+        return self.used
+
+    def collect(self):
+        self.collections += 1
+        self.used = 0
+
+    def alloc(self, function, kind):
+        self.allocations += 1
+        self.by_function[function][kind] += 1
+        self.used += BLOCKS[kind] * BLOCK
+        if self.used > self.heap_bytes:
+            self.collect()  # out of blocks: MicroPython collects before it fails
+
+    # --- tracing ---
+
+    def _name(self, code):
+        return "%s.%s" % (os.path.splitext(os.path.basename(code.co_filename))[0], code.co_name)
+
+    def _global_trace(self, frame, event, arg):
+        code = frame.f_code
+        if code.co_filename not in self.files and os.path.abspath(code.co_filename) not in self.files:
+            return None
+        if code not in self._codes:
+            self._codes[code] = _CodeInfo(code)
+        self.calls[self._name(code)] += 1
+        frame.f_trace_opcodes = True
+        frame.f_trace_lines = False
+        return self._local_trace
+
+    def _local_trace(self, frame, event, arg):
+        if event != "opcode":
+            return self._local_trace
+        code = frame.f_code
+        info = self._codes[code]
+        pending = self._pending.pop(frame, None)
+        if pending is not None and isinstance(frame.f_locals.get(pending), float):
+            self.alloc(self._name(code), "float")
+        offset = frame.f_lasti
+        kind = info.static.get(offset)
+        if kind:
+            self.alloc(self._name(code), kind)
+        elif offset in info.stores:
+            self._pending[frame] = info.stores[offset]
+        return self._local_trace
+
+    def start(self):
+        sys.settrace(self._global_trace)
+
+    def stop(self):
+        sys.settrace(None)
+        self._pending.clear()
+
+    # --- report ---
+
+    def report(self, cycles):
+        rows = []
+        for function, calls in self.calls.items():
+            kinds = dict(self.by_function.get(function, {}))
+            rows.append({
+                "function": function,
+                "calls": calls,
+                "allocations": sum(kinds.values()),
+                "per_call": sum(kinds.values()) / calls,
+                "kinds": kinds,
+            })
+        rows.sort(key=lambda r: (-r["allocations"], r["function"]))
+        total_bytes = sum(BLOCKS[k] * BLOCK * n for kinds in self.by_function.values() for k, n in kinds.items())
+        cycles = max(cycles, 1)
+        return {
+            "allocations": self.allocations,
+            "per_cycle": self.allocations / cycles,
+            "bytes_per_cycle": total_bytes / cycles,
+            "gc_runs": self.collections,
+            "heap_bytes": self.heap_bytes,
+            "functions": rows,
+        }
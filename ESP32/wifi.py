@@ -4,8 +4,9 @@ import os
 import ujson
 import machine
 import neopixel
-import _thread
 import time
+import uasyncio as asyncio
+import log
 
 # --- LED Setup ---
 LED_PIN = 8
@@ -27,60 +28,60 @@ def set_led(color, brightness=0.1):
         np[0] = scaled
         np.write()
     except Exception as e:
-        print(f"LED error: {str(e)}")
+        log.warning("LED error: %s", e)
 
 # --- Global variables ---
 wlan_sta = None
 config_portal_running = False
 
-# --- DNS Server: answers all queries with 192.168.4.1 ---
-
-
-def captive_dns():
-    ip = '192.168.4.1'
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 53))
-    while True:
-        try:
-            data, addr = s.recvfrom(512)
-            # Basic DNS response for any request, always with our IP
-            response = (
-                data[:2] + b'\x81\x80' + data[4:6]*2 + b'\x00\x00\x00\x00' +
-                data[12:] +
-                b'\xc0\x0c\x00\x01\x00\x01\x00\x00\x00\x1e\x00\x04' +
-                bytes([int(x) for x in ip.split('.')])
-            )
-            s.sendto(response, addr)
-        except Exception as e:
-            print("DNS error:", e)
-
 # --- Wi-Fi scan ---
 
 
 def scan_and_save_wifi():
-    print("🔍 Scanning WiFi networks...")
+    log.info("Scanning WiFi networks...")
     try:
         wlan = network.WLAN(network.STA_IF)
         wlan.active(True)
-        time.sleep(2)  # Give time for WiFi to activate
-        nets = wlan.scan()
+        nets = wlan.scan()  # blocks until the scan is done
         ssids = sorted(set(net[0].decode('utf-8', 'ignore')
                        for net in nets if net[0] and len(net[0]) > 0), key=lambda x: x.lower())
-        print(f"📡 Found {len(ssids)} networks")
+        log.info("Found %s networks", len(ssids))
         with open("wifiscan.json", "w") as f:
             ujson.dump(ssids, f)
         return True
     except Exception as e:
-        print(f"❌ WiFi scan error: {e}")
+        log.error("WiFi scan error: %s", e)
         return False
 
 # --- Save/load credentials ---
 WIFI_FILE = "wifi.json"
+# Last good association (BSSID, channel, DHCP lease) for the fast reconnect
+WIFI_CACHE_FILE = "wifi_cache.json"
+FAST_CONNECT_TIMEOUT_MS = 1500
+USE_CACHED_LEASE = True   # reuse the last DHCP lease as static IP on the fast path
+# MicroPython does not expose the lease time the router granted; a cached lease
+# older than this (RTC seconds since it was obtained) goes back to DHCP
+LEASE_LIFETIME = 3600
+
+STATUS_NAMES = {
+    0: "IDLE",
+    1: "CONNECTING",
+    2: "WRONG_PASSWORD",
+    3: "NO_AP_FOUND",
+    4: "CONNECT_FAIL",
+    5: "GOT_IP"
+}
+
+# Duration of each connect phase in ms, refreshed on every connect
+wifi_timings = {}
+static_lease = False      # running on the cached lease instead of a DHCP client
 
 
 def save_wifi(ssid, password):
     with open(WIFI_FILE, "w") as f:
         ujson.dump({"ssid": ssid, "password": password}, f)
+    # New credentials invalidate the cached association
+    clear_wifi_cache()
 
 
 def load_wifi():
@@ -89,94 +90,244 @@ def load_wifi():
             return ujson.load(f)
     return None
 
+
+def save_wifi_cache(ssid, bssid, channel, lease, leased=None):
+    try:
+        with open(WIFI_CACHE_FILE, "w") as f:
+            ujson.dump({"ssid": ssid, "bssid": bssid, "channel": channel, "lease": lease,
+                        "leased": leased}, f)
+    except Exception as e:
+        log.warning("Could not save WiFi cache: %s", e)
+
+
+def load_wifi_cache():
+    try:
+        with open(WIFI_CACHE_FILE) as f:
+            return ujson.load(f)
+    except Exception:
+        return None
+
+
+def clear_wifi_cache():
+    try:
+        os.remove(WIFI_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _lease_valid(cache):
+    leased = cache.get("leased")
+    if not (USE_CACHED_LEASE and cache.get("lease") and leased is not None):
+        return False
+    # Negative after a power loss reset the RTC: unknown age, treat as expired
+    return 0 <= time.time() - leased < LEASE_LIFETIME
+
+
+def forget_lease():
+    """Back to DHCP after a failed request: the cached address may be stale or taken."""
+    global static_lease
+    if not static_lease:
+        return
+    static_lease = False
+    log.warning("Request failed on the cached lease, switching to DHCP")
+    cache = load_wifi_cache()
+    if cache and cache.get("lease"):
+        save_wifi_cache(cache["ssid"], cache["bssid"], cache.get("channel"), None)
+    try:
+        wlan_sta.ifconfig("dhcp")
+    except Exception:
+        pass  # the next reconnect asks DHCP anyway
+
+
+def _bssid_hex(bssid):
+    return "".join("%02x" % b for b in bssid)
+
+
+def _bssid_bytes(bssid_hex):
+    return bytes(int(bssid_hex[i:i + 2], 16) for i in range(0, len(bssid_hex), 2))
+
+
+def _mark(phase, start):
+    wifi_timings[phase] = time.ticks_diff(time.ticks_ms(), start)
+
+
+def print_timings():
+    log.info("WiFi timings: %s", ", ".join(f"{k}={v}ms" for k, v in wifi_timings.items()))
+
 # --- Wi-Fi connect ---
 
 
+def _wait_connected(timeout_ms, poll_ms=50):
+    """Polls the STA interface; returns the last status once connected or failed."""
+    start = time.ticks_ms()
+    status = wlan_sta.status()
+    while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+        if wlan_sta.isconnected():
+            return 5  # GOT_IP
+        status = wlan_sta.status()
+        if status in (2, 3):  # WRONG_PASSWORD, NO_AP_FOUND
+            return status
+        time.sleep_ms(poll_ms)
+    return status
+
+
+def _connect(creds, bssid):
+    if bssid is None:
+        wlan_sta.connect(creds["ssid"], creds["password"])
+    else:
+        wlan_sta.connect(creds["ssid"], creds["password"], bssid=bssid)
+
+
+def _remember_connection(ssid, bssid, channel):
+    lease = list(wlan_sta.ifconfig())
+    save_wifi_cache(ssid, bssid, channel, lease, time.time())
+
+
+def fast_connect(creds):
+    """Targeted reconnect using the cached BSSID/channel and lease.
+
+    Skips the scan and, with USE_CACHED_LEASE and a lease younger than
+    LEASE_LIFETIME, the DHCP round trip. Returns False without side effects
+    on the saved cache if the AP does not accept us quickly, so the caller
+    can fall back to the full path.
+    """
+    global static_lease
+    cache = load_wifi_cache()
+    if not cache or cache.get("ssid") != creds["ssid"]:
+        return False
+
+    start = time.ticks_ms()
+    use_lease = _lease_valid(cache)
+    try:
+        if cache.get("channel"):
+            try:
+                wlan_sta.config(channel=cache["channel"])
+            except Exception:
+                pass  # not every port lets the STA pin a channel
+        if use_lease:
+            wlan_sta.ifconfig(tuple(cache["lease"]))
+        wlan_sta.connect(creds["ssid"], creds["password"], bssid=_bssid_bytes(cache["bssid"]))
+        status = _wait_connected(FAST_CONNECT_TIMEOUT_MS)
+    except Exception as e:
+        log.warning("Fast reconnect error: %s", e)
+        status = -1
+    _mark("fast_connect", start)
+
+    if status == 5:
+        log.info("Fast reconnect to %s in %sms", creds['ssid'], wifi_timings['fast_connect'])
+        static_lease = use_lease
+        if not use_lease:
+            # Fresh DHCP lease: keep it for the next fast reconnect
+            _remember_connection(creds["ssid"], cache["bssid"], cache.get("channel"))
+        return True
+
+    log.warning("Fast reconnect failed (%s), doing full connect", STATUS_NAMES.get(status, status))
+    try:
+        wlan_sta.disconnect()
+        if use_lease:
+            wlan_sta.ifconfig("dhcp")
+    except Exception:
+        pass
+    return False
+
+
+def _best_bssid(ssid):
+    """Scans for the SSID and returns (bssid, channel) of the strongest AP."""
+    best = None
+    for net in wlan_sta.scan():
+        if net[0].decode('utf-8', 'ignore') == ssid and (best is None or net[3] > best[3]):
+            best = net
+    if best is None:
+        return None, None
+    return best[1], best[2]
+
+
 def connect_to_wifi(timeout=30):
     global wlan_sta
+    wifi_timings.clear()
+    total_start = time.ticks_ms()
     creds = load_wifi()
     if not creds:
-        print("No WiFi credentials found")
+        log.warning("No WiFi credentials found")
         return False
-    
+
     try:
-        # Reset network interfaces first
-        print("Resetting network interfaces...")
+        start = time.ticks_ms()
         wlan_sta = network.WLAN(network.STA_IF)
-        wlan_sta.active(False)
-        time.sleep(1)
         wlan_sta.active(True)
-        time.sleep(2)
-        
+        _mark("activate", start)
+
         if wlan_sta.isconnected():
             ip = wlan_sta.ifconfig()[0]
-            print(f"Already connected! IP: {ip}")
+            log.info("Already connected! IP: %s", ip)
             set_led("green")
+            _mark("total", total_start)
             return True
-        
-        print(f"Connecting to: {creds['ssid']}")
+
+        log.info("Connecting to: %s", creds['ssid'])
         set_led("yellow")
-        
-        # Disconnect any existing connection
-        try:
-            wlan_sta.disconnect()
-            time.sleep(1)
-        except:
-            pass
-        
-        # Connect with explicit parameters
-        wlan_sta.connect(creds["ssid"], creds["password"])
-        
-        # Wait for connection with detailed status
-        for attempt in range(timeout):
-            status = wlan_sta.status()
-            
-            if wlan_sta.isconnected():
+
+        if fast_connect(creds):
+            set_led("green")
+            _mark("total", total_start)
+            print_timings()
+            return True
+
+        # Full path: scan for the strongest AP, associate, DHCP
+        start = time.ticks_ms()
+        bssid, channel = _best_bssid(creds["ssid"])
+        _mark("scan", start)
+        if bssid is None:
+            # Hidden networks never show up in a scan; let the driver probe for the SSID
+            log.warning("%s not seen in scan, connecting without BSSID", creds['ssid'])
+
+        start = time.ticks_ms()
+        _connect(creds, bssid)
+        deadline = time.ticks_add(start, timeout * 1000)
+        while True:
+            remaining = time.ticks_diff(deadline, time.ticks_ms())
+            if remaining <= 0:
+                break
+            status = _wait_connected(min(remaining, 5000), poll_ms=100)
+
+            if status == 5:  # GOT_IP
+                _mark("full_connect", start)
+                _mark("total", total_start)
                 ip = wlan_sta.ifconfig()[0]
-                print(f"WiFi connected! IP: {ip}")
+                log.info("WiFi connected! IP: %s", ip)
+                if bssid is not None:
+                    _remember_connection(creds["ssid"], _bssid_hex(bssid), channel)
                 set_led("green")
+                print_timings()
                 return True
-            
-            # Print status every 5 seconds
-            if attempt % 5 == 0:
-                status_msg = {
-                    0: "IDLE",
-                    1: "CONNECTING", 
-                    2: "WRONG_PASSWORD",
-                    3: "NO_AP_FOUND",
-                    4: "CONNECT_FAIL",
-                    5: "GOT_IP"
-                }.get(status, f"UNKNOWN({status})")
-                print(f"Status: {status_msg} (attempt {attempt + 1}/{timeout})")
-            
+
+            log.info("Status: %s", STATUS_NAMES.get(status, f'UNKNOWN({status})'))
+
             # Handle specific error conditions
             if status == 2:  # WRONG_PASSWORD
-                print("Wrong password - check credentials")
+                log.error("Wrong password - check credentials")
                 set_led("red")
                 wlan_sta.active(False)
                 return False
             elif status == 3:  # NO_AP_FOUND
-                print("Access point not found - check SSID")
+                log.error("Access point not found - check SSID")
                 set_led("red")
                 wlan_sta.active(False)
                 return False
             elif status == 4:  # CONNECT_FAIL
-                print("Connection failed - retrying...")
+                log.warning("Connection failed - retrying...")
                 wlan_sta.disconnect()
-                time.sleep(2)
-                wlan_sta.connect(creds["ssid"], creds["password"])
-            
-            time.sleep(1)
-        
-        print("Connection timeout")
+                _connect(creds, bssid)
+
+        log.error("Connection timeout")
         wlan_sta.active(False)
         set_led("red")
         return False
-        
+
     except Exception as e:
         # Convert any problematic characters to safe string
         error_msg = str(e).encode('ascii', 'replace').decode('ascii')
-        print(f"WiFi connection error: {error_msg}")
+        log.error("WiFi connection error: %s", error_msg)
         set_led("purple")
         try:
             if wlan_sta:
@@ -187,7 +338,7 @@ def connect_to_wifi(timeout=30):
 
 def reset_network():
     """Reset all network interfaces"""
-    print("Performing network reset...")
+    log.info("Performing network reset...")
     try:
         # Reset STA interface
         wlan_sta = network.WLAN(network.STA_IF)
@@ -198,10 +349,10 @@ def reset_network():
         wlan_ap.active(False)
         
         time.sleep(2)
-        print("Network interfaces reset")
+        log.info("Network interfaces reset")
         return True
     except Exception as e:
-        print(f"Network reset error: {str(e)}")
+        log.error("Network reset error: %s", e)
         return False
 
 def is_connected():
@@ -211,6 +362,11 @@ def is_connected():
         return False
     return wlan_sta.isconnected()
 
+def device_id():
+    """Feeder id used by the backend: the STA MAC as hex"""
+    mac = network.WLAN(network.STA_IF).config("mac")
+    return "".join("%02x" % b for b in mac)
+
 def get_ip():
     """Get current IP address"""
     global wlan_sta
@@ -220,185 +376,298 @@ def get_ip():
 
 def reconnect_wifi():
     """Attempt to reconnect WiFi"""
-    print("🔄 Attempting WiFi reconnection...")
+    log.info("Attempting WiFi reconnection...")
     if connect_to_wifi(timeout=15):
         return True
-    print("❌ WiFi reconnection failed")
+    log.error("WiFi reconnection failed")
     return False
 
+# --- Config portal (uasyncio) ---
+PORTAL_IP = "192.168.4.1"
+PORTAL_MAX_CLIENTS = 4    # concurrent HTTP connections, extra ones get a 503
+PORTAL_MAX_HEAD = 1536    # bytes of request line + headers kept per connection
+PORTAL_CHUNK = 512        # recv / file send chunk size
+PORTAL_TIMEOUT = 5        # seconds for a client to send its request head
+
+# path -> (file, content type, Cache-Control); "<file>.gz" is preferred if present
+PORTAL_FILES = {
+    "/": ("index.html", "text/html", "no-cache"),
+    "/index.html": ("index.html", "text/html", "no-cache"),
+    "/nexani_logo_transparent.webp": ("nexani_logo_transparent.webp", "image/webp", "public, max-age=86400"),
+}
+
+_portal_clients = 0
+
+
+async def captive_dns():
+    """DNS responder: answers every query with the portal IP."""
+    ip = bytes([int(x) for x in PORTAL_IP.split('.')])
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind(('', 53))
+    s.setblocking(False)
+    try:
+        while config_portal_running:
+            try:
+                data, addr = s.recvfrom(512)
+            except OSError:
+                await asyncio.sleep_ms(20)  # nothing queued, let HTTP clients run
+                continue
+            if len(data) < 12:
+                continue
+            try:
+                # Basic DNS response for any request, always with our IP
+                response = (
+                    data[:2] + b'\x81\x80' + data[4:6]*2 + b'\x00\x00\x00\x00' +
+                    data[12:] +
+                    b'\xc0\x0c\x00\x01\x00\x01\x00\x00\x00\x1e\x00\x04' + ip
+                )
+                s.sendto(response, addr)
+            except Exception as e:
+                log.error("DNS error: %s", e)
+    finally:
+        s.close()
+
+
+def _url_decode(value):
+    value = value.replace("+", " ")
+    parts = value.split("%")
+    out = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        try:
+            out.append(int(part[:2], 16))
+            out.extend(part[2:].encode())
+        except ValueError:
+            out.extend(b"%" + part.encode())
+    return bytes(out).decode("utf-8")
+
+
+def _stat(name):
+    try:
+        return os.stat(name)
+    except OSError:
+        return None
+
+
+class HeadTooLarge(Exception):
+    pass
+
+
+async def _read_head(reader):
+    """Collects the request head over as many recv chunks as it takes."""
+    buf = b""
+    while b"\r\n\r\n" not in buf:
+        chunk = await reader.read(PORTAL_CHUNK)
+        if not chunk:
+            return None
+        buf += chunk
+        if len(buf) > PORTAL_MAX_HEAD and b"\r\n\r\n" not in buf:
+            raise HeadTooLarge()
+    return buf[:buf.find(b"\r\n\r\n")]
+
+
+def _parse_head(head):
+    lines = head.decode("utf-8").split("\r\n")
+    method, target = lines[0].split(" ")[:2]
+    path, _, qs = target.partition("?")
+    query = {}
+    for pair in qs.split("&"):
+        if pair:
+            key, _, value = pair.partition("=")
+            query[_url_decode(key)] = _url_decode(value)
+    # Only keep the headers we act on
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name in ("accept-encoding", "if-none-match"):
+            headers[name] = value.strip()
+    return method, path, query, headers
+
+
+async def _send(writer, status, headers="", body=b""):
+    writer.write(("HTTP/1.1 %s\r\n%sContent-Length: %d\r\nConnection: close\r\n\r\n"
+                  % (status, headers, len(body))).encode())
+    if body:
+        writer.write(body)
+    await writer.drain()
+
+
+async def _send_file(writer, name, ctype, cache, headers):
+    """Streams a file, preferring a pre-gzipped copy, with ETag revalidation."""
+    encoding = ""
+    st = None
+    if "gzip" in headers.get("accept-encoding", ""):
+        st = _stat(name + ".gz")
+        if st:
+            name += ".gz"
+            encoding = "Content-Encoding: gzip\r\n"
+    if st is None:
+        st = _stat(name)
+    if st is None:
+        await _send(writer, "404 Not Found", body=b"Not found")
+        return
+
+    etag = '"%x-%x"' % (st[6], st[8])
+    cache_headers = "Cache-Control: %s\r\nETag: %s\r\nVary: Accept-Encoding\r\n" % (cache, etag)
+    if headers.get("if-none-match") == etag:
+        await _send(writer, "304 Not Modified", cache_headers)
+        return
+
+    writer.write(("HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n%s%sConnection: close\r\n\r\n"
+                  % (ctype, st[6], encoding, cache_headers)).encode())
+    buf = bytearray(PORTAL_CHUNK)
+    mv = memoryview(buf)
+    with open(name, "rb") as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            writer.write(mv[:n])
+            await writer.drain()
+
+
+async def _reboot_soon():
+    await asyncio.sleep(1)
+    machine.reset()
+
+
+async def handle_request(writer, method, path, query, headers):
+    """Handle individual HTTP requests"""
+    # Save Wi-Fi credentials
+    if path == "/" and "s" in query and "p" in query:
+        log.info("Saving WiFi credentials for SSID: %s", query['s'])
+        save_wifi(query["s"], query["p"])
+        await _send(writer, "200 OK", "Content-Type: text/html\r\n",
+                    b"<html><body><h1>Saved!</h1><p>Rebooting device...</p></body></html>")
+        asyncio.create_task(_reboot_soon())
+
+    # Serve Wi-Fi scan
+    elif path == "/wifiscan.json":
+        if _stat("wifiscan.json"):
+            await _send_file(writer, "wifiscan.json", "application/json", "no-store", headers)
+        else:
+            await _send(writer, "200 OK", "Content-Type: application/json\r\n", b"[]")
+
+    # Serve static files
+    elif path in PORTAL_FILES:
+        await _send_file(writer, *PORTAL_FILES[path], headers)
+
+    # Redirect all other paths (captive portal detection)
+    else:
+        await _send(writer, "302 Found", "Location: http://%s/\r\n" % PORTAL_IP)
+
+
+async def _handle_client(reader, writer):
+    global _portal_clients
+    if _portal_clients >= PORTAL_MAX_CLIENTS:
+        try:
+            await _send(writer, "503 Service Unavailable", "Retry-After: 1\r\n")
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        return
+
+    _portal_clients += 1
+    try:
+        head = await asyncio.wait_for(_read_head(reader), PORTAL_TIMEOUT)
+        if head:
+            await handle_request(writer, *_parse_head(head))
+    except asyncio.TimeoutError:
+        pass
+    except HeadTooLarge:
+        await _send(writer, "431 Request Header Fields Too Large")
+    except ValueError:  # malformed request line, headers or form data
+        await _send(writer, "400 Bad Request")
+    except Exception as e:
+        log.error("Request handling error: %s", e)
+    finally:
+        _portal_clients -= 1
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+
+async def serve_config_portal():
+    """HTTP server for config portal"""
+    server = await asyncio.start_server(_handle_client, "0.0.0.0", 80, backlog=PORTAL_MAX_CLIENTS)
+    log.info("Config portal running at http://192.168.4.1")
+    try:
+        while config_portal_running:
+            await asyncio.sleep(1)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+async def _run_portal():
+    log.info("Starting captive DNS server...")
+    dns = asyncio.create_task(captive_dns())
+    try:
+        await serve_config_portal()
+    finally:
+        dns.cancel()
+
+
 def start_config_portal():
     global config_portal_running
     if config_portal_running:
-        print("⚠️ Config portal already running")
+        log.warning("Config portal already running")
         return
-        
+
     config_portal_running = True
-    print("🔧 Starting WiFi configuration portal...")
-    
+    log.info("Starting WiFi configuration portal...")
+
     try:
         # Start AP
         ap = network.WLAN(network.AP_IF)
         ap.active(True)
         ap.config(essid="Nexani-Setup", password="")  # Open network for easier setup
-        print("📡 Access Point 'Nexani-Setup' started")
+        log.info("Access Point 'Nexani-Setup' started")
         set_led("blue")
-        
+
         # Scan networks
         if not scan_and_save_wifi():
-            print("⚠️ WiFi scan failed, continuing with empty list")
-        
-        # Start DNS in thread
-        print("🌐 Starting captive DNS server...")
-        try:
-            _thread.start_new_thread(captive_dns, ())
-        except Exception as e:
-            print(f"❌ Failed to start DNS thread: {e}")
-        
-        # Start HTTP server
-        serve_config_portal()
-        
+            log.warning("WiFi scan failed, continuing with empty list")
+
+        # DNS and HTTP share one event loop
+        asyncio.run(_run_portal())
+
     except Exception as e:
-        print(f"❌ Config portal error: {e}")
+        log.error("Config portal error: %s", e)
         set_led("red")
     finally:
         config_portal_running = False
 
-def serve_config_portal():
-    """HTTP server for config portal"""
-    try:
-        addr = socket.getaddrinfo('0.0.0.0', 80)[0][-1]
-        s = socket.socket()
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind(addr)
-        s.listen(2)
-        print("🌐 Config portal running at http://192.168.4.1")
-        
-        while config_portal_running:
-            try:
-                s.settimeout(5)  # 5 second timeout
-                conn, addr = s.accept()
-                print(f"📥 Request from {addr}")
-                
-                try:
-                    req = conn.recv(1024)
-                    if not req:
-                        conn.close()
-                        continue
-                    req = req.decode("utf-8")
-                    
-                    # Handle different requests
-                    handle_request(conn, req)
-                    
-                except Exception as e:
-                    print(f"❌ Request handling error: {e}")
-                finally:
-                    try:
-                        conn.close()
-                    except:
-                        pass
-                        
-            except OSError as e:
-                if e.errno != 116:  # Not timeout error
-                    print(f"❌ Socket error: {e}")
-                    break
-            except Exception as e:
-                print(f"❌ Config portal error: {e}")
-                break
-                
-    except Exception as e:
-        print(f"❌ Failed to start HTTP server: {e}")
-    finally:
-        try:
-            s.close()
-        except:
-            pass
 
-def handle_request(conn, req):
-    """Handle individual HTTP requests"""
-    try:
-        # Save Wi-Fi credentials
-        if "/?s=" in req and "&p=" in req:
-            try:
-                parts = req.split("GET /?s=")[1].split(" ")[0]
-                ssid, password = parts.split("&p=")
-                ssid = ssid.replace("%20", " ").replace("+", " ")
-                password = password.replace("%20", " ").replace("+", " ")
-                print(f"💾 Saving WiFi credentials for SSID: {ssid}")
-                save_wifi(ssid, password)
-                conn.send(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n")
-                conn.send(b"<html><body><h1>Saved!</h1><p>Rebooting device...</p></body></html>")
-                time.sleep(1)
-                machine.reset()
-            except Exception as e:
-                print(f"❌ Parse error: {e}")
-                conn.send(b"HTTP/1.1 400 Bad Request\r\n\r\nError parsing credentials")
-                
-        # Serve Wi-Fi scan
-        elif "GET /wifiscan.json" in req:
-            try:
-                if "wifiscan.json" in os.listdir():
-                    with open("wifiscan.json", "r") as f:
-                        data = f.read()
-                    conn.send(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n")
-                    conn.send(data.encode())
-                else:
-                    conn.send(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n[]")
-            except Exception as e:
-                print(f"❌ WiFi scan serve error: {e}")
-                conn.send(b"HTTP/1.1 500 Internal Server Error\r\n\r\nScan error")
-                
-        # Serve logo
-        elif "GET /nexani_logo_transparent.webp" in req:
-            try:
-                with open("nexani_logo_transparent.webp", "rb") as f:
-                    conn.send(b"HTTP/1.1 200 OK\r\nContent-Type: image/webp\r\n\r\n")
-                    while True:
-                        data = f.read(1024)
-                        if not data:
-                            break
-                        conn.send(data)
-            except:
-                conn.send(b"HTTP/1.1 404 Not Found\r\n\r\nLogo not found")
-                
-        # Serve index.html
-        elif "GET / " in req or "GET /index.html" in req:
-            try:
-                with open("index.html") as f:
-                    html = f.read()
-                conn.send(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n")
-                conn.send(html.encode())
-            except:
-                conn.send(b"HTTP/1.1 404 Not Found\r\n\r\nConfig page not found")
-                
-        # Redirect all other paths
-        else:
-            conn.send(b"HTTP/1.1 302 Found\r\nLocation: /\r\n\r\n")
-            
-    except Exception as e:
-        print(f"❌ Request handler error: {e}")
-        try:
-            conn.send(b"HTTP/1.1 500 Internal Server Error\r\n\r\nServer error")
-        except:
-            pass
+def stop_config_portal():
+    global config_portal_running
+    config_portal_running = False
 
 def init_wifi():
     """Initialize WiFi - call this from main.py"""
-    print("Initializing WiFi manager...")
+    log.info("Initializing WiFi manager...")
     
-    # Reset network first
-    reset_network()
+    # Make sure the setup AP is off; STA is left alone so a connection
+    # surviving a soft reset can be reused
+    try:
+        network.WLAN(network.AP_IF).active(False)
+    except Exception:
+        pass
     
     # Try to connect
     if connect_to_wifi():
-        print("WiFi connection established")
+        log.info("WiFi connection established")
         ip = get_ip()
         if ip:
-            print(f"IP Address: {ip}")
+            log.info("IP Address: %s", ip)
         return True
     else:
-        print("WiFi not configured or connection failed")
-        print("Manual setup required")
-        print("Connect to 'Nexani-Setup' AP and visit http://192.168.4.1")
+        log.warning("WiFi not configured or connection failed")
+        log.info("Manual setup required")
+        log.info("Connect to 'Nexani-Setup' AP and visit http://192.168.4.1")
         
         # Only start config portal in interactive mode
         try:
@@ -407,9 +676,9 @@ def init_wifi():
             if hasattr(sys, 'ps1'):
                 start_config_portal()
             else:
-                print("Config portal disabled in non-interactive mode")
+                log.info("Config portal disabled in non-interactive mode")
         except:
-            print("Config portal disabled")
+            log.info("Config portal disabled")
         
         return False
 
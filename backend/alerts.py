@@ -0,0 +1,21 @@
+from datetime import datetime
+
+import datasets
+import models
+from events import hub
+
+
+def raise_alert(rfid: str, kind: str, detail: str, since: datetime | None, now: datetime):
+    """Stores an alert and pushes it to the feeders.
+
+    An alert with the same pet, type and start is only raised once, so the
+    detectors can be re-run over overlapping history.
+    """
+    key = (rfid, kind, since)
+    if key in datasets.alert_keys:
+        return None
+    datasets.alert_keys.add(key)
+    alert = models.Alert(rfid=rfid, type=kind, detail=detail, since=since, timestamp=now)
+    datasets.alerts.append(alert.model_dump())
+    hub.publish("alert", alert.model_dump(mode="json"))
+    return alert
@@ -0,0 +1,140 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+import alerts
+import body_weight
+import datasets
+
+# Batch anomaly detection over all pets at once, on grams eaten per day and
+# on body weight (daily mean of the visits).
+#
+# Each signal is laid out as a (pets x days) matrix, NaN where there is no
+# data yet, and every statistic is computed for all rows in one pass with
+# cumulative sums, so a run costs a handful of array operations no matter
+# how many pets there are. Two detectors:
+#   drop   the last day is more than Z_LIMIT standard deviations below the
+#          mean of the BASELINE_DAYS before it
+#   shift  the series splits into two segments whose means differ by more
+#          than SHIFT_LIMIT (t statistic) and the signal's min_drop
+#          (relative), with the lower segment starting within the last
+#          SHIFT_RECENT days
+# Only decreases are reported. Runs at midnight and on demand.
+
+HISTORY_DAYS = 56
+BASELINE_DAYS = 14
+MIN_DAYS = 7          # fewer valid days than this in the baseline: no verdict
+Z_LIMIT = 3.0
+SHIFT_LIMIT = 4.0
+SHIFT_RECENT = 7
+MIN_SEGMENT = 3
+
+# min_std: std floor as a share of the mean, so a perfectly steady pet is not flagged for noise
+# min_drop: smallest relative drop between the segments that counts as a shift
+SIGNALS = {
+    "intake": {"min_std": 0.1, "min_drop": 0.25},
+    "weight": {"min_std": 0.01, "min_drop": 0.05},
+}
+
+
+def _window_sums(values: np.ndarray, valid: np.ndarray, width: int):
+    """Sum, sum of squares and count over each `width` day window, per row.
+
+    Column j covers days j .. j+width-1.
+    """
+    zeros = np.zeros((values.shape[0], 1))
+    cs = np.concatenate([zeros, np.cumsum(values, axis=1)], axis=1)
+    cs2 = np.concatenate([zeros, np.cumsum(values * values, axis=1)], axis=1)
+    cn = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    return cs[:, width:] - cs[:, :-width], cs2[:, width:] - cs2[:, :-width], cn[:, width:] - cn[:, :-width]
+
+
+def drops(series: np.ndarray, min_std: float) -> tuple[np.ndarray, np.ndarray]:
+    """Z-score of each day against the BASELINE_DAYS before it; returns (z, flagged) for the last day."""
+    valid = ~np.isnan(series)
+    values = np.where(valid, series, 0.0)
+    s, s2, n = _window_sums(values[:, :-1], valid[:, :-1], BASELINE_DAYS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = s / n
+        std = np.sqrt(np.maximum(s2 / n - mean * mean, 0.0))
+        std = np.maximum(std, np.maximum(min_std * np.abs(mean), 1e-9))
+        z = (series[:, BASELINE_DAYS:] - mean) / std
+    z[n < MIN_DAYS] = np.nan
+    last = z[:, -1]
+    return last, np.nan_to_num(last, nan=0.0) < -Z_LIMIT
+
+
+def shifts(series: np.ndarray, min_std: float, min_drop: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Best downward mean shift per row: (split column, t statistic, relative drop)."""
+    valid = ~np.isnan(series)
+    values = np.where(valid, series, 0.0)
+    zeros = np.zeros((series.shape[0], 1))
+    cs = np.concatenate([zeros, np.cumsum(values, axis=1)], axis=1)
+    cs2 = np.concatenate([zeros, np.cumsum(values * values, axis=1)], axis=1)
+    cn = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    total, total2, count = cs[:, -1:], cs2[:, -1:], cn[:, -1:]
+
+    # Split k: segment one is days [0, k), segment two [k, end)
+    n1, n2 = cn, count - cn
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m1, m2 = cs / n1, (total - cs) / n2
+        within = (cs2 - n1 * m1 * m1) + ((total2 - cs2) - n2 * m2 * m2)
+        pooled = np.sqrt(np.maximum(within / (count - 2), 0.0))
+        pooled = np.maximum(pooled, np.maximum(min_std * np.abs(m1), 1e-9))
+        t = (m2 - m1) / (pooled * np.sqrt(1 / n1 + 1 / n2))
+        drop = (m1 - m2) / m1
+    t[(n1 < MIN_SEGMENT) | (n2 < MIN_SEGMENT)] = np.nan
+    t[:, : series.shape[1] - SHIFT_RECENT] = np.nan   # only recent change points
+    t = np.where(np.isnan(t), np.inf, t)
+    split = np.argmin(t, axis=1)
+    rows = np.arange(series.shape[0])
+    best, rel = t[rows, split], drop[rows, split]
+    flagged = (best < -SHIFT_LIMIT) & (np.nan_to_num(rel, nan=0.0) >= min_drop)
+    return split, best, np.where(flagged, rel, 0.0)
+
+
+def intake_matrix(rfids: list[str], first_day: date, days: int) -> np.ndarray:
+    """Grams eaten per pet and day from the daily rollups; NaN before a pet's first record."""
+    matrix = np.full((len(rfids), days), np.nan)
+    starts = [datetime.combine(first_day + timedelta(days=d), time.min) for d in range(days)]
+    for row, rfid in enumerate(rfids):
+        tier = datasets.pet_rollups.get(rfid, {}).get("day")
+        if not tier:
+            continue
+        first = next(iter(tier))
+        for col, start in enumerate(starts):
+            if start >= first:
+                bucket = tier.get(start)
+                matrix[row, col] = bucket["eaten"] if bucket else 0.0
+    return matrix
+
+
+def analyze(name: str, rfids: list[str], first_day: date, series: np.ndarray, now: datetime) -> int:
+    """Runs both detectors on one signal and raises alerts; returns how many were new."""
+    if series.shape[1] <= BASELINE_DAYS:
+        return 0
+    settings = SIGNALS[name]
+    raised = 0
+    last_day = datetime.combine(first_day + timedelta(days=series.shape[1] - 1), time.min)
+    z, flagged = drops(series, settings["min_std"])
+    for row in np.flatnonzero(flagged):
+        detail = f"{name} {series[row, -1]:.0f} g on {last_day:%Y-%m-%d}, z={z[row]:.1f}"
+        raised += alerts.raise_alert(rfids[row], f"{name}-drop", detail, last_day, now) is not None
+    split, t, rel = shifts(series, settings["min_std"], settings["min_drop"])
+    for row in np.flatnonzero(rel):
+        since = datetime.combine(first_day + timedelta(days=int(split[row])), time.min)
+        detail = f"{name} down {rel[row]:.0%} since {since:%Y-%m-%d}, t={t[row]:.1f}"
+        raised += alerts.raise_alert(rfids[row], f"{name}-shift", detail, since, now) is not None
+    return raised
+
+
+def run(now: datetime) -> int:
+    """Checks every pet's complete days up to yesterday."""
+    rfids = [p["rfid"] for p in datasets.pets]
+    if not rfids:
+        return 0
+    first_day = now.date() - timedelta(days=HISTORY_DAYS)
+    intake = intake_matrix(rfids, first_day, HISTORY_DAYS)
+    weight = np.array([body_weight.daily_means(rfid, first_day, HISTORY_DAYS) for rfid in rfids])
+    return (analyze("intake", rfids, first_day, intake, now)
+            + analyze("weight", rfids, first_day, weight, now))
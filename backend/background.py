@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from datetime import time as day_time
+
+import alerts
+import anomaly
+import dashboard_view
+import datasets
+import device_auth
+import schedule_engine
+import storage
+from events import hub
+from timing_wheel import TimingWheel
+
+# Time-based jobs, driven by one timing wheel that the FastAPI lifespan
+# advances once per second. Each pet / unknown tag owns at most one pending
+# timer per job, re-armed or cancelled by the route handlers, so nothing here
+# scans the datasets per request.
+
+UNKNOWN_RFID_TTL = timedelta(hours=24)    # unknown tags not seen again are dropped
+HUNGER_ALERT_AFTER = timedelta(hours=12)  # alert if a pet has not eaten for this long
+
+log = logging.getLogger(__name__)
+
+wheel = TimingWheel()
+_hunger_timers = {}   # rfid -> Timer
+_unknown_timers = {}  # rfid -> Timer
+
+
+def _seconds_until(when: datetime) -> float:
+    return max(0.0, (when - datetime.now()).total_seconds())
+
+
+# ----------- Daily rollover -----------
+
+def _analyze(now: datetime):
+    try:
+        anomaly.run(now)
+    except Exception:
+        log.exception("Anomaly detection failed")
+    dashboard_view.touch()
+
+
+def _midnight_rollover():
+    # Resets budgets and meal slots eagerly instead of on the next scan
+    now = datetime.now()
+    for sched in datasets.feeding_schedules:
+        schedule_engine.refresh(sched, now)
+    # Yesterday is complete now, look for anomalies in it. NumPy over the
+    # whole history: run in a worker thread, not on the event loop
+    asyncio.get_running_loop().run_in_executor(None, _analyze, now)
+    dashboard_view.touch()
+    schedule_midnight()
+
+
+def schedule_midnight():
+    midnight = datetime.combine(date.today() + timedelta(days=1), day_time.min)
+    wheel.call_later(_seconds_until(midnight), _midnight_rollover)
+
+
+# ----------- Unknown RFID expiry -----------
+
+def _expire_unknown(rfid: str):
+    _unknown_timers.pop(rfid, None)
+    datasets.unknown_rfid_events = [
+        e for e in datasets.unknown_rfid_events if e["rfid"] != rfid
+    ]
+    if storage.store.shared:
+        # Store round trip: off the event loop
+        asyncio.get_running_loop().run_in_executor(None, storage.store.drop_unknown, rfid)
+    else:
+        storage.store.drop_unknown(rfid)
+    dashboard_view.touch()
+
+
+def touch_unknown(rfid: str):
+    """(Re)starts the expiry of an unknown tag; called on every sighting."""
+    wheel.cancel(_unknown_timers.get(rfid))
+    _unknown_timers[rfid] = wheel.call_later(UNKNOWN_RFID_TTL.total_seconds(), _expire_unknown, rfid)
+
+
+def forget_unknown(rfid: str):
+    wheel.cancel(_unknown_timers.pop(rfid, None))
+
+
+# ----------- Hunger alerts -----------
+
+def _raise_hunger_alert(rfid: str):
+    since = datasets.last_feedings.get(rfid)
+    if storage.store.shared:
+        # Every instance arms this timer; feedings confirmed elsewhere only reach us with a sync
+        storage.store.sync()
+        since = datasets.last_feedings.get(rfid)
+        if since is not None and since + HUNGER_ALERT_AFTER > datetime.now():
+            wheel.cancel(_hunger_timers.get(rfid))
+            _hunger_timers[rfid] = wheel.call_later(_seconds_until(since + HUNGER_ALERT_AFTER),
+                                                    _hunger_alert, rfid)
+            return
+        if not storage.store.claim(f"not-eaten:{rfid}:{since}", int(HUNGER_ALERT_AFTER.total_seconds() * 1000)):
+            return
+    alerts.raise_alert(rfid, "not-eaten",
+                       f"no feeding for {HUNGER_ALERT_AFTER.total_seconds() / 3600:g} h",
+                       since, datetime.now())
+
+
+def _hunger_alert(rfid: str):
+    _hunger_timers.pop(rfid, None)
+    if storage.store.shared:
+        # Store round trips: off the event loop
+        asyncio.get_running_loop().run_in_executor(None, _raise_hunger_alert, rfid)
+    else:
+        _raise_hunger_alert(rfid)
+
+
+def arm_hunger_alert(rfid: str):
+    """(Re)starts the not-eaten countdown; called on every confirmed feeding."""
+    wheel.cancel(_hunger_timers.get(rfid))
+    _hunger_timers[rfid] = wheel.call_later(HUNGER_ALERT_AFTER.total_seconds(), _hunger_alert, rfid)
+
+
+def disarm_hunger_alert(rfid: str):
+    wheel.cancel(_hunger_timers.pop(rfid, None))
+
+
+# ----------- Lifespan -----------
+
+async def _run_wheel():
+    started = time.monotonic()
+    ticked = wheel.current
+    while True:
+        await asyncio.sleep(wheel.tick)
+        # Catch up on ticks missed while the loop was busy
+        due = int((time.monotonic() - started) / wheel.tick) - (wheel.current - ticked)
+        if due > 0:
+            wheel.advance(due)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    storage.store.sync()
+    if storage.store.shared:
+        hub.share(storage.store.redis, storage.store.prefix)
+        device_auth.replays.share(storage.store.redis, storage.store.prefix)
+    if device_auth.MODE != "required":
+        log.warning("DEVICE_AUTH=%s: feeder endpoints (e.g. /feeding/confirm) accept unsigned requests; "
+                    "set DEVICE_AUTH=required once every feeder has a key", device_auth.MODE)
+    schedule_midnight()
+    for sched in datasets.feeding_schedules:
+        arm_hunger_alert(sched["rfid"])
+    task = asyncio.create_task(_run_wheel())
+    try:
+        yield
+    finally:
+        task.cancel()
+        hub.close()
@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+import datasets
+
+# Body weight per RFID, one reading per visit from the entry scale plateau.
+#
+# Kept as two parallel int arrays (epoch seconds, grams), 8 bytes per visit
+# and at most MAX_SAMPLES per pet; the oldest readings fall off first.
+
+MAX_SAMPLES = 2000
+MIN_GRAMS = 500       # below this the reading is not a cat
+MAX_GRAMS = 20000
+
+
+class WeightSeries:
+    def __init__(self):
+        self.ts = array("I")
+        self.grams = array("I")
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def add(self, ts: float, grams: float):
+        self.ts.append(int(ts))
+        self.grams.append(int(round(grams)))
+        if len(self.ts) > MAX_SAMPLES:
+            del self.ts[0]
+            del self.grams[0]
+
+    def since(self, ts: float) -> tuple[np.ndarray, np.ndarray]:
+        """(timestamps, grams) from ts on, as float arrays."""
+        start = bisect_left(self.ts, int(ts))
+        # Copies: a live buffer export would block the resize in add()
+        return np.array(self.ts[start:], dtype=np.float64), np.array(self.grams[start:], dtype=np.float64)
+
+
+def record(rfid: str, grams: float | None, now: datetime) -> bool:
+    """Stores one visit's weight; implausible readings are dropped."""
+    if grams is None or not MIN_GRAMS <= grams <= MAX_GRAMS:
+        return False
+    series = datasets.body_weights.get(rfid)
+    if series is None:
+        series = datasets.body_weights[rfid] = WeightSeries()
+    series.add(now.timestamp(), grams)
+    return True
+
+
+def daily_means(rfid: str, first_day: date, days: int) -> np.ndarray:
+    """Mean weight per day, NaN on days without a visit."""
+    result = np.full(days, np.nan)
+    series = datasets.body_weights.get(rfid)
+    if series is None:
+        return result
+    start = datetime.combine(first_day, time.min).timestamp()
+    ts, grams = series.since(start)
+    if not len(ts):
+        return result
+    idx = ((ts - start) // 86400).astype(np.int64)
+    keep = idx < days
+    idx, grams = idx[keep], grams[keep]
+    sums = np.bincount(idx, weights=grams, minlength=days)[:days]
+    counts = np.bincount(idx, minlength=days)[:days]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def trend(rfid: str, days: int, now: datetime) -> dict:
+    """Latest weight and least squares slope over the last `days` days."""
+    series = datasets.body_weights.get(rfid)
+    result = {"rfid": rfid, "latest": None, "latestAt": None, "samples": 0,
+              "perWeek": None, "change": None, "daily": []}
+    if series is None or not len(series):
+        return result
+    result["latest"] = float(series.grams[-1])
+    result["latestAt"] = datetime.fromtimestamp(series.ts[-1])
+    first_day = now.date() - timedelta(days=days - 1)
+    ts, grams = series.since(datetime.combine(first_day, time.min).timestamp())
+    result["samples"] = len(ts)
+    if len(ts) >= 2 and ts[-1] > ts[0]:
+        x = (ts - ts[0]) / 86400
+        slope = np.polyfit(x, grams, 1)[0]   # grams per day
+        result["perWeek"] = round(float(slope) * 7, 1)
+        result["change"] = round(float(slope * x[-1]), 1)
+    means = daily_means(rfid, first_day, days)
+    result["daily"] = [
+        {"day": first_day + timedelta(days=int(d)), "grams": round(float(means[d]), 1)}
+        for d in np.flatnonzero(~np.isnan(means))
+    ]
+    return result
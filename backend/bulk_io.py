@@ -0,0 +1,190 @@
+import csv
+import io
+import json
+from datetime import time
+from typing import AsyncIterator, Iterable, Iterator
+
+from pydantic import TypeAdapter, ValidationError
+
+import models
+
+# Bulk import/export of pets and schedules as CSV or NDJSON.
+#
+# Imports are read from the request stream line by line (one record per
+# line, CSV with a header row) and validated in batches of BATCH_SIZE with
+# one pydantic call each. Duplicate RFIDs, within the file or against what
+# is already stored, are found with a set in the same pass. Nothing is
+# stored unless the whole file is valid; the caller commits the returned
+# rows in one go.
+#
+# In CSV, schedule meals are one column: "07:00-09:00@40;18:00-20:00",
+# the "@grams" part is optional.
+
+FORMATS = ("csv", "ndjson")
+BATCH_SIZE = 500
+MAX_ERRORS = 50
+
+PET_COLUMNS = ["rfid", "name", "silo"]
+SCHEDULE_COLUMNS = ["rfid", "timeWindow", "amount", "dailyBudget", "meals"]
+
+_pets = TypeAdapter(list[models.Pet])
+_schedules = TypeAdapter(list[models.FeedingSchedule])
+
+
+class BulkImportError(Exception):
+    """The file is invalid; `errors` lists [{"line", "error"}], capped at MAX_ERRORS."""
+
+    def __init__(self, errors: list[dict], rows: int):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+        self.rows = rows
+
+
+def detect_format(format: str | None, content_type: str | None) -> str:
+    if format:
+        return format
+    if content_type and "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """(line number, text) of the non-empty lines, as they arrive."""
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for raw in complete:
+            number += 1
+            text = raw.decode("utf-8", "replace").lstrip("\ufeff").rstrip("\r")
+            if text.strip():
+                yield number, text
+    if pending.strip():
+        yield number + 1, pending.decode("utf-8", "replace").lstrip("\ufeff").rstrip("\r")
+
+
+def _parse_meals(value: str) -> list[dict]:
+    meals = []
+    for part in filter(None, (p.strip() for p in value.split(";"))):
+        span, _, amount = part.partition("@")
+        start, _, end = span.partition("-")
+        meals.append({"start": start.strip(), "end": end.strip(), "amount": amount.strip() or None})
+    return meals
+
+
+def _format_meals(meals: list[dict]) -> str:
+    parts = []
+    for meal in meals:
+        part = f"{meal['start']:%H:%M}-{meal['end']:%H:%M}"
+        if meal.get("amount") is not None:
+            part += f"@{meal['amount']:g}"
+        parts.append(part)
+    return ";".join(parts)
+
+
+def _record(kind: str, fmt: str, header: list[str] | None, text: str) -> dict:
+    if fmt == "ndjson":
+        record = json.loads(text)
+        if not isinstance(record, dict):
+            raise ValueError("expected a JSON object")
+        return record
+    values = next(csv.reader([text]))
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+    record = {k: v for k, v in zip(header, values) if v != ""}
+    if kind == "schedule" and "meals" in record:
+        record["meals"] = _parse_meals(record["meals"])
+    return record
+
+
+async def read(kind: str, fmt: str, chunks: AsyncIterator[bytes], existing: set[str]) -> list[dict]:
+    """Parses and validates a whole upload; returns the rows as stored dicts or raises BulkImportError."""
+    adapter = _pets if kind == "pet" else _schedules
+    required = PET_COLUMNS if kind == "pet" else SCHEDULE_COLUMNS[:3]
+    header = None
+    seen = set(existing)
+    errors, valid = [], []
+    batch, lines = [], []
+    rows = 0
+
+    def error(line: int, message: str):
+        if len(errors) < MAX_ERRORS:
+            errors.append({"line": line, "error": message})
+
+    def flush():
+        if not batch:
+            return
+        try:
+            items = adapter.validate_python(batch)
+        except ValidationError as e:
+            bad = {}
+            for err in e.errors():
+                index = err["loc"][0]
+                field = ".".join(str(p) for p in err["loc"][1:])
+                bad.setdefault(index, f"{field}: {err['msg']}" if field else err["msg"])
+            for index, message in sorted(bad.items()):
+                error(lines[index], message)
+            # The rest of the batch is fine, validate it again without the bad rows
+            good = iter(adapter.validate_python([row for i, row in enumerate(batch) if i not in bad]))
+            items = [None if i in bad else next(good) for i in range(len(batch))]
+        for line, item in zip(lines, items):
+            if item is None:
+                continue
+            if item.rfid in seen:
+                error(line, f"duplicate RFID {item.rfid}")
+                continue
+            seen.add(item.rfid)
+            valid.append(item.model_dump())
+        batch.clear()
+        lines.clear()
+
+    async for number, text in _lines(chunks):
+        if fmt == "csv" and header is None:
+            header = [h.strip() for h in next(csv.reader([text]))]
+            missing = [c for c in required if c not in header]
+            if missing:
+                raise BulkImportError([{"line": number, "error": f"missing columns: {', '.join(missing)}"}], 0)
+            continue
+        rows += 1
+        try:
+            batch.append(_record(kind, fmt, header, text))
+            lines.append(number)
+        except ValueError as e:  # JSONDecodeError and csv.Error are ValueErrors too
+            error(number, str(e))
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+    if errors:
+        raise BulkImportError(sorted(errors, key=lambda e: e["line"]), rows)
+    return valid
+
+
+def write(kind: str, fmt: str, records: Iterable[dict]) -> Iterator[str]:
+    """Yields the export in chunks of BATCH_SIZE records."""
+    columns = PET_COLUMNS if kind == "pet" else SCHEDULE_COLUMNS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if fmt == "csv":
+        writer.writerow(columns)
+    count = 0
+    for record in records:
+        if fmt == "ndjson":
+            buffer.write(json.dumps(record, default=_json_default) + "\n")
+        else:
+            row = dict(record)
+            if kind == "schedule":
+                row["meals"] = _format_meals(row.get("meals") or [])
+            writer.writerow(["" if row.get(c) is None else row[c] for c in columns])
+        count += 1
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _json_default(value):
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
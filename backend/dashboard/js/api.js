@@ -8,9 +8,16 @@ const API = {
   async getUnknownRFIDs() {
     return fetch("/dashboard/unknown-rfids").then(res => res.json());
   },
+  async getSnapshot() {
+    // ETag revalidation: unchanged snapshots come back as 304 from the browser cache
+    return fetch("/dashboard/snapshot", { cache: "no-cache" }).then(res => res.json());
+  },
   async getPet(rfid) {
     return fetch(`/pet/get/${rfid}`).then(res => res.json());
   },
+  async getSchedule(rfid) {
+    return fetch(`/schedule/get/${rfid}`).then(res => res.json());
+  },
   async updateSchedule(schedule) {
     return fetch("/schedule/update", {
       method: "POST",
@@ -1,18 +1,16 @@
+let renderedVersion = null;
+
 async function renderDashboard() {
-  const [silos, pets, unknownRFIDs] = await Promise.all([
-    API.getSilos(),
-    API.getPets(),
-    API.getUnknownRFIDs()
-  ]);
+  const snapshot = await API.getSnapshot();
+  if (snapshot.version === renderedVersion) return;
+  renderedVersion = snapshot.version;
 
   const siloContainer = document.getElementById("silo-container");
   siloContainer.innerHTML = "";
 
-  console.log(silos, pets, unknownRFIDs);
-
-  silos.forEach(silo => {
-    const pet = pets.find(p => p.silo === silo.id);
+  snapshot.silos.forEach(silo => {
     const fill = silo.percentage;
+    const hoursLeft = silo.forecast.hoursLeft;
 
     const div = document.createElement("div");
     div.className = "bg-gray-800 rounded-xl p-4 shadow";
@@ -25,9 +23,9 @@ async function renderDashboard() {
     <div class="bg-teal-500 transition-all duration-500" style="height: ${fill}%;"></div>
   </div>
   
-  <p class="text-sm">Fill: ${fill.toFixed(0)}%</p>
-  <p class="text-sm mb-2">Assigned to: <strong>${pet?.name || 'None'}</strong></p>
-  ${pet ? `<button onclick="editSchedule('${pet.rfid}')" class="bg-teal-600 px-4 py-2 rounded text-sm">Edit Schedule</button>` : ""}
+  <p class="text-sm">Fill: ${fill.toFixed(0)}%${hoursLeft != null ? ` (empty in ~${hoursLeft.toFixed(0)} h)` : ""}</p>
+  <p class="text-sm mb-2">Assigned to: <strong>${silo.pets.map(p => p.name).join(", ") || 'None'}</strong></p>
+  ${silo.pets.map(pet => `<button onclick="editSchedule('${pet.rfid}')" class="bg-teal-600 px-4 py-2 rounded text-sm mr-2">Edit ${pet.name}</button>`).join("")}
 `;
 
 
@@ -35,9 +33,9 @@ async function renderDashboard() {
   });
 
   const unknownDiv = document.getElementById("unknown-rfids");
-  unknownDiv.innerHTML = unknownRFIDs.map(e => `
+  unknownDiv.innerHTML = snapshot.unknownRfids.map(e => `
     <div class="bg-gray-800 p-4 rounded flex justify-between items-center">
-      <span>RFID: ${e.rfid}</span>
+      <span>RFID: ${e.rfid} <span class="text-xs text-gray-400">(${e.scans}× scanned)</span></span>
       <div class="flex space-x-2">
         <a href="#" onclick="event.preventDefault(); API.dismissRfid('${e.rfid}')" class="text-sm text-teal-400">
           Dismiss
@@ -55,3 +53,4 @@ function editSchedule(rfid) {
 }
 
 renderDashboard();
+setInterval(renderDashboard, 15000);
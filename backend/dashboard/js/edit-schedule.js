@@ -2,18 +2,42 @@ const params = new URLSearchParams(window.location.search);
 const rfid = params.get("rfid");
 document.getElementById("rfid").value = rfid;
 
-API.getPet(rfid).then(pet => {
-  document.getElementById("timeWindow").value = "40";
-  document.getElementById("amount").value = "10";
+const FIELDS = ["timeWindow", "amount", "dailyBudget", "meals"];
+// Form values as loaded, so only the fields the user changed are sent
+let loaded = {};
+
+function mealsText(meals) {
+  return meals.map(m => `${m.start.slice(0, 5)}-${m.end.slice(0, 5)}`).join(", ");
+}
+
+function parseMeals(text) {
+  return text
+    .split(",")
+    .map(m => m.trim())
+    .filter(m => m)
+    .map(m => {
+      const [start, end] = m.split("-").map(t => t.trim());
+      return { start, end };
+    });
+}
+
+API.getSchedule(rfid).then(schedule => {
+  document.getElementById("timeWindow").value = schedule.timeWindow;
+  document.getElementById("amount").value = schedule.amount;
+  document.getElementById("dailyBudget").value = schedule.dailyBudget ?? "";
+  document.getElementById("meals").value = mealsText(schedule.meals || []);
+  FIELDS.forEach(f => loaded[f] = document.getElementById(f).value);
 });
 
 document.getElementById("edit-form").addEventListener("submit", async e => {
   e.preventDefault();
-  const schedule = {
-    rfid,
-    timeWindow: document.getElementById("timeWindow").value,
-    amount: parseFloat(document.getElementById("amount").value),
-  };
+  const value = f => document.getElementById(f).value;
+  const changed = f => value(f) !== loaded[f];
+  const schedule = { rfid };
+  if (changed("timeWindow")) schedule.timeWindow = parseInt(value("timeWindow"));
+  if (changed("amount")) schedule.amount = parseFloat(value("amount"));
+  if (changed("dailyBudget")) schedule.dailyBudget = value("dailyBudget") ? parseFloat(value("dailyBudget")) : null;
+  if (changed("meals")) schedule.meals = parseMeals(value("meals"));
   await API.updateSchedule(schedule);
   alert("Schedule updated!");
   window.location.href = "/";
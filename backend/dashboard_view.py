@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import datasets
+import models
+import silo_forecast
+from events import hub
+
+# One pre-joined view of everything the dashboard shows, served as JSON.
+#
+# Every write bumps `version`: all hub events do so automatically, writes
+# that do not publish (unknown tags, feeding confirmations) call touch().
+# The snapshot is built at most once per version, with dict lookups instead
+# of per-silo scans, and kept as serialized bytes until the next write, so
+# repeated dashboard loads cost a version compare. Forecasts and "next
+# eligible" times drift without a write, so a snapshot is also rebuilt once
+# it is MAX_AGE old.
+
+ALERTS = 10
+EVENTS = 20
+MAX_AGE = timedelta(minutes=1)
+
+_lock = threading.Lock()
+version = time.time_ns() // 1_000_000   # starts above any earlier run's, so ETags survive a restart
+_cached: tuple[int, bytes, datetime] | None = None
+
+
+def touch(*_):
+    """Marks the view stale; called on every write."""
+    global version
+    with _lock:
+        version += 1
+
+
+hub.subscribe(touch)
+
+
+def _pet(pet: dict, schedules: dict) -> models.DashboardPet:
+    rfid = pet["rfid"]
+    state = datasets.schedule_states.get(rfid)
+    next_eligible = state["nextEligible"] if state else None
+    return models.DashboardPet(
+        rfid=rfid, name=pet["name"], schedule=schedules.get(rfid),
+        nextEligible=next_eligible if next_eligible != datetime.max else None,
+        lastFeeding=datasets.last_feedings.get(rfid),
+    )
+
+
+def _unknown_tags() -> list[models.UnknownTag]:
+    tags = {}
+    for event in datasets.unknown_rfid_events:
+        tag = tags.get(event["rfid"])
+        if tag is None:
+            tags[event["rfid"]] = {"rfid": event["rfid"], "firstSeen": event["timestamp"],
+                                   "lastSeen": event["timestamp"], "scans": 1}
+        else:
+            tag["lastSeen"] = max(tag["lastSeen"], event["timestamp"])
+            tag["scans"] += 1
+    return [models.UnknownTag(**t) for t in sorted(tags.values(), key=lambda t: t["lastSeen"], reverse=True)]
+
+
+def build(now: datetime, current: int) -> models.DashboardSnapshot:
+    schedules = {s["rfid"]: s for s in datasets.feeding_schedules}
+    by_silo = {silo["id"]: [] for silo in datasets.silos}
+    unassigned = []
+    for pet in datasets.pets:
+        by_silo.get(pet["silo"], unassigned).append(_pet(pet, schedules))
+    return models.DashboardSnapshot(
+        version=current,
+        generatedAt=now,
+        silos=[
+            models.DashboardSilo(
+                id=silo["id"], height=silo["height"], currentHeight=silo["currentHeight"],
+                percentage=silo["percentage"], forecast=models.SiloForecast(**silo_forecast.forecast(silo)),
+                pets=by_silo[silo["id"]],
+            )
+            for silo in datasets.silos
+        ],
+        unassignedPets=unassigned,
+        unknownRfids=_unknown_tags(),
+        alerts=datasets.alerts[::-1][:ALERTS],
+        events=[models.DashboardEvent(**e) for e in hub.recent(EVENTS)],
+    )
+
+
+def snapshot(now: datetime) -> tuple[int, bytes]:
+    """(version, JSON body) of the current view, rebuilt only after a write."""
+    global _cached
+    cached = _cached
+    current = version
+    if cached is not None and cached[0] == current:
+        if now - cached[2] < MAX_AGE:
+            return cached[0], cached[1]
+        touch()
+        current = version
+    body = build(now, current).model_dump_json().encode()
+    # A write during the build bumped version: the next call rebuilds
+    _cached = (current, body, now)
+    return current, body
@@ -1,3 +1,4 @@
+from collections import deque
 from datetime import datetime, timedelta
 
 pets = []
@@ -23,7 +24,47 @@ feeding_schedules = []
 # Tracks last feeding time per RFID
 last_feedings = {}
 
+# Precomputed eligibility per RFID, maintained by schedule_engine
+schedule_states = {}
+
+# Intake rollups per RFID, maintained by pet_analytics
+# value: {"hour" | "day" | "week": OrderedDict(period start -> bucket dict)}
+pet_rollups = {}
+
+# Body weight per RFID from the entry scale
+# value: body_weight.WeightSeries
+body_weights = {}
+
+# Fill level history and consumption rate per silo id
+# value: silo_forecast.SiloSeries
+silo_series = {}
+
 # Tracks unknown rfids
 # each entry: {"rfid": str, "timestamp": datetime}
 unknown_rfid_events = []
 
+# Latest telemetry per feeder
+# key: device id (MAC hex), value: DeviceTelemetry as dict
+device_telemetry = {}
+
+# Last firmware update result per feeder (see firmware.py)
+# key: device id (MAC hex), value: FirmwareReport as dict
+device_firmware = {}
+
+# Shipped warnings/errors per feeder, oldest first
+# key: device id (MAC hex), value: deque of DeviceLogEntry as dict
+device_logs = {}
+
+# Auger runs reported by the feeders (see dispensing.py), oldest first
+# each entry: DispenseReport as dict
+dispense_reports = deque(maxlen=500)
+
+# Measured auger flow per silo in g/s (see dispensing.py)
+# key: silo id, value: float
+flow_rates = {}
+
+# Raised alerts (e.g. pet has not eaten), oldest first
+# each entry: Alert as dict
+alerts = []
+# (rfid, type, since) of every raised alert, so detectors can re-run without duplicates
+alert_keys = set()
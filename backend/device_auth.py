@@ -0,0 +1,254 @@
+"""HMAC-SHA256 request signing for the feeders.
+
+    python device_auth.py add <device id>      # new key, printed for the feeder's device.key
+    python device_auth.py remove <device id>
+
+Every feeder has its own key (KEY_FILE: device id -> hex key). A signed
+request carries
+
+    X-Device-Id    feeder id (STA MAC as hex)
+    X-Timestamp    unix seconds; the feeder takes the time from /backend/health
+    X-Nonce        random hex, new for every request
+    X-Signature    hex HMAC-SHA256 of "<device>\\n<timestamp>\\n<nonce>\\n<METHOD>\\n<path?query>\\n" + body
+
+Timestamps more than SKEW seconds off are rejected, and a signature seen
+before is a replay. With a shared store (several workers), each signature
+is SET NX in Redis for 2 * SKEW, so it is accepted by one process once.
+Otherwise seen signatures are kept in two bloom filters that are
+rotated every 2 * SKEW, so a signature is remembered for as long as its
+timestamp can pass. The bit positions are slices of the signature itself,
+which is uniformly distributed already, so the filter needs no hashing of
+its own. Keys are cached as the SHA-256 states after the inner and outer
+pad: a verification is two state copies, two short updates and a compare.
+
+Responses the feeder has to trust (the firmware plan) carry X-Timestamp and
+X-Signature as well, the HMAC under the same key of
+"<device>\n<what was asked>\n<timestamp>\n" + body, so an old signed
+response cannot be replayed to another feeder, for another request or later.
+
+    DEVICE_AUTH=optional   (default) verify signed requests, let unsigned ones through (warned at startup)
+    DEVICE_AUTH=required   reject unsigned requests to the device endpoints
+    DEVICE_AUTH=off
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+MODE = os.environ.get("DEVICE_AUTH", "optional")
+KEY_FILE = os.environ.get("DEVICE_KEYS", "device_keys.json")
+SKEW = 120                # seconds a timestamp may be off
+BLOOM_BITS = 1 << 20      # per filter (128 KiB)
+BLOOM_HASHES = 4          # 32-bit slices of the signature used as bit positions
+
+
+class AuthError(Exception):
+    pass
+
+
+def _pads(key: bytes) -> tuple:
+    if len(key) > 64:
+        key = hashlib.sha256(key).digest()
+    key = key.ljust(64, b"\0")
+    return (hashlib.sha256(bytes(b ^ 0x36 for b in key)),
+            hashlib.sha256(bytes(b ^ 0x5C for b in key)))
+
+
+class KeyCache:
+    """Pad states per device, reloaded from KEY_FILE when an unknown device shows up and the file changed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pads = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def reload(self):
+        with self._lock:
+            try:
+                self._mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self._mtime = None
+            self._pads = {device: _pads(bytes.fromhex(key)) for device, key in self._read().items()}
+
+    def get(self, device: str) -> tuple | None:
+        pads = self._pads.get(device)
+        if pads is None:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+                pads = self._pads.get(device)
+        return pads
+
+    def add(self, device: str) -> str:
+        keys = self._read()
+        keys[device] = secrets.token_hex(32)
+        self._write(keys)
+        return keys[device]
+
+    def remove(self, device: str) -> bool:
+        keys = self._read()
+        if keys.pop(device, None) is None:
+            return False
+        self._write(keys)
+        return True
+
+    def _write(self, keys: dict):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(keys, f, indent=2, sort_keys=True)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self.path)
+        self.reload()
+
+
+class ReplayFilter:
+    """Signatures seen during the last 2-4 * SKEW seconds, with a small false positive rate."""
+
+    def __init__(self, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES, period: float = 2 * SKEW):
+        self.mask = bits - 1
+        self.hashes = hashes
+        self.period = period
+        self._filters = (bytearray(bits // 8), bytearray(bits // 8))
+        self._rotated = time.monotonic()
+        self._lock = threading.Lock()
+        self._redis = None
+
+    @property
+    def shared(self) -> bool:
+        return self._redis is not None
+
+    def share(self, client, prefix: str):
+        """Remembers signatures in Redis from now on, for every process using it."""
+        self._redis = client
+        self._prefix = prefix + "replay:"
+
+    def seen(self, digest: bytes) -> bool:
+        """Adds the signature; True if it was (probably) added before."""
+        if self._redis is not None:
+            # Exact: only the first SET of a digest within the period succeeds
+            return not self._redis.set(self._prefix + digest.hex(), 1, nx=True, px=int(self.period * 1000))
+        with self._lock:
+            now = time.monotonic()
+            if now - self._rotated >= self.period:
+                self._filters = (bytearray(len(self._filters[0])), self._filters[0])
+                self._rotated = now
+            current, previous = self._filters
+            in_current = in_previous = True
+            for i in range(0, 4 * self.hashes, 4):
+                pos = int.from_bytes(digest[i:i + 4], "little") & self.mask
+                byte, bit = pos >> 3, 1 << (pos & 7)
+                if not current[byte] & bit:
+                    in_current = False
+                    current[byte] |= bit
+                if not previous[byte] & bit:
+                    in_previous = False
+            return in_current or in_previous
+
+
+keys = KeyCache(KEY_FILE)
+replays = ReplayFilter()
+
+
+def verify_signature(device: str | None, timestamp: str | None, nonce: str | None, signature: str,
+                     method: str, target: str, body: bytes, now: float | None = None):
+    """Raises AuthError unless the request was signed by the device's key, recently and only once."""
+    if not (device and timestamp and nonce):
+        raise AuthError("Incomplete signature headers")
+    pads = keys.get(device)
+    if pads is None:
+        raise AuthError("Unknown device")
+    try:
+        stamp = int(timestamp)
+    except ValueError:
+        raise AuthError("Bad timestamp")
+    if abs((time.time() if now is None else now) - stamp) > SKEW:
+        raise AuthError("Stale timestamp")
+    inner = pads[0].copy()
+    inner.update(f"{device}\n{timestamp}\n{nonce}\n{method}\n{target}\n".encode())
+    inner.update(body)
+    outer = pads[1].copy()
+    outer.update(inner.digest())
+    digest = outer.digest()
+    try:
+        given = bytes.fromhex(signature)
+    except ValueError:
+        raise AuthError("Bad signature")
+    if not hmac.compare_digest(digest, given):
+        raise AuthError("Bad signature")
+    if replays.seen(digest):
+        raise AuthError("Replayed request")
+
+
+def sign_body(device: str, body: bytes, context: bytes = b"") -> str | None:
+    """Hex HMAC of context + a response body under the device's key, so the feeder can trust it; None without a key."""
+    pads = keys.get(device)
+    if pads is None:
+        return None
+    inner = pads[0].copy()
+    inner.update(context)
+    inner.update(body)
+    outer = pads[1].copy()
+    outer.update(inner.digest())
+    return outer.hexdigest()
+
+
+def response_headers(device: str, body: bytes, asked: str) -> dict:
+    """X-Timestamp and X-Signature for a response to `asked` (e.g. the feeder's version); {} without a key."""
+    stamp = str(int(time.time()))
+    signature = sign_body(device, body, f"{device}\n{asked}\n{stamp}\n".encode())
+    return {"x-timestamp": stamp, "x-signature": signature} if signature else {}
+
+
+async def verify(request):
+    """Checks a Starlette request according to MODE."""
+    if MODE == "off":
+        return
+    headers = request.headers
+    signature = headers.get("x-signature")
+    if signature is None:
+        if MODE == "required":
+            raise AuthError("Missing signature")
+        return
+    query = request.scope["query_string"].decode("latin-1")
+    target = request.url.path + ("?" + query if query else "")
+    args = (headers.get("x-device-id"), headers.get("x-timestamp"), headers.get("x-nonce"),
+            signature, request.method, target, await request.body())
+    if replays.shared:
+        # Store round trip: off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, verify_signature, *args)
+    else:
+        verify_signature(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("action", choices=("add", "remove"))
+    parser.add_argument("device")
+    args = parser.parse_args(argv)
+    if args.action == "add":
+        key = keys.add(args.device.lower())
+        print(f"{args.device.lower()}: {key}")
+        print("Write the key to device.key on the feeder.")
+    elif not keys.remove(args.device.lower()):
+        parser.exit(1, f"{args.device} has no key\n")
+
+
+if __name__ == "__main__":
+    main()
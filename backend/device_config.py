@@ -0,0 +1,85 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+
+import models
+
+# Per-feeder settings that used to be constants in petfooddispenser.py.
+#
+# CONFIG_FILE maps device id -> the fields set for that feeder (nested for
+# the pins); everything else comes from the models.DeviceConfig defaults. A
+# change is validated on the merged document, written to the file and
+# announced with a "config.updated" event to that feeder only. The feeder
+# fetches GET /device/config with the ETag of its cached copy, so a
+# periodic check of an unchanged config is answered with 304. A 200 is
+# signed for the feeder (device_auth.response_headers), since a document can
+# move its pins and apiBase.
+#
+# Changes over HTTP need "Authorization: Bearer $DEVICE_CONFIG_TOKEN";
+# without the variable they are refused.
+
+CONFIG_FILE = os.environ.get("DEVICE_CONFIGS", "device_configs.json")
+WRITE_TOKEN = os.environ.get("DEVICE_CONFIG_TOKEN")
+
+_lock = threading.Lock()
+
+
+def _read() -> dict:
+    try:
+        with open(CONFIG_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(configs: dict):
+    tmp = CONFIG_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(configs, f, indent=2, sort_keys=True)
+    os.replace(tmp, CONFIG_FILE)
+
+
+def may_write(authorization: str | None) -> bool:
+    """True if the Authorization header carries WRITE_TOKEN; always False without one."""
+    if not WRITE_TOKEN:
+        return False
+    return hmac.compare_digest((authorization or "").encode(), f"Bearer {WRITE_TOKEN}".encode())
+
+
+def overrides(device: str) -> dict:
+    return _read().get(device, {})
+
+
+def effective(device: str) -> models.DeviceConfig:
+    return models.DeviceConfig(**overrides(device))
+
+
+def update(device: str, changes: dict) -> models.DeviceConfig:
+    """Merges changes into the feeder's overrides; raises pydantic.ValidationError if the result is invalid."""
+    with _lock:
+        configs = _read()
+        stored = configs.get(device, {})
+        merged = {**stored, **changes}
+        if isinstance(changes.get("pins"), dict):
+            merged["pins"] = {**stored.get("pins", {}), **changes["pins"]}
+        config = models.DeviceConfig(**merged)
+        configs[device] = merged
+        _write(configs)
+    return config
+
+
+def reset(device: str) -> bool:
+    with _lock:
+        configs = _read()
+        if configs.pop(device, None) is None:
+            return False
+        _write(configs)
+    return True
+
+
+def document(device: str) -> tuple[str, bytes]:
+    """ETag and JSON body of the feeder's config as it is sent to the feeder."""
+    body = effective(device).model_dump_json().encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:16]}"', body
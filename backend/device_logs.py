@@ -0,0 +1,52 @@
+from collections import deque
+from datetime import datetime, timedelta
+
+import datasets
+import models
+
+# Log lines shipped by the feeders (see ESP32/log.py), kept per device.
+#
+# The feeder has no wall clock, so every entry carries its uptime and the
+# batch carries the uptime at sending; the difference to the time the batch
+# arrived dates each line.
+
+MAX_ENTRIES = 2000    # per device, the oldest fall off first
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+def ingest(batch: models.DeviceLogBatch, now: datetime) -> int:
+    """Stores a batch; returns how many lines were kept."""
+    log = datasets.device_logs.get(batch.device)
+    if log is None:
+        log = datasets.device_logs[batch.device] = deque(maxlen=MAX_ENTRIES)
+    kept = 0
+    if batch.dropped:
+        log.append(models.DeviceLogEntry(
+            device=batch.device, level="warning", timestamp=now,
+            message=f"{batch.dropped} log messages dropped on the device (queue full)").model_dump())
+    for level, uptime, message, repeats in batch.entries:
+        if level not in LEVELS:
+            continue
+        timestamp = now - timedelta(seconds=max(batch.uptime - uptime, 0))
+        log.append(models.DeviceLogEntry(device=batch.device, level=level, message=message,
+                                         repeats=repeats, timestamp=timestamp).model_dump())
+        kept += 1
+    return kept
+
+
+def search(device: str | None = None, level: str = "debug", q: str | None = None,
+           since: datetime | None = None, limit: int = 100) -> list[dict]:
+    """Newest first; `q` matches case-insensitively anywhere in the message."""
+    floor = LEVELS.get(level, 0)
+    needle = q.lower() if q else None
+    logs = [datasets.device_logs.get(device, ())] if device else datasets.device_logs.values()
+    entries = [
+        entry
+        for log in logs
+        for entry in log
+        if LEVELS[entry["level"]] >= floor
+        and (needle is None or needle in entry["message"].lower())
+        and (since is None or entry["timestamp"] >= since)
+    ]
+    entries.sort(key=lambda e: e["timestamp"], reverse=True)
+    return entries[:limit]
@@ -0,0 +1,101 @@
+import struct
+
+# Compact binary frames for the feeder <-> backend hot path.
+# The firmware side lives in ESP32/devproto.py and must use the same layouts.
+# All integers are little endian, weights in 0.1 g, lengths in mm.
+
+VERSION = 1
+MEDIA_TYPE = "application/octet-stream"
+
+MSG_CHECK = 1
+MSG_CONFIRM = 2
+MSG_TELEMETRY = 3
+
+# Status byte in every response
+OK = 0
+DENIED = 1
+UNKNOWN_PET = 2
+NO_SCHEDULE = 3
+NO_SILO = 4
+BUSY = 5  # rate limited, scan again later
+BAD_FRAME = 255
+
+UID_LEN = 10  # raw RFID bytes, zero padded
+
+HEADER = struct.Struct("<BB")                      # version, message type
+CHECK_REQUEST = struct.Struct("<BBB10s")           # header, uid length, uid
+CHECK_RESPONSE = struct.Struct("<BBBBH")           # header, status, silo, amount in 10 ms
+CONFIRM_REQUEST = struct.Struct("<BBB10siHii")     # header, uid length, uid, silo stock 0.1 g, height mm,
+                                                   # body weight 0.1 g (0 = none), eaten 0.1 g
+                                                   # (stock and eaten: negative = not measured)
+CONFIRM_REQUEST_V2 = struct.Struct("<BBB10siHi")   # same without eaten, older firmware
+CONFIRM_REQUEST_V1 = struct.Struct("<BBB10siH")    # same without body weight either
+TELEMETRY_REQUEST = struct.Struct("<BB6sHHiibII")  # header, mac, silo1 mm, silo2 mm, entry 0.1 g,
+                                                   # plate 0.1 g, rssi, free heap, uptime s
+STATUS_RESPONSE = struct.Struct("<BBB")            # header, status
+
+
+class FrameError(ValueError):
+    pass
+
+
+def _check_header(data: bytes, msg_type: int, layout: struct.Struct):
+    if len(data) != layout.size:
+        raise FrameError(f"expected {layout.size} bytes, got {len(data)}")
+    version, kind = HEADER.unpack_from(data)
+    if version != VERSION or kind != msg_type:
+        raise FrameError(f"unexpected frame version={version} type={kind}")
+
+
+def rfid_from_uid(uid: bytes, length: int) -> str:
+    # Same string the firmware builds with "%02X" per byte
+    if not 0 < length <= UID_LEN:
+        raise FrameError("bad uid length")
+    return uid[:length].hex().upper()
+
+
+def decode_check(data: bytes) -> str:
+    _check_header(data, MSG_CHECK, CHECK_REQUEST)
+    _, _, length, uid = CHECK_REQUEST.unpack(data)
+    return rfid_from_uid(uid, length)
+
+
+def encode_check(status: int, silo: int = 0, amount_seconds: float = 0.0) -> bytes:
+    centis = max(0, min(0xFFFF, int(round(amount_seconds * 100))))
+    return CHECK_RESPONSE.pack(VERSION, MSG_CHECK, status, silo, centis)
+
+
+def decode_confirm(data: bytes) -> tuple[str, float | None, float, float | None, float | None]:
+    """Returns (rfid, silo stock weight, silo height, body weight, grams eaten); weights None if not measured."""
+    body_dg = 0
+    eaten_dg = -1
+    if len(data) == CONFIRM_REQUEST_V1.size:
+        _check_header(data, MSG_CONFIRM, CONFIRM_REQUEST_V1)
+        _, _, length, uid, scale_dg, height_mm = CONFIRM_REQUEST_V1.unpack(data)
+    elif len(data) == CONFIRM_REQUEST_V2.size:
+        _check_header(data, MSG_CONFIRM, CONFIRM_REQUEST_V2)
+        _, _, length, uid, scale_dg, height_mm, body_dg = CONFIRM_REQUEST_V2.unpack(data)
+    else:
+        _check_header(data, MSG_CONFIRM, CONFIRM_REQUEST)
+        _, _, length, uid, scale_dg, height_mm, body_dg, eaten_dg = CONFIRM_REQUEST.unpack(data)
+    return (rfid_from_uid(uid, length), scale_dg / 10 if scale_dg >= 0 else None, height_mm / 10,
+            body_dg / 10 if body_dg > 0 else None, eaten_dg / 10 if eaten_dg >= 0 else None)
+
+
+def decode_telemetry(data: bytes) -> dict:
+    _check_header(data, MSG_TELEMETRY, TELEMETRY_REQUEST)
+    _, _, mac, silo1, silo2, entry_dg, plate_dg, rssi, free_heap, uptime = TELEMETRY_REQUEST.unpack(data)
+    return {
+        "deviceId": mac.hex(),
+        "silo1Distance": silo1 / 10,
+        "silo2Distance": silo2 / 10,
+        "entryWeight": entry_dg / 10,
+        "plateWeight": plate_dg / 10,
+        "rssi": rssi,
+        "freeHeap": free_heap,
+        "uptime": uptime,
+    }
+
+
+def encode_status(msg_type: int, status: int) -> bytes:
+    return STATUS_RESPONSE.pack(VERSION, msg_type, status)
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import alerts
+import datasets
+import models
+import rate_limit
+import storage
+
+# What the feeders' augers actually did (ESP32/auger.py).
+#
+# A feeder with a plate scale or a motor current sense reports every run:
+# how long food was flowing, the grams that arrived and the stalls it had to
+# clear. Runs with grams measured feed a per-silo flow rate (exponential
+# average), which replaces DEFAULT_FLOW when a granted portion is converted
+# into auger seconds. A run that stayed jammed raises an "auger-jam" alert;
+# the feeder does not confirm that feeding, so the portion is not booked,
+# and the grant it held is released so the pet can be checked again.
+# Kept per process, like the silo levels.
+
+DEFAULT_FLOW = 7.0      # g/s of a running auger until a silo has measured runs
+FLOW_WEIGHT = 0.2       # weight of a new measurement in the average
+MIN_MEASURED = 1.0      # seconds of flow before a run counts for the rate
+
+
+def record(report: models.DispenseReport, now: datetime) -> models.DispenseReport:
+    report.timestamp = now
+    if report.grams and report.grams > 0 and report.seconds >= MIN_MEASURED and report.outcome != "jammed":
+        report.flowRate = round(report.grams / report.seconds, 2)
+        previous = datasets.flow_rates.get(report.silo)
+        datasets.flow_rates[report.silo] = (report.flowRate if previous is None else
+                                            previous + FLOW_WEIGHT * (report.flowRate - previous))
+    datasets.dispense_reports.append(report.model_dump())
+    if report.outcome == "jammed":
+        storage.store.release(report.rfid, report.device)
+        rate_limit.outcomes.forget(report.rfid)
+        grams = "unknown" if report.grams is None else f"{report.grams:.0f} g"
+        alerts.raise_alert(report.rfid, "auger-jam",
+                           f"Silo {report.silo} auger stayed jammed after {report.jams} stalls "
+                           f"on feeder {report.device}, {grams} dispensed", now, now)
+    return report
+
+
+def flow_rate(silo_id: int) -> float:
+    return datasets.flow_rates.get(silo_id, DEFAULT_FLOW)
+
+
+def seconds_for(grams: float, silo_id: int) -> float:
+    return grams / flow_rate(silo_id)
+
+
+def recent(device: str | None, limit: int) -> list[dict]:
+    found = [r for r in reversed(datasets.dispense_reports) if device is None or r["device"] == device]
+    return found[:limit]
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import secrets
+import threading
+from collections import deque
+from datetime import datetime
+
+# Shared log (share()): seq from INCR, events in a capped list in seq order,
+# one epoch for every process. Each event is also published so the other
+# processes wake their long-polls and run their subscribers.
+
+# Appends ARGV[1] (an event without seq) under the next seq; returns the seq
+_PUBLISH = """
+local seq = redis.call('INCR', KEYS[1])
+local raw = '{"seq": ' .. seq .. ', ' .. string.sub(ARGV[1], 2)
+redis.call('RPUSH', KEYS[2], raw)
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+redis.call('PUBLISH', KEYS[4], ARGV[3] .. ' ' .. raw)
+return seq
+"""
+
+# The epoch, the current seq, the oldest seq kept and the events after ARGV[1] if the log reaches back to it
+_SINCE = """
+local last = tonumber(redis.call('GET', KEYS[1]) or '0')
+local oldest = last - redis.call('LLEN', KEYS[2]) + 1
+local after = tonumber(ARGV[1])
+local events = {}
+if after >= oldest - 1 and after < last then
+  events = redis.call('LRANGE', KEYS[2], after - oldest + 1, -1)
+end
+local epoch = redis.call('GET', KEYS[3])
+if not epoch then
+  epoch = ARGV[2]
+  redis.call('SET', KEYS[3], epoch)
+end
+return {epoch, last, oldest, events}
+"""
+
+
+def _decode(raw: str) -> dict:
+    event = json.loads(raw)
+    event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+    return event
+
+
+class EventHub:
+    """Sequenced change feed for feeders, consumed via long-polling.
+
+    Every published event gets the next sequence number and is kept in a
+    bounded log so a feeder can resume with the last sequence it saw. The
+    sequence is only meaningful within one `epoch`, which changes whenever
+    the log starts over (process start, reset()). Idle
+    long-polls only hold an asyncio.Event each; publishing (also from the
+    sync route handlers running in the threadpool) wakes them all.
+
+    After share() the log, seq and epoch live in Redis instead, so every
+    process serves the same feed and a feeder may poll any of them.
+    """
+
+    def __init__(self, retain: int = 1024):
+        self._log = deque(maxlen=retain)
+        self._seq = 0
+        self.epoch = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self._waiters = set()
+        self._subscribers = []
+        self._retain = retain
+        self._redis = None
+        self._listener = None
+        self._origin = secrets.token_hex(4)  # tells our own publishes apart on the channel
+
+    def share(self, client, prefix: str):
+        """Keeps the log in Redis (client with decode_responses) from now on."""
+        self._redis = client
+        self._keys = [prefix + "events:seq", prefix + "events:log", prefix + "events:epoch",
+                      prefix + "events"]
+        self._publish = client.register_script(_PUBLISH)
+        self._since = client.register_script(_SINCE)
+        client.set(self._keys[2], secrets.token_hex(4), nx=True)
+        self.epoch = client.get(self._keys[2])
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._keys[3]: self._on_message})
+        self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def _on_message(self, message: dict):
+        origin, _, raw = message["data"].partition(" ")
+        if origin == self._origin:
+            return
+        event = json.loads(raw)
+        self._notify(event["type"], event["data"])
+
+    def _notify(self, kind: str, data: dict):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+        for callback in self._subscribers:
+            callback(kind, data)
+
+    def publish(self, kind: str, data: dict, device: str | None = None) -> int:
+        """Appends an event; device=None addresses every feeder."""
+        if self._redis is not None:
+            raw = json.dumps({"type": kind, "device": device, "data": data,
+                              "timestamp": datetime.now().isoformat()}, default=lambda o: o.isoformat())
+            seq = self._publish(keys=self._keys, args=[raw, self._retain, self._origin])
+            self._notify(kind, data)
+            return seq
+        with self._lock:
+            self._seq += 1
+            self._log.append({
+                "seq": self._seq,
+                "type": kind,
+                "device": device,
+                "data": data,
+                "timestamp": datetime.now(),
+            })
+            seq = self._seq
+        self._notify(kind, data)
+        return seq
+
+    def subscribe(self, callback):
+        """Calls callback(kind, data) after every publish, in the publishing thread
+        (for events published by other processes: the listener thread)."""
+        self._subscribers.append(callback)
+
+    def recent(self, count: int) -> list:
+        """The last `count` events, newest first."""
+        if self._redis is not None:
+            raws = self._redis.lrange(self._keys[1], -count, -1) if count > 0 else []
+            return [_decode(raw) for raw in reversed(raws)]
+        with self._lock:
+            return [self._log[-i] for i in range(1, min(count, len(self._log)) + 1)]
+
+    def since(self, seq: int, device: str, epoch: str | None = None) -> tuple[list, bool, int]:
+        """Events after seq for this device, whether the client must resync, and the current seq.
+
+        The client must resync if it has no seq yet (boot), the log no longer
+        reaches back to seq, or the backend restarted (other epoch, or seq
+        ahead of ours). A resync gets no events, only the current seq: old
+        commands such as "reboot" must not be replayed to a feeder that
+        cannot tell which of them it already ran.
+        """
+        if self._redis is not None:
+            self.epoch, last, oldest, raws = self._since(keys=self._keys, args=[seq, secrets.token_hex(4)])
+            if seq < 0 or seq + 1 < oldest or seq > last or (epoch is not None and epoch != self.epoch):
+                return [], True, last
+            events = (_decode(raw) for raw in raws)
+            return [e for e in events if e["device"] in (None, device)], False, last
+        with self._lock:
+            oldest = self._log[0]["seq"] if self._log else self._seq + 1
+            reset = (seq < 0 or seq + 1 < oldest or seq > self._seq
+                     or (epoch is not None and epoch != self.epoch))
+            if reset:
+                return [], True, self._seq
+            events = [e for e in self._log
+                      if e["seq"] > seq and e["device"] in (None, device)]
+            return events, False, self._seq
+
+    async def _since_async(self, seq: int, device: str, epoch: str | None) -> tuple[list, bool, int]:
+        if self._redis is None:
+            return self.since(seq, device, epoch)
+        # Store round trip: off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.since, seq, device, epoch)
+
+    async def wait(self, seq: int, device: str, timeout: float,
+                   epoch: str | None = None) -> tuple[list, bool, int]:
+        result = await self._since_async(seq, device, epoch)
+        if result[0] or result[1]:
+            return result
+
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while True:
+                # Clear before re-checking so a publish in between is not lost
+                waiter[1].clear()
+                result = await self._since_async(seq, device, epoch)
+                remaining = deadline - loop.time()
+                if result[0] or result[1] or remaining <= 0:
+                    return result
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def reset(self):
+        if self._redis is not None:
+            self.epoch = secrets.token_hex(4)
+            pipe = self._redis.pipeline()
+            pipe.delete(self._keys[0], self._keys[1])
+            pipe.set(self._keys[2], self.epoch)
+            pipe.execute()
+            return
+        with self._lock:
+            self._log.clear()
+            self._seq = 0
+            self.epoch = secrets.token_hex(4)
+
+
+hub = EventHub()
@@ -0,0 +1,275 @@
+"""Versioned firmware bundles for the feeders, delivered as per-file deltas.
+
+    python firmware.py publish 1.4.0 ../ESP32/build
+    python firmware.py list
+
+A bundle is a version and a set of files (precompiled modules, config
+documents). Files are stored once under their SHA-256 and a bundle is just
+the manifest name -> hash, so publishing a version stores only what changed.
+
+A feeder asks with the version it runs. The plan lists the files whose
+hash differs from that version's, each either as a delta against the file
+the feeder has or in full, whichever is smaller, and zlib-compressed with a
+1 KiB window when the feeder can inflate. Deltas are a stream of COPY
+(offset, length in the old file) and INSERT (literal bytes) operations the
+feeder applies in fixed-size chunks; they are built on first request,
+checked by applying them, and cached. main.py and ota.py are never part of
+a bundle: they run the rollback and must not be the thing that breaks.
+
+Whatever is published ends up running on every feeder, so POST
+/firmware/publish needs "Authorization: Bearer $FIRMWARE_PUBLISH_TOKEN";
+without the variable, bundles can only be published with this CLI.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import struct
+import time
+import zipfile
+import zlib
+from io import BytesIO
+
+FIRMWARE_DIR = os.environ.get("FIRMWARE_DIR", "firmware")
+PUBLISH_TOKEN = os.environ.get("FIRMWARE_PUBLISH_TOKEN")
+PINNED = ("main.py", "boot.py", "ota.py", "ota.mpy")   # never delivered, see ESP32/ota.py
+BLOCK = 16          # shortest copy worth encoding
+ZLIB_WBITS = 10     # 1 KiB window, small enough to inflate on the feeder
+
+DELTA_MAGIC = b"NXD1"
+_DELTA_HEADER = struct.Struct("<4sII")   # magic, old size, new size
+_COPY = struct.Struct("<cII")            # b"C", offset in old, length
+_INSERT = struct.Struct("<cI")           # b"I", length, then the bytes
+
+
+class FirmwareError(ValueError):
+    pass
+
+
+
+def may_publish(authorization: str | None) -> bool:
+    """True if the Authorization header carries PUBLISH_TOKEN; always False without one."""
+    if not PUBLISH_TOKEN:
+        return False
+    return hmac.compare_digest((authorization or "").encode(), f"Bearer {PUBLISH_TOKEN}".encode())
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _path(*parts: str) -> str:
+    return os.path.join(FIRMWARE_DIR, *parts)
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ----------- Deltas -----------
+
+def make_delta(old: bytes, new: bytes) -> bytes:
+    """COPY/INSERT stream that turns old into new."""
+    index = {}
+    for i in range(len(old) - BLOCK + 1):
+        index.setdefault(old[i:i + BLOCK], i)
+    out = [_DELTA_HEADER.pack(DELTA_MAGIC, len(old), len(new))]
+    literal = 0     # start of the bytes not covered by a copy yet
+    i = 0
+    while i <= len(new) - BLOCK:
+        j = index.get(new[i:i + BLOCK])
+        if j is None:
+            i += 1
+            continue
+        n = BLOCK
+        while i + n < len(new) and j + n < len(old) and new[i + n] == old[j + n]:
+            n += 1
+        while i > literal and j > 0 and new[i - 1] == old[j - 1]:
+            i, j, n = i - 1, j - 1, n + 1
+        if i > literal:
+            out += [_INSERT.pack(b"I", i - literal), new[literal:i]]
+        out.append(_COPY.pack(b"C", j, n))
+        i += n
+        literal = i
+    if literal < len(new):
+        out += [_INSERT.pack(b"I", len(new) - literal), new[literal:]]
+    return b"".join(out)
+
+
+def apply_delta(old: bytes, delta: bytes) -> bytes:
+    """Reference implementation of what ESP32/ota.py does in chunks."""
+    magic, old_size, new_size = _DELTA_HEADER.unpack_from(delta)
+    if magic != DELTA_MAGIC or old_size != len(old):
+        raise FirmwareError("delta does not fit")
+    out = bytearray()
+    pos = _DELTA_HEADER.size
+    while len(out) < new_size:
+        if delta[pos:pos + 1] == b"C":
+            _, offset, length = _COPY.unpack_from(delta, pos)
+            out += old[offset:offset + length]
+            pos += _COPY.size
+        else:
+            _, length = _INSERT.unpack_from(delta, pos)
+            pos += _INSERT.size
+            out += delta[pos:pos + length]
+            pos += length
+    return bytes(out)
+
+
+def _deflate(data: bytes) -> bytes:
+    packer = zlib.compressobj(9, zlib.DEFLATED, ZLIB_WBITS)
+    return packer.compress(data) + packer.flush()
+
+
+# ----------- Store -----------
+
+def blob(sha: str) -> bytes:
+    if len(sha) != 64 or not all(c in "0123456789abcdef" for c in sha):
+        raise FirmwareError("bad hash")
+    try:
+        with open(_path("blobs", sha), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise FirmwareError("unknown file") from None
+
+
+def delta(old_sha: str, new_sha: str) -> bytes:
+    """Delta between two stored files, built and verified on first use."""
+    path = _path("deltas", f"{old_sha}-{new_sha}")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    old, new = blob(old_sha), blob(new_sha)
+    data = make_delta(old, new)
+    if apply_delta(old, data) != new:
+        raise FirmwareError("delta check failed")
+    _write(path, data)
+    return data
+
+
+def payload(data: bytes, encoding: str) -> bytes:
+    return _deflate(data) if encoding == "zlib" else data
+
+
+def publish(version: str, files: dict[str, bytes]) -> dict:
+    if not version or "/" in version or version.startswith("."):
+        raise FirmwareError("bad version")
+    if manifest(version) is not None:
+        raise FirmwareError(f"version {version} exists")
+    for name in files:
+        if name in PINNED or "/" in name or name.startswith("."):
+            raise FirmwareError(f"{name} cannot be delivered")
+    entries = {}
+    for name, data in sorted(files.items()):
+        sha = _sha(data)
+        if not os.path.exists(_path("blobs", sha)):
+            _write(_path("blobs", sha), data)
+        entries[name] = {"sha256": sha, "size": len(data)}
+    bundle = {"version": version, "created": time.time(), "files": entries}
+    _write(_path("bundles", f"{version}.json"), json.dumps(bundle, indent=2).encode())
+    return bundle
+
+
+def read_zip(data: bytes) -> dict[str, bytes]:
+    """Files of an uploaded archive by base name (folders inside it are flattened)."""
+    try:
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            return {os.path.basename(info.filename): archive.read(info)
+                    for info in archive.infolist() if not info.is_dir()}
+    except zipfile.BadZipFile:
+        raise FirmwareError("not a zip archive") from None
+
+
+def manifest(version: str | None) -> dict | None:
+    if not version or "/" in version or version.startswith("."):
+        return None
+    try:
+        with open(_path("bundles", f"{version}.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def bundles() -> list[dict]:
+    """All manifests, oldest first."""
+    try:
+        names = os.listdir(_path("bundles"))
+    except FileNotFoundError:
+        return []
+    found = [manifest(n[:-5]) for n in names if n.endswith(".json")]
+    return sorted(found, key=lambda b: b["created"])
+
+
+def plan(current: str | None, zlib_ok: bool) -> dict:
+    """What a feeder running `current` downloads to get to the latest bundle."""
+    available = bundles()
+    if not available or available[-1]["version"] == current:
+        return {"version": current, "files": [], "remove": []}
+    target = available[-1]
+    have = (manifest(current) or {"files": {}})["files"]
+    files = []
+    for name, entry in target["files"].items():
+        old = have.get(name)
+        if old is not None and old["sha256"] == entry["sha256"]:
+            continue
+        options = [(f"/device/firmware/blob/{entry['sha256']}", blob(entry["sha256"]), False)]
+        if old is not None:
+            options.append((f"/device/firmware/delta/{old['sha256']}/{entry['sha256']}",
+                            delta(old["sha256"], entry["sha256"]), True))
+        encoding = "zlib" if zlib_ok else "identity"
+        path, data, is_delta = min(options, key=lambda o: len(payload(o[1], encoding)))
+        files.append({
+            "name": name,
+            "sha256": entry["sha256"],
+            "size": entry["size"],
+            "delta": is_delta,
+            "encoding": encoding,
+            "transfer": len(payload(data, encoding)),
+            "path": f"{path}?encoding={encoding}",
+        })
+    return {
+        "version": target["version"],
+        "files": files,
+        "remove": sorted(set(have) - set(target["files"])),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="action", required=True)
+    pub = sub.add_parser("publish", help="store a new bundle")
+    pub.add_argument("version")
+    pub.add_argument("paths", nargs="+", help="files, or folders whose .py/.mpy/.json files are taken")
+    sub.add_parser("list")
+    args = parser.parse_args(argv)
+
+    if args.action == "list":
+        for bundle in bundles():
+            size = sum(f["size"] for f in bundle["files"].values())
+            print(f"{bundle['version']:12} {len(bundle['files']):3} files {size / 1024:8.1f} KiB  "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(bundle['created']))}")
+        return
+
+    files = {}
+    for path in args.paths:
+        names = ([os.path.join(path, n) for n in sorted(os.listdir(path))
+                  if n.endswith((".py", ".mpy", ".json")) and n not in PINNED]
+                 if os.path.isdir(path) else [path])
+        for name in names:
+            with open(name, "rb") as f:
+                files[os.path.basename(name)] = f.read()
+    try:
+        bundle = publish(args.version, files)
+    except FirmwareError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"published {bundle['version']}: {len(bundle['files'])} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,50 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+import math
 from datetime import datetime, time, timedelta
-from fastapi.staticfiles import StaticFiles
+import anomaly
+import background
+import body_weight
+import bulk_io
+import dashboard_view
 import datasets
+import device_auth
+import device_config
+import device_logs
+import device_protocol
+import dispensing
+import firmware
 import models
+import pet_analytics
+import rate_limit
+import response_cache
+import schedule_engine
+import silo_forecast
+import static_assets
+import storage
+from events import hub
 
-app = FastAPI()
+app = FastAPI(lifespan=background.lifespan)
+
+
+@app.middleware("http")
+async def sync_storage(request: Request, call_next):
+    # Pick up what other instances wrote (one round trip; nothing for the memory store)
+    if storage.store.shared:
+        await run_in_threadpool(storage.store.sync)
+    return await call_next(request)
 
 # ----------- Utilities -----------
 
-def is_within_time_window(time_window: int, rfid: str) -> bool:
-    # datasets.last_feedings[rfid] = datetime.now()
-    # test if now is ge the time of last feeding + defined time
-    return datetime.now() >= datasets.last_feedings.get(rfid, datetime.min) + timedelta(minutes=int(time_window))
+async def signed_device(request: Request):
+    """Dependency of the feeder endpoints: checks the request signature (see device_auth.py)."""
+    try:
+        await device_auth.verify(request)
+    except device_auth.AuthError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
 
 def find_pet(rfid: str):
     return next((p for p in datasets.pets if p["rfid"] == rfid), None)
@@ -24,23 +57,47 @@ def find_schedule(rfid: str):
 def find_silo(silo_id: int):
     return next((s for s in datasets.silos if s["id"] == silo_id), None)
 
-def convert_amount(amount: int) -> float:
-    # 1s of running dispenser = 7g
-    return amount / 7 * 1
+def convert_amount(amount: int, silo_id: int) -> float:
+    # grams -> seconds of auger run time, at the silo's measured flow (dispensing.py, 7 g/s until measured)
+    return dispensing.seconds_for(amount, silo_id)
 
 
 # ----------- listings -----------
+# Read endpoints are answered from response_cache; the writes below
+# invalidate the tags they change.
+
 @app.get("/pet/list")
+@response_cache.cached("pets")
 def list_pets(limit: int = 10):
     return datasets.pets[0:limit]
 
 
 @app.get("/silo/list")
+@response_cache.cached("silos")
 def list_silos(limit: int = 10):
     return datasets.silos[0:limit]
 
 
+@app.get("/silo/forecast")
+def forecast_silos(limit: int = 10):
+    # answered from the running rate estimate, not the history
+    return [models.SiloForecast(**silo_forecast.forecast(s)) for s in datasets.silos[0:limit]]
+
+
+@app.get("/silo/history/{silo_id}")
+def silo_history(silo_id: int, tier: str = "raw"):
+    if not find_silo(silo_id):
+        raise HTTPException(status_code=404, detail="Silo not found")
+    if tier not in ("raw", "hourly", "daily"):
+        raise HTTPException(status_code=400, detail="Unknown tier")
+    return [
+        models.SiloSample(timestamp=t, percentage=p, stockWeight=w)
+        for t, p, w in silo_forecast.series(silo_id).tier(tier).points()
+    ]
+
+
 @app.get("/schedule/list")
+@response_cache.cached("schedules")
 def list_schedules(limit: int = 10):
     return datasets.feeding_schedules[0:limit]
 
@@ -51,11 +108,16 @@ def create_pet(name: str, rfid: str, silo: int):
     if find_pet(rfid):
         raise HTTPException(status_code=400, detail="RFID already registered")
     pet = models.Pet(rfid=rfid, name=name, silo=silo)
+    if storage.store.add("pets", [pet.model_dump()]):
+        raise HTTPException(status_code=400, detail="RFID already registered")
     datasets.pets.append(pet.model_dump())
+    response_cache.invalidate("pets", f"pet:{rfid}")
+    hub.publish("pet.created", pet.model_dump())
     return {"status": "created", "pet": pet}
 
 
 @app.get("/pet/get/{rfid}")
+@response_cache.cached("pet:{rfid}")
 def get_pet(rfid: str):
     pet = find_pet(rfid)
     if pet:
@@ -69,6 +131,10 @@ def delete_pet(rfid: str):
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
     datasets.pets.remove(pet)
+    storage.store.remove("pets", rfid)
+    response_cache.invalidate("pets", f"pet:{rfid}")
+    background.disarm_hunger_alert(rfid)
+    hub.publish("pet.deleted", {"rfid": rfid})
     return {"status": "deleted"}
 
 
@@ -80,45 +146,196 @@ def delete_pet(rfid: str):
 def create_schedule(schedule: models.FeedingSchedule):
     if find_schedule(schedule.rfid):
         raise HTTPException(status_code=400, detail="Schedule already exists")
+    if storage.store.add("schedules", [schedule.model_dump()]):
+        raise HTTPException(status_code=400, detail="Schedule already exists")
     datasets.feeding_schedules.append(schedule.model_dump())
+    response_cache.invalidate("schedules")
+    schedule_engine.refresh(schedule.model_dump(), datetime.now())
+    background.arm_hunger_alert(schedule.rfid)
+    hub.publish("schedule.updated", schedule.model_dump())
     return {"status": "created", "schedule": schedule}
 
 
+@app.get("/schedule/get/{rfid}")
+@response_cache.cached("schedules")
+def get_schedule(rfid: str):
+    schedule = find_schedule(rfid)
+    if schedule:
+        return schedule
+    raise HTTPException(status_code=404, detail="Schedule not found")
+
+
 @app.post("/schedule/update")
-def update_schedule(schedule: models.FeedingSchedule):
+def update_schedule(changes: models.ScheduleUpdateRequest):
     for idx, _ in enumerate(datasets.feeding_schedules):
-        if _["rfid"] == schedule.rfid:
+        if _["rfid"] == changes.rfid:
+            try:
+                schedule = models.FeedingSchedule(**{**_, **changes.model_dump(exclude_unset=True)})
+            except ValidationError as e:
+                raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False))
             datasets.feeding_schedules[idx] = schedule.model_dump()
+            storage.store.put("schedules", [schedule.model_dump()])
+            response_cache.invalidate("schedules")
+            schedule_engine.refresh(schedule.model_dump(), datetime.now())
+            hub.publish("schedule.updated", schedule.model_dump())
             return {"status": "updated", "schedule": schedule}
     raise HTTPException(status_code=404, detail="Schedule not found")
 
 
-# ----------- Feeding Logic -----------
+# ----------- Bulk import / export -----------
+# CSV or NDJSON, chosen with ?format= or the Content-Type of the upload.
+# An import is all or nothing: any invalid or duplicate row rejects the file.
+
+_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _bulk_format(format: str | None, request: Request | None = None) -> str:
+    fmt = bulk_io.detect_format(format, request.headers.get("content-type") if request else None)
+    if fmt not in bulk_io.FORMATS:
+        raise HTTPException(status_code=400, detail="Unknown format")
+    return fmt
+
+
+async def _bulk_read(kind: str, request: Request, format: str | None, existing: set[str]) -> list[dict]:
+    try:
+        return await bulk_io.read(kind, _bulk_format(format, request), request.stream(), existing)
+    except bulk_io.BulkImportError as e:
+        raise HTTPException(status_code=400, detail={"rows": e.rows, "errors": e.errors})
+
+
+def _bulk_export(kind: str, records: list[dict], format: str) -> StreamingResponse:
+    fmt = _bulk_format(format)
+    return StreamingResponse(bulk_io.write(kind, fmt, records), media_type=_MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{kind}s.{fmt}"'})
+
+
+@app.post("/pet/import")
+async def import_pets(request: Request, format: str | None = None, dryRun: bool = False):
+    pets = await _bulk_read("pet", request, format, {p["rfid"] for p in datasets.pets})
+    if dryRun:
+        return {"status": "valid", "count": len(pets)}
+    # Re-check against pets created while the upload was streaming
+    existing = {p["rfid"] for p in datasets.pets}
+    clash = next((p["rfid"] for p in pets if p["rfid"] in existing), None) or storage.store.add("pets", pets)
+    if clash:
+        raise HTTPException(status_code=409, detail=f"RFID already registered: {clash}")
+    datasets.pets.extend(pets)
+    response_cache.invalidate("pets", *(f"pet:{p['rfid']}" for p in pets))
+    hub.publish("pet.imported", {"count": len(pets)})
+    return {"status": "imported", "count": len(pets)}
+
+
+@app.get("/pet/export")
+def export_pets(format: str = "csv"):
+    return _bulk_export("pet", list(datasets.pets), format)
 
-@app.post("/feeding/check/{rfid}")
-def feeding_check(rfid: str):
 
+@app.post("/schedule/import")
+async def import_schedules(request: Request, format: str | None = None, dryRun: bool = False):
+    schedules = await _bulk_read("schedule", request, format,
+                                 {s["rfid"] for s in datasets.feeding_schedules})
+    if dryRun:
+        return {"status": "valid", "count": len(schedules)}
+    existing = {s["rfid"] for s in datasets.feeding_schedules}
+    clash = (next((s["rfid"] for s in schedules if s["rfid"] in existing), None)
+             or storage.store.add("schedules", schedules))
+    if clash:
+        raise HTTPException(status_code=409, detail=f"Schedule already exists: {clash}")
+    datasets.feeding_schedules.extend(schedules)
+    response_cache.invalidate("schedules")
+    now = datetime.now()
+    for schedule in schedules:
+        schedule_engine.refresh(schedule, now)
+        background.arm_hunger_alert(schedule["rfid"])
+    hub.publish("schedule.imported", {"count": len(schedules)})
+    return {"status": "imported", "count": len(schedules)}
+
+
+@app.get("/schedule/export")
+def export_schedules(format: str = "csv"):
+    return _bulk_export("schedule", list(datasets.feeding_schedules), format)
+
+
+# ----------- Feeding Logic -----------
+
+def _device_of(request: Request) -> str:
+    # Feeders send their MAC; anything else is told apart by address
+    return request.headers.get("x-device-id") or (request.client.host if request.client else "unknown")
+
+
+def _debounce_for(outcome) -> float:
+    if isinstance(outcome, HTTPException):
+        unknown = str(outcome.detail).startswith("Pet not found")
+        return rate_limit.UNKNOWN_DEBOUNCE if unknown else rate_limit.DEBOUNCE
+    if not outcome.allowed and outcome.nextEligible:
+        # A denial must not outlive the moment the pet becomes eligible
+        return min(rate_limit.DEBOUNCE, (outcome.nextEligible - datetime.now()).total_seconds())
+    return rate_limit.DEBOUNCE
+
+
+def guarded_check(rfid: str, device: str) -> models.FeedingCheckResponse:
+    """check_feeding behind the scan debounce and the rate limits (see rate_limit.py)."""
+    key = (device, rfid)
+    outcome = rate_limit.outcomes.get(key)
+    if outcome is None:
+        wait = max(rate_limit.devices.take(device), rate_limit.tags.take(rfid))
+        if wait:
+            raise HTTPException(status_code=429, detail="Too many checks",
+                                headers={"Retry-After": str(math.ceil(wait))})
+        try:
+            outcome = check_feeding(rfid, device)
+        except HTTPException as e:
+            outcome = e
+        rate_limit.outcomes.put(key, outcome, _debounce_for(outcome))
+    if isinstance(outcome, HTTPException):
+        raise outcome
+    return outcome
+
+
+@app.post("/feeding/check/{rfid}", dependencies=[Depends(signed_device)])
+def feeding_check(rfid: str, request: Request):
+    return guarded_check(rfid, _device_of(request))
+
+
+def check_feeding(rfid: str, device: str) -> models.FeedingCheckResponse:
     pet = find_pet(rfid)
     if not pet:
-        datasets.unknown_rfid_events.append({"rfid": rfid, "timestamp": datetime.now()})
+        event = {"rfid": rfid, "timestamp": datetime.now()}
+        datasets.unknown_rfid_events.append(event)
+        storage.store.add_unknown(event)
+        background.touch_unknown(rfid)
+        dashboard_view.touch()
         raise HTTPException(status_code=404, detail="Pet not found, added to unknown list")
 
     sched = find_schedule(rfid)
     if not sched:
         raise HTTPException(status_code=404, detail="Schedule not found")
     # DONE rework schedule system so its 30min 100g == cat can enter every 30min and get 100g per 30min
-    # reworked is_within_time_window to account for minute differences instead of time windows
-    allowed = is_within_time_window(sched["timeWindow"],rfid)
+    # eligibility (interval, meal windows, daily budget) is precomputed by schedule_engine
+    now = datetime.now()
+    state = schedule_engine.check(sched, now)
+    allowed = schedule_engine.is_allowed(state, now)
+    if allowed and not storage.store.reserve(sched, state, device):
+        # Fed (or granted to another feeder) through another instance since our last sync:
+        # decide again on its data
+        storage.store.sync()
+        state = schedule_engine.check(sched, now)
+        allowed = schedule_engine.is_allowed(state, now) and storage.store.reserve(sched, state, device)
+    if not allowed:
+        pet_analytics.record_denied(rfid, now)
     return models.FeedingCheckResponse(
         allowed=allowed,
         siloId=pet["silo"], # 1 = left, 2 = right
         # DONE give brrrr data on how much food can be dispensed
-        amount=convert_amount(sched["amount"]) # in seconds
+        amount=convert_amount(state["portion"], pet["silo"]), # in seconds
+        nextEligible=state["nextEligible"] if state["nextEligible"] != datetime.max else None,
+        remainingBudget=schedule_engine.remaining_budget(sched, state),
     )
 
 
-@app.post("/feeding/confirm")
-def feeding_confirm(rfid: str, newScaleWeight: float, currentHeight: float):
+@app.post("/feeding/confirm", dependencies=[Depends(signed_device)])
+def feeding_confirm(rfid: str, currentHeight: float, newScaleWeight: float | None = None,
+                    bodyWeight: float | None = None, eaten: float | None = None):
     pet = find_pet(rfid)
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
@@ -133,8 +350,21 @@ def feeding_confirm(rfid: str, newScaleWeight: float, currentHeight: float):
 
     silo["percentage"] =  currentHeight * 100 / silo["height"]
 
-    silo["stockWeight"] = newScaleWeight
-    datasets.last_feedings[rfid] = datetime.now()
+    if newScaleWeight is not None:
+        silo["stockWeight"] = newScaleWeight
+    response_cache.invalidate("silos")
+    now = datetime.now()
+    silo_forecast.record(silo["id"], silo["percentage"], silo.get("stockWeight") or 0.0, now)
+    datasets.last_feedings[rfid] = now
+    granted = datasets.schedule_states.get(rfid)
+    dispensed = granted["portion"] if granted else sched["amount"]
+    storage.store.record_feeding(sched, now)
+    rate_limit.outcomes.forget(rfid)
+    # Without a plate scale the feeder cannot tell what was left: the portion counts as eaten
+    pet_analytics.record_visit(rfid, dispensed, dispensed if eaten is None else eaten, now)
+    body_weight.record(rfid, bodyWeight, now)
+    background.arm_hunger_alert(rfid)
+    dashboard_view.touch()
 
     event = models.FeedingEvent(
         rfid=rfid,
@@ -144,6 +374,39 @@ def feeding_confirm(rfid: str, newScaleWeight: float, currentHeight: float):
     return {"status": "ok"} # basically not needed lol | , "event": event}
 
 
+# ----------- Analytics -----------
+
+@app.get("/analytics/pet/{rfid}")
+def pet_intake(rfid: str, period: str = "day", count: int = 30):
+    if not find_pet(rfid):
+        raise HTTPException(status_code=404, detail="Pet not found")
+    if period not in pet_analytics.PERIODS:
+        raise HTTPException(status_code=400, detail="Unknown period")
+    count = min(max(count, 1), pet_analytics.PERIODS[period])
+    rows = pet_analytics.buckets(rfid, period, count, datetime.now())
+    return models.PetAnalytics(rfid=rfid, period=period, buckets=rows, total=pet_analytics.total(rows))
+
+
+@app.get("/analytics/pet/{rfid}/weight")
+def pet_weight(rfid: str, days: int = 90):
+    if not find_pet(rfid):
+        raise HTTPException(status_code=404, detail="Pet not found")
+    return models.WeightTrend(**body_weight.trend(rfid, min(max(days, 1), 730), datetime.now()))
+
+
+# ----------- Dashboard -----------
+
+@app.get("/dashboard/snapshot")
+def dashboard_snapshot(request: Request):
+    """Everything the dashboard shows in one response, cached until the next write."""
+    version, body = dashboard_view.snapshot(datetime.now())
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 # ----------- Unknown RFID Handling -----------
 
 @app.get("/dashboard/unknown-rfids")
@@ -156,6 +419,9 @@ def dismiss_unknown_rfid(rfid: str):
     datasets.unknown_rfid_events = [
         e for e in datasets.unknown_rfid_events if e["rfid"] != rfid
     ]
+    storage.store.drop_unknown(rfid)
+    background.forget_unknown(rfid)
+    dashboard_view.touch()
     return {"status": "dismissed"}
 
 
@@ -166,23 +432,297 @@ def register_pet_with_schedule(data : models.RegisterPetRequest):
 
     pet = models.Pet(rfid=data.rfid, name=data.name, silo=data.silo)
     schedule = models.FeedingSchedule(rfid=data.rfid, timeWindow=data.timeWindow, amount=data.amount)
+    if storage.store.add("pets", [pet.model_dump()]):
+        raise HTTPException(status_code=400, detail="Pet already exists")
+    storage.store.put("schedules", [schedule.model_dump()])
 
     datasets.pets.append(pet.model_dump())
     datasets.feeding_schedules.append(schedule.model_dump())
+    response_cache.invalidate("pets", f"pet:{data.rfid}", "schedules")
+    schedule_engine.refresh(schedule.model_dump(), datetime.now())
+    background.arm_hunger_alert(data.rfid)
 
     datasets.unknown_rfid_events = [
         e for e in datasets.unknown_rfid_events if e["rfid"] != data.rfid
     ]
+    storage.store.drop_unknown(data.rfid)
+    background.forget_unknown(data.rfid)
 
+    hub.publish("pet.created", pet.model_dump())
+    hub.publish("schedule.updated", schedule.model_dump())
     return {"status": "registered", "pet": pet, "schedule": schedule}
 
 
+# ----------- Alerts -----------
+
+@app.get("/alerts/list")
+def list_alerts(limit: int = 50):
+    # newest first
+    return datasets.alerts[::-1][0:limit]
+
+
+@app.post("/alerts/analyze")
+def analyze_alerts():
+    """Runs the anomaly detectors now instead of waiting for midnight."""
+    return {"status": "ok", "raised": anomaly.run(datetime.now())}
+
+
+# ----------- Device binary protocol -----------
+# Same logic as the JSON endpoints above, framed with device_protocol so the
+# ESP32 does not have to build URLs or parse JSON. The dashboard keeps JSON.
+
+_STATUS_BY_DETAIL = {
+    "Pet not found": device_protocol.UNKNOWN_PET,
+    "Schedule not found": device_protocol.NO_SCHEDULE,
+    "Silo not found": device_protocol.NO_SILO,
+    "Too many checks": device_protocol.BUSY,
+}
+
+
+def _status_for(error: HTTPException) -> int:
+    for prefix, status in _STATUS_BY_DETAIL.items():
+        if str(error.detail).startswith(prefix):
+            return status
+    return device_protocol.BAD_FRAME
+
+
+def _binary(payload: bytes) -> Response:
+    return Response(content=payload, media_type=device_protocol.MEDIA_TYPE)
+
+
+@app.post("/device/feeding/check", dependencies=[Depends(signed_device)])
+async def device_feeding_check(request: Request):
+    try:
+        rfid = device_protocol.decode_check(await request.body())
+    except device_protocol.FrameError:
+        return _binary(device_protocol.encode_check(device_protocol.BAD_FRAME))
+    try:
+        # Store round trips (Redis) must not block the event loop
+        result = await run_in_threadpool(guarded_check, rfid, _device_of(request))
+    except HTTPException as e:
+        return _binary(device_protocol.encode_check(_status_for(e)))
+    status = device_protocol.OK if result.allowed else device_protocol.DENIED
+    return _binary(device_protocol.encode_check(status, result.siloId, result.amount))
+
+
+@app.post("/device/feeding/confirm", dependencies=[Depends(signed_device)])
+async def device_feeding_confirm(request: Request):
+    msg = device_protocol.MSG_CONFIRM
+    try:
+        rfid, scale_weight, height, body, eaten = device_protocol.decode_confirm(await request.body())
+    except device_protocol.FrameError:
+        return _binary(device_protocol.encode_status(msg, device_protocol.BAD_FRAME))
+    try:
+        await run_in_threadpool(feeding_confirm, rfid, height, scale_weight, body, eaten)
+    except HTTPException as e:
+        return _binary(device_protocol.encode_status(msg, _status_for(e)))
+    return _binary(device_protocol.encode_status(msg, device_protocol.OK))
+
+
+@app.post("/device/telemetry", dependencies=[Depends(signed_device)])
+async def device_telemetry(request: Request):
+    msg = device_protocol.MSG_TELEMETRY
+    try:
+        data = device_protocol.decode_telemetry(await request.body())
+    except device_protocol.FrameError:
+        return _binary(device_protocol.encode_status(msg, device_protocol.BAD_FRAME))
+    telemetry = models.DeviceTelemetry(**data, timestamp=datetime.now())
+    datasets.device_telemetry[telemetry.deviceId] = telemetry.model_dump()
+    return _binary(device_protocol.encode_status(msg, device_protocol.OK))
+
+
+@app.post("/device/dispense", dependencies=[Depends(signed_device)])
+def device_dispense(report: models.DispenseReport):
+    """An auger run with stall/jam outcome and the grams that reached the plate."""
+    report = dispensing.record(report, datetime.now())
+    return {"status": "ok", "flowRate": report.flowRate}
+
+
+@app.get("/device/dispense/list")
+def list_dispense_reports(device: str | None = None, limit: int = 50):
+    return {
+        "flowRates": {silo["id"]: round(dispensing.flow_rate(silo["id"]), 2) for silo in datasets.silos},
+        "reports": dispensing.recent(device, limit),
+    }
+
+
+@app.get("/device/telemetry/list")
+def list_device_telemetry():
+    return list(datasets.device_telemetry.values())
+
+
+# ----------- Device logs -----------
+
+@app.post("/device/logs", dependencies=[Depends(signed_device)])
+def ingest_device_logs(batch: models.DeviceLogBatch):
+    return {"status": "ok", "stored": device_logs.ingest(batch, datetime.now())}
+
+
+@app.get("/device/logs/search")
+def search_device_logs(device: str | None = None, level: str = "debug", q: str | None = None,
+                       since: datetime | None = None, limit: int = 100):
+    if level not in device_logs.LEVELS:
+        raise HTTPException(status_code=400, detail="Unknown level")
+    return device_logs.search(device, level, q, since, limit)
+
+
+# ----------- Device push channel -----------
+
+DEVICE_COMMANDS = {"lock", "unlock", "tare", "reboot", "portion"}
+
+
+@app.get("/device/events", dependencies=[Depends(signed_device)])
+async def device_events(device: str, since: int = -1, timeout: float = 25, epoch: str | None = None):
+    """Long-poll for changes after sequence `since` of `epoch`.
+
+    Returns at once if events are pending, otherwise when one is published
+    or the timeout expires. `reset` tells the feeder its sequence is unknown
+    or too old and it should resync its state before continuing from `seq`
+    and the returned `epoch`; a reset carries no events.
+    """
+    events, reset, seq = await hub.wait(since, device, min(max(timeout, 0), 55), epoch)
+    return {"seq": seq, "epoch": hub.epoch, "reset": reset, "events": events}
+
+
+@app.post("/device/{device_id}/command")
+def device_command(device_id: str, command: models.DeviceCommand):
+    if command.command not in DEVICE_COMMANDS:
+        raise HTTPException(status_code=400, detail="Unknown command")
+    if command.command == "portion" and (command.value is None or command.value <= 0):
+        raise HTTPException(status_code=400, detail="Portion needs a positive value")
+    seq = hub.publish("command", command.model_dump(), device=device_id)
+    return {"status": "queued", "seq": seq}
+
+
+# ----------- Firmware updates -----------
+
+def firmware_publisher(request: Request):
+    if not firmware.PUBLISH_TOKEN:
+        raise HTTPException(status_code=403, detail="Publishing over HTTP is disabled (FIRMWARE_PUBLISH_TOKEN)")
+    if not firmware.may_publish(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Bad publish token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.post("/firmware/publish/{version}", dependencies=[Depends(firmware_publisher)])
+async def publish_firmware(version: str, request: Request):
+    """Stores a zip of modules/config files as a new bundle and tells the feeders."""
+    try:
+        files = firmware.read_zip(await request.body())
+        bundle = await run_in_threadpool(firmware.publish, version, files)
+    except firmware.FirmwareError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    hub.publish("firmware.published", {"version": version})
+    return {"version": version, "files": len(bundle["files"])}
+
+
+@app.get("/firmware/list")
+def list_firmware():
+    return [{"version": b["version"], "created": datetime.fromtimestamp(b["created"]),
+             "files": len(b["files"]), "size": sum(f["size"] for f in b["files"].values())}
+            for b in firmware.bundles()]
+
+
+@app.get("/firmware/devices")
+def list_firmware_reports():
+    return list(datasets.device_firmware.values())
+
+
+@app.get("/device/firmware", dependencies=[Depends(signed_device)])
+def device_firmware_plan(request: Request, version: str | None = None, encoding: str = "identity"):
+    """Files to fetch to get from `version` to the latest bundle, signed for the feeder, `version` and now."""
+    try:
+        plan = firmware.plan(version, encoding == "zlib")
+    except firmware.FirmwareError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    body = JSONResponse(plan).body
+    headers = device_auth.response_headers(_device_of(request), body, version or "")
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/device/firmware/blob/{sha}", dependencies=[Depends(signed_device)])
+def device_firmware_blob(sha: str, encoding: str = "identity"):
+    try:
+        data = firmware.blob(sha)
+    except firmware.FirmwareError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=firmware.payload(data, encoding), media_type="application/octet-stream")
+
+
+@app.get("/device/firmware/delta/{old}/{new}", dependencies=[Depends(signed_device)])
+def device_firmware_delta(old: str, new: str, encoding: str = "identity"):
+    try:
+        data = firmware.delta(old, new)
+    except firmware.FirmwareError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=firmware.payload(data, encoding), media_type="application/octet-stream")
+
+
+@app.post("/device/firmware/report", dependencies=[Depends(signed_device)])
+def device_firmware_report(report: models.FirmwareReport):
+    report.timestamp = datetime.now()
+    datasets.device_firmware[report.device] = report.model_dump()
+    return {"status": "ok"}
+
+
+# ----------- Device config -----------
+
+@app.get("/device/config", dependencies=[Depends(signed_device)])
+def device_config_document(request: Request):
+    """The calling feeder's settings, signed for it, the ETag it sent and now; 304 if its cached copy is current."""
+    device = _device_of(request)
+    etag, body = device_config.document(device)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    sent = request.headers.get("if-none-match")
+    if sent == etag:
+        return Response(status_code=304, headers=headers)
+    headers.update(device_auth.response_headers(device, body, sent or ""))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/device/{device_id}/config")
+def get_device_config(device_id: str):
+    return {"config": device_config.effective(device_id), "overrides": device_config.overrides(device_id)}
+
+
+def config_writer(request: Request):
+    if not device_config.WRITE_TOKEN:
+        raise HTTPException(status_code=403, detail="Config changes over HTTP are disabled (DEVICE_CONFIG_TOKEN)")
+    if not device_config.may_write(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Bad config token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.post("/device/{device_id}/config", dependencies=[Depends(config_writer)])
+def update_device_config(device_id: str, changes: dict):
+    try:
+        config = device_config.update(device_id, changes)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False))
+    hub.publish("config.updated", {}, device=device_id)
+    return config
+
+
+@app.post("/device/{device_id}/config/reset", dependencies=[Depends(config_writer)])
+def reset_device_config(device_id: str):
+    if not device_config.reset(device_id):
+        raise HTTPException(status_code=404, detail="No settings stored for this feeder")
+    hub.publish("config.updated", {}, device=device_id)
+    return device_config.effective(device_id)
+
+
 # ----------- Backend Health -----------
 
 @app.get("/backend/health")
 def health():
-    return {"status": "ok"}
+    # time: the feeders' clock for signed requests
+    return {"status": "ok", "time": int(datetime.now().timestamp())}
+
+
+@app.get("/backend/cache")
+def cache_stats():
+    """Hit/miss counters of the read endpoint cache."""
+    return response_cache.stats()
 
 # ------------ Dashboard mount -----------
 
-app.mount("/", StaticFiles(directory="dashboard", html=True), name="dashboard")
+# Fingerprinted, precompressed build from static_assets.py (built in memory if dashboard_dist is missing)
+app.mount("/", static_assets.DashboardFiles("dashboard", "dashboard_dist"), name="dashboard")
@@ -1,5 +1,5 @@
-from datetime import datetime
-from pydantic import BaseModel
+from datetime import date, datetime, time
+from pydantic import BaseModel, ConfigDict, model_validator
 
 
 class Pet(BaseModel):
@@ -8,16 +8,32 @@ class Pet(BaseModel):
     silo: int
 
 
+class MealWindow(BaseModel):
+    start: time  # "HH:MM"
+    end: time    # exclusive, same day
+    amount: float | None = None  # defaults to the schedule amount
+
+    @model_validator(mode="after")
+    def check_order(self):
+        if self.end <= self.start:
+            raise ValueError("meal window must end after it starts")
+        return self
+
+
 class FeedingSchedule(BaseModel):
     rfid: str
-    timeWindow: int
-    amount: float
+    timeWindow: int  # minimum minutes between feedings
+    amount: float    # grams per feeding
+    dailyBudget: float | None = None  # grams per calendar day
+    meals: list[MealWindow] = []      # allowed time-of-day windows, empty = all day
 
 
 class FeedingCheckResponse(BaseModel):
     allowed: bool
     siloId: int
     amount: float
+    nextEligible: datetime | None = None
+    remainingBudget: float | None = None
 
 
 class Silo(BaseModel):
@@ -27,6 +43,53 @@ class Silo(BaseModel):
     percentage: float
 
 
+class IntakeBucket(BaseModel):
+    start: datetime | None
+    dispensed: float  # grams
+    eaten: float      # grams, weighed by the feeder's plate scale (the portion without one)
+    visits: int
+    denied: int
+
+
+class PetAnalytics(BaseModel):
+    rfid: str
+    period: str  # "hour", "day" or "week"
+    buckets: list[IntakeBucket]  # oldest first
+    total: IntakeBucket
+
+
+class WeightPoint(BaseModel):
+    day: date
+    grams: float  # mean of the day's visits
+
+
+class WeightTrend(BaseModel):
+    rfid: str
+    latest: float | None = None
+    latestAt: datetime | None = None
+    samples: int = 0                # visits in the requested range
+    perWeek: float | None = None    # least squares slope, grams per week
+    change: float | None = None     # grams gained (+) or lost (-) over the range
+    daily: list[WeightPoint] = []
+
+
+class SiloForecast(BaseModel):
+    siloId: int
+    percentage: float
+    stockWeight: float | None = None
+    ratePerDay: float | None = None   # fill level drop in % per day
+    hoursLeft: float | None = None
+    emptyAt: datetime | None = None
+    lastRefill: datetime | None = None
+    samples: int = 0
+
+
+class SiloSample(BaseModel):
+    timestamp: datetime
+    percentage: float
+    stockWeight: float
+
+
 class FeedingEvent(BaseModel):
     rfid: str
     timestamp: datetime
@@ -43,6 +106,14 @@ class ScheduleCreateRequest(BaseModel):
     timeWindow: int
     amount: float
 
+class ScheduleUpdateRequest(BaseModel):
+    """The fields to change; the others keep their stored values."""
+    rfid: str
+    timeWindow: int | None = None
+    amount: float | None = None
+    dailyBudget: float | None = None
+    meals: list[MealWindow] | None = None
+
 class FeedingConfirmRequest(BaseModel):
     rfid: str
     newScaleWeight: float
@@ -55,3 +126,170 @@ class RegisterPetRequest(BaseModel):
     amount: float
 
 
+class DeviceTelemetry(BaseModel):
+    deviceId: str
+    silo1Distance: float
+    silo2Distance: float
+    entryWeight: float
+    plateWeight: float
+    rssi: int
+    freeHeap: int
+    uptime: int
+    timestamp: datetime
+
+
+class DeviceCommand(BaseModel):
+    command: str  # lock | unlock | tare | reboot | portion
+    value: float | None = None  # seconds of dispensing for "portion"
+
+
+class FirmwareReport(BaseModel):
+    device: str
+    version: str | None = None
+    status: str   # "installed", "failed", "rolled-back"
+    detail: str | None = None
+    timestamp: datetime | None = None  # set by the backend
+
+
+class DevicePins(BaseModel):
+    # GPIO numbers on the feeder; changes take effect after a restart
+    model_config = ConfigDict(extra="forbid")
+
+    servoEntry: int = 9
+    auger1: int = 1
+    auger2: int = 7
+    hxEntryDt: int = 15
+    hxEntrySck: int = 4
+    hxPlatesDt: int = 12
+    hxPlatesSck: int = 4
+    rfidSck: int = 18
+    rfidMosi: int = 23
+    rfidMiso: int = 19
+    rfidCs: int = 5
+    silo1Trigger: int = 20
+    silo1Echo: int = 22
+    silo2Trigger: int = 10
+    silo2Echo: int = 2
+    tray1Ctrl: int = 11
+    tray2Ctrl: int = 8
+    trayPower: int = 3
+    auger1Reverse: int | None = None  # H-bridge direction pins, None: motor can only be switched on/off
+    auger2Reverse: int | None = None
+    augerCurrent: int | None = None   # ADC input of a motor current shunt
+
+    @model_validator(mode="after")
+    def check_range(self):
+        # GPIO 24-30 drive the ESP32-C6's flash; only ADC1 (GPIO 0-6) can measure the current
+        for name, pin in self:
+            if pin is not None and not 0 <= pin <= 23:
+                raise ValueError(f"{name}: GPIO {pin} is not usable on the ESP32-C6 (0-23)")
+        if self.augerCurrent is not None and self.augerCurrent > 6:
+            raise ValueError(f"augerCurrent: GPIO {self.augerCurrent} is not an ADC input (0-6)")
+        return self
+
+
+class DeviceConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    apiBase: str | None = None      # backend URL, None keeps the feeder's; takes effect after a restart
+    pins: DevicePins = DevicePins()
+    catThreshold: float = 50        # grams on the entry scale that count as a cat inside
+    servoLock: int = 120            # entry servo duty, door closed
+    servoUnlocked: int = 30         # ... door open
+    siloEmptyDistance: float = 30   # cm from the level sensor to the food when the silo is empty
+    siloFullDistance: float = 5     # ... when it is full
+    entryTimeout: float = 30        # seconds the open door waits for the cat
+    plateScale: bool = False        # HX711 under the plates fitted (needs its own SCK pin); needs a restart
+    stallMs: int = 400              # no weight gain (or over-current) for this long is a stalled auger
+    unjamAttempts: int = 3          # recoveries per run before it counts as jammed
+    stallCurrent: int = 45000       # ADC reading (0-65535) of a stalled motor, with pins.augerCurrent
+
+    @model_validator(mode="after")
+    def check_values(self):
+        if not (0 <= self.servoLock <= 1023 and 0 <= self.servoUnlocked <= 1023):
+            raise ValueError("servo duty must be 0-1023")
+        if not 0 < self.siloFullDistance < self.siloEmptyDistance:
+            raise ValueError("silo must be full at a shorter distance than empty")
+        if self.catThreshold <= 0 or self.entryTimeout <= 0:
+            raise ValueError("catThreshold and entryTimeout must be positive")
+        if self.plateScale and self.pins.hxPlatesSck == self.pins.hxEntrySck:
+            raise ValueError("the plate scale needs an SCK pin of its own")
+        if not (100 <= self.stallMs <= 5000 and 0 <= self.unjamAttempts <= 10 and 0 <= self.stallCurrent <= 65535):
+            raise ValueError("stallMs must be 100-5000, unjamAttempts 0-10, stallCurrent 0-65535")
+        return self
+
+
+class DispenseReport(BaseModel):
+    device: str
+    rfid: str
+    silo: int
+    outcome: str                  # "ok", "recovered" (stalled, cleared), "jammed"
+    seconds: float                # auger run time with food flowing
+    grams: float | None = None    # from the plate scale; None with current sensing only
+    jams: int = 0                 # stalls detected during the run
+    flowRate: float | None = None   # g/s, set by the backend
+    timestamp: datetime | None = None  # set by the backend
+
+
+class Alert(BaseModel):
+    rfid: str
+    type: str    # "not-eaten", "intake-drop", "intake-shift", "weight-drop", "weight-shift", "auger-jam"
+    detail: str
+    since: datetime | None = None  # last feeding or start of the anomaly
+    timestamp: datetime
+
+
+class DeviceLogBatch(BaseModel):
+    device: str
+    uptime: int                # device uptime in seconds when the batch was sent
+    dropped: int = 0           # messages the device lost because its queue was full
+    entries: list[tuple[str, int, str, int]]  # [level, uptime s, message, suppressed repeats]
+
+
+class DeviceLogEntry(BaseModel):
+    device: str
+    level: str   # "debug", "info", "warning", "error"
+    message: str
+    repeats: int = 0  # identical messages rate limited on the device before this one
+    timestamp: datetime  # estimated from the device uptime
+
+
+class DashboardPet(BaseModel):
+    rfid: str
+    name: str
+    schedule: FeedingSchedule | None = None
+    nextEligible: datetime | None = None
+    lastFeeding: datetime | None = None
+
+
+class DashboardSilo(BaseModel):
+    id: int
+    height: float
+    currentHeight: float
+    percentage: float
+    forecast: SiloForecast
+    pets: list[DashboardPet]
+
+
+class UnknownTag(BaseModel):
+    rfid: str
+    firstSeen: datetime
+    lastSeen: datetime
+    scans: int
+
+
+class DashboardEvent(BaseModel):
+    seq: int
+    type: str
+    device: str | None = None
+    timestamp: datetime
+
+
+class DashboardSnapshot(BaseModel):
+    version: int          # bumped on every write, also sent as ETag
+    generatedAt: datetime
+    silos: list[DashboardSilo]
+    unassignedPets: list[DashboardPet]  # silo id that does not exist
+    unknownRfids: list[UnknownTag]      # latest scan first
+    alerts: list[Alert]                 # newest first
+    events: list[DashboardEvent]        # newest first
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+import datasets
+
+# Intake rollups per RFID, kept in datasets.pet_rollups.
+#
+# Every confirmed feeding and every denied check is added to the current
+# hour, day and week bucket of the pet, so a query only reads the buckets
+# it returns. Each tier keeps a bounded number of buckets:
+#   hour  14 days
+#   day   ~1 year
+#   week  2 years
+
+PERIODS = {
+    "hour": 24 * 14,
+    "day": 366,
+    "week": 104,
+}
+
+
+def _period_start(period: str, now: datetime) -> datetime:
+    if period == "hour":
+        return now.replace(minute=0, second=0, microsecond=0)
+    start = datetime.combine(now.date(), time.min)
+    if period == "week":
+        start -= timedelta(days=now.weekday())  # weeks start on Monday
+    return start
+
+
+def _step(period: str) -> timedelta:
+    return {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}[period]
+
+
+def _empty(start: datetime) -> dict:
+    return {"start": start, "dispensed": 0.0, "eaten": 0.0, "visits": 0, "denied": 0}
+
+
+def _add(rfid: str, now: datetime, **counts):
+    tiers = datasets.pet_rollups.get(rfid)
+    if tiers is None:
+        tiers = datasets.pet_rollups[rfid] = {period: OrderedDict() for period in PERIODS}
+    for period, keep in PERIODS.items():
+        tier = tiers[period]
+        start = _period_start(period, now)
+        bucket = tier.get(start)
+        if bucket is None:
+            bucket = tier[start] = _empty(start)
+            while len(tier) > keep:
+                tier.popitem(last=False)
+        for key, value in counts.items():
+            bucket[key] += value
+
+
+def record_visit(rfid: str, dispensed: float, eaten: float, now: datetime):
+    """Books one confirmed feeding (grams dispensed and eaten)."""
+    _add(rfid, now, dispensed=dispensed, eaten=eaten, visits=1)
+
+
+def record_denied(rfid: str, now: datetime):
+    _add(rfid, now, denied=1)
+
+
+def buckets(rfid: str, period: str, count: int, now: datetime) -> list[dict]:
+    """The last `count` buckets up to now, oldest first; periods without data are zero."""
+    tier = datasets.pet_rollups.get(rfid, {}).get(period, {})
+    step = _step(period)
+    start = _period_start(period, now) - step * (count - 1)
+    result = []
+    for _ in range(count):
+        bucket = tier.get(start)
+        result.append(dict(bucket) if bucket else _empty(start))
+        start += step
+    return result
+
+
+def total(rows: list[dict]) -> dict:
+    summed = _empty(rows[0]["start"] if rows else None)
+    for row in rows:
+        for key in ("dispensed", "eaten", "visits", "denied"):
+            summed[key] += row[key]
+    return summed
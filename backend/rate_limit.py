@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+from events import hub
+
+# Load shedding for /feeding/check.
+#
+# A cat sitting on the reader makes its feeder scan the same tag every
+# ~0.5 s. A repeat of the same check from the same feeder is answered with
+# the previous outcome for DEBOUNCE seconds (UNKNOWN_DEBOUNCE for tags the
+# backend does not know), without touching the schedules, the unknown tag
+# list or the store. Checks that get past that take a token from the
+# feeder's and from the tag's bucket; an empty bucket is answered with 429
+# (BUSY on the binary protocol). All of it is per process.
+#
+# Outcomes are dropped when a feeding is confirmed for the tag and on the hub
+# events that change a feeding decision: those of the tag's pet or schedule
+# drop its outcomes, a bulk import drops all. A registration or schedule
+# change is thus seen at the next scan; alerts, logs, config and firmware
+# events leave the debounce alone.
+
+DEVICE_RATE = 2.0        # checks per second per feeder, sustained
+DEVICE_BURST = 10
+TAG_RATE = 0.5           # checks per second per RFID, over all feeders
+TAG_BURST = 5
+DEBOUNCE = 2.0           # seconds an outcome is repeated
+UNKNOWN_DEBOUNCE = 30.0  # ... for a tag that is not registered
+MAX_KEYS = 1024          # buckets/outcomes kept each; the least recently used go first
+
+clock = time.monotonic   # replaced by the firmware simulator
+
+
+class Limiter:
+    """Token buckets of `burst` tokens refilled at `rate` per second, one per key."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.limited = 0
+        self._buckets = OrderedDict()   # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, key) -> float:
+        """0 if a token was taken, otherwise the seconds until the next one."""
+        now = clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            self.limited += 1
+            return (1 - bucket[0]) / self.rate
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self.limited = 0
+
+
+class Debounce:
+    """Recent outcomes per (device, rfid), each valid for its own number of seconds."""
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max_keys
+        self.hits = 0
+        self._outcomes = OrderedDict()  # (device, rfid) -> (expires, outcome)
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._outcomes.get(key)
+            if entry is None:
+                return None
+            if clock() >= entry[0]:
+                del self._outcomes[key]
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, outcome, seconds: float):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._outcomes[key] = (clock() + seconds, outcome)
+            self._outcomes.move_to_end(key)
+            if len(self._outcomes) > self.max_keys:
+                self._outcomes.popitem(last=False)
+
+    def forget(self, rfid: str):
+        with self._lock:
+            for key in [k for k in self._outcomes if k[1] == rfid]:
+                del self._outcomes[key]
+
+    def clear(self, *_):
+        with self._lock:
+            self._outcomes.clear()
+
+
+devices = Limiter(DEVICE_RATE, DEVICE_BURST)
+tags = Limiter(TAG_RATE, TAG_BURST)
+outcomes = Debounce()
+
+# hub events that change the decision for the tag in data["rfid"], or for every tag
+_TAG_EVENTS = {"pet.created", "pet.deleted", "schedule.updated"}
+_ALL_EVENTS = {"pet.imported", "schedule.imported"}
+
+
+def _invalidate(kind: str, data: dict):
+    if kind in _TAG_EVENTS:
+        outcomes.forget(data["rfid"])
+    elif kind in _ALL_EVENTS:
+        outcomes.clear()
+
+
+hub.subscribe(_invalidate)
+
+
+def reset():
+    devices.reset()
+    tags.reset()
+    outcomes.clear()
+    outcomes.hits = 0
@@ -0,0 +1,114 @@
+import functools
+import threading
+from collections import OrderedDict
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Serialized responses of the read endpoints, kept until a write changes
+# what they show.
+#
+# A cached route is keyed by its name and parameters and stores the final
+# JSON body, so a hit skips both the lookup and the serialization. Every
+# entry carries tags ("pets", "pet:{rfid}", ...) formatted from the route's
+# parameters; the write endpoints call invalidate() with the tags they touch
+# and only those entries are dropped. The least recently used entry is
+# evicted once MAX_ENTRIES are stored. Errors (HTTPException) are not cached.
+
+MAX_ENTRIES = 256
+
+_lock = threading.Lock()
+_entries: OrderedDict[tuple, tuple[bytes, tuple[str, ...]]] = OrderedDict()
+_tags: dict[str, set[tuple]] = {}
+_generation = 0   # bumped by every invalidation; a build that overlapped one is not stored
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_routes: dict[str, list[int]] = {}   # route -> [hits, misses]
+
+
+def _drop(key: tuple):
+    _, tags = _entries.pop(key)
+    for tag in tags:
+        keys = _tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _tags[tag]
+
+
+def _get(name: str, key: tuple) -> bytes | None:
+    with _lock:
+        counts = _routes.setdefault(name, [0, 0])
+        entry = _entries.get(key)
+        if entry is None:
+            counts[1] += 1
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        counts[0] += 1
+        _stats["hits"] += 1
+        return entry[0]
+
+
+def _put(key: tuple, body: bytes, tags: tuple[str, ...], generation: int):
+    with _lock:
+        if generation != _generation:
+            return
+        if key in _entries:
+            _drop(key)
+        _entries[key] = (body, tags)
+        for tag in tags:
+            _tags.setdefault(tag, set()).add(key)
+        while len(_entries) > MAX_ENTRIES:
+            _drop(next(iter(_entries)))
+            _stats["evictions"] += 1
+
+
+def cached(*tags: str):
+    """Caches a JSON route; tags may use the route's parameters, e.g. "pet:{rfid}"."""
+    def decorate(route):
+        name = route.__name__
+
+        @functools.wraps(route)
+        def wrapper(**params):
+            key = (name, tuple(sorted(params.items())))
+            body = _get(name, key)
+            if body is None:
+                generation = _generation
+                body = JSONResponse(jsonable_encoder(route(**params))).body
+                _put(key, body, tuple(tag.format(**params) for tag in tags), generation)
+            return Response(content=body, media_type="application/json")
+
+        return wrapper
+    return decorate
+
+
+def invalidate(*tags: str):
+    """Drops every entry carrying one of the tags."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for tag in tags:
+            for key in list(_tags.get(tag, ())):
+                _drop(key)
+                _stats["invalidations"] += 1
+
+
+def clear():
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _tags.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            "entries": len(_entries),
+            "capacity": MAX_ENTRIES,
+            **_stats,
+            "hitRate": round(_stats["hits"] / lookups, 3) if lookups else None,
+            "routes": {name: {"hits": h, "misses": m} for name, (h, m) in sorted(_routes.items())},
+        }
@@ -0,0 +1,128 @@
+from datetime import date, datetime, time, timedelta
+
+import datasets
+
+# Precomputed feeding eligibility per RFID, kept in datasets.schedule_states.
+#
+# A state describes the next window in which the pet may eat
+# ([nextEligible, eligibleUntil)) and the portion it gets there. It is
+# recomputed only when a feeding is confirmed, the schedule changes or the
+# window has passed, so feeding_check is one dict lookup and a comparison.
+#
+# Rules combined per schedule:
+#   timeWindow   minimum minutes between two feedings
+#   amount       default portion in grams
+#   dailyBudget  optional gram limit per calendar day
+#   meals        optional time-of-day windows, one portion each per day;
+#                without meals the whole day is one window
+
+
+def _new_state(day: date, last_feeding: datetime | None) -> dict:
+    return {
+        "day": day,
+        "consumed": 0.0,
+        "mealsUsed": [],
+        "lastFeeding": last_feeding,
+        "nextEligible": datetime.max,
+        "eligibleUntil": datetime.max,
+        "portion": 0.0,
+        "meal": None,
+        "seq": 0,          # feedings booked in the shared store (storage.RedisStore)
+    }
+
+
+def _roll_day(state: dict, now: datetime):
+    # Budget and meal slots reset at midnight
+    if state["day"] != now.date():
+        state["day"] = now.date()
+        state["consumed"] = 0.0
+        state["mealsUsed"] = []
+
+
+def _windows(schedule: dict, day: date):
+    """(meal index, start, end, portion) for the day, in time order."""
+    meals = schedule.get("meals") or []
+    if not meals:
+        start = datetime.combine(day, time.min)
+        yield None, start, start + timedelta(days=1), schedule["amount"]
+        return
+    for idx, meal in sorted(enumerate(meals), key=lambda m: m[1]["start"]):
+        yield (idx, datetime.combine(day, meal["start"]), datetime.combine(day, meal["end"]),
+               meal.get("amount") or schedule["amount"])
+
+
+def compute(schedule: dict, state: dict, now: datetime) -> dict:
+    """Fills in the next eligibility window of state for this schedule."""
+    _roll_day(state, now)
+    budget = schedule.get("dailyBudget")
+    earliest = datetime.min
+    if state["lastFeeding"] is not None:
+        earliest = state["lastFeeding"] + timedelta(minutes=int(schedule["timeWindow"]))
+
+    # Today with what is left, otherwise tomorrow with a fresh budget
+    for offset in (0, 1):
+        day = state["day"] + timedelta(days=offset)
+        used = state["mealsUsed"] if offset == 0 else []
+        remaining = float("inf") if budget is None else budget - (state["consumed"] if offset == 0 else 0)
+        for meal, start, end, portion in _windows(schedule, day):
+            if meal in used and meal is not None:
+                continue
+            portion = min(portion, remaining)
+            if portion <= 0:
+                break
+            begin = max(start, earliest, now if offset == 0 else start)
+            if begin < end:
+                state.update(nextEligible=begin, eligibleUntil=end, portion=portion, meal=meal)
+                return state
+
+    # Nothing within two days (e.g. zero budget): re-evaluate tomorrow
+    tomorrow = datetime.combine(state["day"] + timedelta(days=1), time.min)
+    state.update(nextEligible=datetime.max, eligibleUntil=tomorrow, portion=0.0, meal=None)
+    return state
+
+
+def refresh(schedule: dict, now: datetime) -> dict:
+    """(Re)builds the state for a schedule, keeping today's counters."""
+    rfid = schedule["rfid"]
+    state = datasets.schedule_states.get(rfid)
+    if state is None:
+        state = _new_state(now.date(), datasets.last_feedings.get(rfid))
+        datasets.schedule_states[rfid] = state
+    return compute(schedule, state, now)
+
+
+def check(schedule: dict, now: datetime) -> dict:
+    """Current state for the schedule's pet; recomputed only once its window has passed."""
+    state = datasets.schedule_states.get(schedule["rfid"])
+    if state is None or now >= state["eligibleUntil"]:
+        state = refresh(schedule, now)
+    return state
+
+
+def is_allowed(state: dict, now: datetime) -> bool:
+    return state["nextEligible"] <= now < state["eligibleUntil"]
+
+
+def record_feeding(schedule: dict, now: datetime) -> dict:
+    """Books the granted portion and precomputes the next window."""
+    # Use the window that was granted, even if it closed while the pet ate
+    state = datasets.schedule_states.get(schedule["rfid"]) or refresh(schedule, now)
+    _roll_day(state, now)
+    state["consumed"] += state["portion"]
+    if state["meal"] is not None:
+        state["mealsUsed"].append(state["meal"])
+    state["lastFeeding"] = now
+    return compute(schedule, state, now)
+
+
+def restore(schedule: dict, feeding: dict, now: datetime) -> dict:
+    """Rebuilds the state from a feeding record kept in the shared store."""
+    state = _new_state(feeding["day"], feeding["lastFeeding"])
+    state.update(consumed=feeding["consumed"], mealsUsed=list(feeding["mealsUsed"]), seq=feeding["seq"])
+    datasets.schedule_states[schedule["rfid"]] = state
+    return compute(schedule, state, now)
+
+
+def remaining_budget(schedule: dict, state: dict) -> float | None:
+    budget = schedule.get("dailyBudget")
+    return None if budget is None else max(0.0, budget - state["consumed"])
@@ -0,0 +1,168 @@
+import math
+from array import array
+from datetime import datetime
+
+import datasets
+
+# Fill level history and time-to-empty forecast per silo.
+#
+# Samples come from feeding_confirm (fill level in % and stock weight in g).
+# They are kept in three tiers, each delta-encoded in an int array:
+#   raw     last RAW_POINTS readings as received
+#   hourly  hour averages for HOURLY_POINTS hours
+#   daily   day averages for DAILY_POINTS days
+# Older points fall off the end of each tier. The consumption rate is an
+# exponentially weighted average updated as samples arrive, so /silo/forecast
+# never touches the history.
+
+RAW_POINTS = 256
+HOURLY_POINTS = 24 * 14
+DAILY_POINTS = 365
+
+RATE_HALF_LIFE = 3 * 86400   # seconds; how fast the rate follows a new habit
+RATE_MIN_SPAN = 600          # seconds between rate updates; readings closer together are merged
+REFILL_JUMP = 5.0            # fill level rising by more than this (%) is a refill
+
+_SCALE = (10, 10)            # percentage and weight stored in tenths
+
+
+class DeltaSeries:
+    """Bounded (timestamp, percentage, weight) series stored as deltas.
+
+    The first point is kept in full; every later one only as the difference
+    to its predecessor (seconds, 0.1 %, 0.1 g), which fits a signed int.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._base = None     # (t, p, w) of the oldest point, scaled ints
+        self._last = None     # (t, p, w) of the newest point, scaled ints
+        self._deltas = [array("i"), array("i"), array("i")]
+
+    def __len__(self) -> int:
+        return 0 if self._base is None else len(self._deltas[0]) + 1
+
+    def append(self, ts: float, percentage: float, weight: float):
+        point = (int(ts), round(percentage * _SCALE[0]), round(weight * _SCALE[1]))
+        if self._base is None:
+            self._base = self._last = point
+            return
+        for column, value, prev in zip(self._deltas, point, self._last):
+            column.append(value - prev)
+        self._last = point
+        if len(self) > self.capacity:
+            # Fold the oldest delta into the base
+            self._base = tuple(b + column.pop(0) for b, column in zip(self._base, self._deltas))
+
+    def points(self):
+        """Decoded (datetime, percentage, weight) tuples, oldest first."""
+        if self._base is None:
+            return
+        t, p, w = self._base
+        yield datetime.fromtimestamp(t), p / _SCALE[0], w / _SCALE[1]
+        for dt, dp, dw in zip(*self._deltas):
+            t, p, w = t + dt, p + dp, w + dw
+            yield datetime.fromtimestamp(t), p / _SCALE[0], w / _SCALE[1]
+
+
+class _Bucket:
+    """Running average of the samples in one hour/day."""
+
+    __slots__ = ("key", "start", "count", "percentage", "weight")
+
+    def __init__(self, key: int, start: float):
+        self.key = key
+        self.start = start
+        self.count = 0
+        self.percentage = 0.0
+        self.weight = 0.0
+
+    def add(self, percentage: float, weight: float):
+        self.count += 1
+        self.percentage += (percentage - self.percentage) / self.count
+        self.weight += (weight - self.weight) / self.count
+
+
+class SiloSeries:
+    def __init__(self):
+        self.raw = DeltaSeries(RAW_POINTS)
+        self.hourly = DeltaSeries(HOURLY_POINTS)
+        self.daily = DeltaSeries(DAILY_POINTS)
+        self._hour = None
+        self._day = None
+        self.last = None          # (ts, percentage, weight) of the newest sample
+        self._anchor = None       # (ts, percentage) the next rate sample is measured from
+        self.rate = None          # fill level drop in % per second
+        self.lastRefill = None
+
+    def _roll(self, bucket: _Bucket | None, key: int, ts: float, tier: DeltaSeries) -> _Bucket:
+        if bucket is not None and bucket.key != key:
+            tier.append(bucket.start, bucket.percentage, bucket.weight)
+            bucket = None
+        return bucket or _Bucket(key, ts)
+
+    def add(self, ts: float, percentage: float, weight: float):
+        self.raw.append(ts, percentage, weight)
+        self._hour = self._roll(self._hour, int(ts // 3600), ts, self.hourly)
+        self._hour.add(percentage, weight)
+        day = datetime.fromtimestamp(ts).date().toordinal()
+        self._day = self._roll(self._day, day, ts, self.daily)
+        self._day.add(percentage, weight)
+
+        if self.last is not None and percentage - self.last[1] > REFILL_JUMP:
+            self.lastRefill = ts
+            self._anchor = None
+        if self._anchor is None:
+            self._anchor = (ts, percentage)
+        else:
+            dt = ts - self._anchor[0]
+            if dt >= RATE_MIN_SPAN:
+                sample = max(self._anchor[1] - percentage, 0.0) / dt
+                if self.rate is None:
+                    self.rate = sample
+                else:
+                    # Time-weighted EWMA: a long gap counts more than a burst of readings
+                    alpha = 1 - math.exp(-dt * math.log(2) / RATE_HALF_LIFE)
+                    self.rate += alpha * (sample - self.rate)
+                self._anchor = (ts, percentage)
+        self.last = (ts, percentage, weight)
+
+    def tier(self, name: str) -> DeltaSeries:
+        return {"raw": self.raw, "hourly": self.hourly, "daily": self.daily}[name]
+
+
+def series(silo_id: int) -> SiloSeries:
+    entry = datasets.silo_series.get(silo_id)
+    if entry is None:
+        entry = datasets.silo_series[silo_id] = SiloSeries()
+    return entry
+
+
+def record(silo_id: int, percentage: float, weight: float, now: datetime):
+    series(silo_id).add(now.timestamp(), percentage, weight)
+
+
+def forecast(silo: dict) -> dict:
+    entry = datasets.silo_series.get(silo["id"])
+    result = {
+        "siloId": silo["id"],
+        "percentage": silo["percentage"],
+        "stockWeight": silo.get("stockWeight"),
+        "ratePerDay": None,
+        "hoursLeft": None,
+        "emptyAt": None,
+        "lastRefill": None,
+        "samples": 0,
+    }
+    if entry is None:
+        return result
+    result["samples"] = len(entry.raw)
+    if entry.lastRefill is not None:
+        result["lastRefill"] = datetime.fromtimestamp(entry.lastRefill)
+    if entry.rate:
+        ts, percentage, _ = entry.last
+        seconds_left = max(percentage, 0.0) / entry.rate
+        result["ratePerDay"] = round(entry.rate * 86400, 2)
+        result["hoursLeft"] = round(seconds_left / 3600, 1)
+        result["emptyAt"] = datetime.fromtimestamp(ts + seconds_left)
+    return result
@@ -0,0 +1,244 @@
+"""Fingerprinted, precompressed dashboard assets.
+
+    python static_assets.py            # dashboard/ -> dashboard_dist/
+
+The build copies every script and stylesheet to "<name>.<hash>.<ext>",
+points the pages at those names and writes a .gz (and .br, if the brotli
+package is installed) next to each file where that is smaller.
+Fingerprinted files never change, so they are served with a one-year
+immutable Cache-Control; pages keep their names and are revalidated with
+their ETag. Unchanged originals stay reachable under their plain names.
+
+DashboardFiles serves a build from memory. Without one (development) it
+runs the same build in memory at startup, so the source folder works as is.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+FINGERPRINTED = (".js", ".css")
+COMPRESSIBLE = (".html", ".js", ".css", ".json", ".svg", ".txt")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MANIFEST = "manifest.json"
+
+# Encodings by preference; the file suffix each variant is stored under
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+_REF = re.compile(r'''(?P<attr>\b(?:src|href)=["'])(?P<path>[^"':?#]+)(?P<end>["'?#])''')
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compress(name: str, data: bytes) -> dict[str, bytes]:
+    variants = {}
+    if not name.endswith(COMPRESSIBLE):
+        return variants
+    packed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(packed) < len(data):
+        variants["gzip"] = packed
+    if brotli is not None:
+        packed = brotli.compress(data, quality=11)
+        if len(packed) < len(data):
+            variants["br"] = packed
+    return variants
+
+
+def _fingerprint(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{_hash(data)[:10]}{ext}"
+
+
+def build(src: str) -> tuple[dict[str, bytes], dict[str, str]]:
+    """All output files (relative path -> content) and the manifest (original -> fingerprinted)."""
+    sources = _read_tree(src)
+    manifest = {name: _fingerprint(name, data) for name, data in sources.items() if name.endswith(FINGERPRINTED)}
+    out = {}
+    for name, data in sources.items():
+        if name.endswith(".html"):
+            base = os.path.dirname(name)
+
+            def rewrite(m):
+                target = os.path.normpath(os.path.join(base, m["path"].lstrip("/"))).replace(os.sep, "/")
+                if target not in manifest:
+                    return m[0]
+                prefix = "/" if m["path"].startswith("/") else ""
+                new = manifest[target] if prefix else os.path.relpath(manifest[target], base or ".")
+                return m["attr"] + prefix + new.replace(os.sep, "/") + m["end"]
+
+            data = _REF.sub(rewrite, data.decode("utf-8")).encode("utf-8")
+        out[name] = data
+        if name in manifest:
+            out[manifest[name]] = data
+    for name in list(out):
+        for encoding, variant in _compress(name, out[name]).items():
+            out[name + ENCODINGS[encoding]] = variant
+    out[MANIFEST] = json.dumps(manifest, indent=2, sort_keys=True).encode()
+    return out, manifest
+
+
+def write(files: dict[str, bytes], dest: str):
+    if os.path.isdir(dest):
+        shutil.rmtree(dest)
+    for name, data in files.items():
+        path = os.path.join(dest, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def _qvalues(header: str) -> dict[str, float]:
+    """Accept-Encoding as {coding: q}; unparsable weights count as 0."""
+    ranks = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranks[coding] = q
+    return ranks
+
+
+def _negotiate(header: str, available) -> str:
+    """The variant with the highest q in Accept-Encoding; ties go by ENCODINGS order, then identity."""
+    ranks = _qvalues(header)
+    other = ranks.get("*", 0.0)
+    candidates = [(e, ranks.get(e, other)) for e in ENCODINGS if e in available]
+    candidates.append(("identity", ranks.get("identity", 0.001)))  # unlisted: acceptable, but last
+    encoding, q = max(candidates, key=lambda c: c[1])  # first of the best
+    return encoding if q > 0 else "identity"  # nothing acceptable: identity rather than a 406
+
+
+def _read_tree(root: str) -> dict[str, bytes]:
+    files = {}
+    for base, _, names in os.walk(root):
+        for file in names:
+            path = os.path.join(base, file)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return files
+
+
+class _Asset:
+    __slots__ = ("variants", "etag", "media_type", "cache")
+
+    def __init__(self, variants: dict, etag: str, media_type: str, cache: str):
+        self.variants = variants      # encoding ("identity", "gzip", "br") -> bytes
+        self.etag = etag
+        self.media_type = media_type
+        self.cache = cache
+
+
+class DashboardFiles:
+    """ASGI app serving the dashboard build from memory.
+
+    Picks br or gzip by Accept-Encoding q-value, answers If-None-Match with 304,
+    and falls back to "<path>.html" and "index.html" like StaticFiles(html=True).
+    """
+
+    def __init__(self, directory: str = "dashboard", dist: str = "dashboard_dist"):
+        if os.path.isfile(os.path.join(dist, MANIFEST)):
+            files = _read_tree(dist)
+            manifest = json.loads(files[MANIFEST])
+        else:
+            files, manifest = build(directory)
+        immutable = set(manifest.values())
+        self.assets = {}
+        for name, data in files.items():
+            if name == MANIFEST or name.endswith(tuple(ENCODINGS.values())):
+                continue
+            variants = {"identity": data}
+            for encoding, suffix in ENCODINGS.items():
+                if name + suffix in files:
+                    variants[encoding] = files[name + suffix]
+            media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            self.assets[name] = _Asset(variants, _hash(data)[:16], media_type,
+                                       IMMUTABLE if name in immutable else REVALIDATE)
+
+    def _find(self, path: str) -> _Asset | None:
+        name = path.strip("/")
+        for candidate in (name, f"{name}.html", f"{name}/index.html".lstrip("/")):
+            asset = self.assets.get(candidate)
+            if asset is not None:
+                return asset
+        return None
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._respond(send, 405, [(b"allow", b"GET, HEAD")], b"")
+            return
+        asset = self._find(scope["path"])
+        if asset is None:
+            page = self.assets.get("404.html")
+            media_type = page.media_type if page else "text/plain; charset=utf-8"
+            await self._respond(send, 404, [(b"content-type", media_type.encode())],
+                                page.variants["identity"] if page else b"Not Found")
+            return
+
+        headers = dict(scope["headers"])
+        accepted = headers.get(b"accept-encoding", b"").decode("latin-1")
+        encoding = _negotiate(accepted, asset.variants)
+        etag = f'"{asset.etag}-{encoding}"' if encoding != "identity" else f'"{asset.etag}"'
+        common = [
+            (b"etag", etag.encode()),
+            (b"cache-control", asset.cache.encode()),
+            (b"vary", b"Accept-Encoding"),
+        ]
+        match = headers.get(b"if-none-match", b"").decode("latin-1")
+        if match == "*" or etag in (t.strip().removeprefix("W/") for t in match.split(",")):
+            await self._respond(send, 304, common, b"")
+            return
+
+        body = asset.variants[encoding]
+        common.append((b"content-type", asset.media_type.encode()))
+        if encoding != "identity":
+            common.append((b"content-encoding", encoding.encode()))
+        await self._respond(send, 200, common, b"" if scope["method"] == "HEAD" else body, len(body))
+
+    @staticmethod
+    async def _respond(send, status: int, headers: list, body: bytes, length: int | None = None):
+        if status != 304:
+            headers = headers + [(b"content-length", str(len(body) if length is None else length).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--src", default="dashboard")
+    parser.add_argument("--dest", default="dashboard_dist")
+    args = parser.parse_args(argv)
+    files, manifest = build(args.src)
+    write(files, args.dest)
+    for original, fingerprinted in sorted(manifest.items()):
+        print(f"{original:28} -> {fingerprinted}")
+    if brotli is None:
+        print("brotli not installed: gzip variants only")
+    print(f"{len(files)} files written to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
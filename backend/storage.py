@@ -0,0 +1,301 @@
+import json
+import os
+import threading
+from datetime import date, datetime
+
+import dashboard_view
+import datasets
+import models
+import response_cache
+import schedule_engine
+
+try:
+    import redis
+except ImportError:  # optional: single process only
+    redis = None
+
+# Where pets, schedules, feedings and unknown tags are shared when the
+# backend runs as more than one process (uvicorn workers, Fly machines).
+#
+# The route handlers keep working on the datasets globals and hand every
+# write to the store as well. MemoryStore, the default, does nothing more:
+# one process is its own source of truth. RedisStore writes the records to
+# Redis (or anything speaking its protocol) and bumps a revision per
+# collection; before each request sync() compares the revisions in one
+# round trip and reloads the collections another process changed.
+#
+# Feeding eligibility is still computed locally by schedule_engine, from a
+# per-pet feeding record (seq, last feeding, today's grams and meals) kept
+# in the store. A grant is only given if reserve() confirms, in one script
+# on the server, that no feeding was booked since the state was computed
+# and that no other feeder holds an unconfirmed grant for the pet;
+# record_feeding() books the reserved portion and returns the new record.
+# Two instances can therefore never both grant the same window.
+#
+# Silo levels, analytics, alerts, telemetry and device logs are still kept
+# per process; the device event feed moves to the same server (events.py,
+# EventHub.share()). Timers that every process arms (hunger alerts) take a
+# claim() before they act, so only one of them does.
+#
+#     STORAGE_URL=memory                        (default)
+#     STORAGE_URL=redis://localhost:6379/0
+#     STORAGE_URL=fakeredis://                  (in-process stand-in, needs fakeredis)
+
+PREFIX = "nexani:"
+KINDS = ("pets", "schedules", "feedings", "unknown")
+RESERVE_TTL_MS = 10 * 60 * 1000   # a granted portion not confirmed by then is released
+
+_MODELS = {"pets": models.Pet, "schedules": models.FeedingSchedule}
+
+# Adds records to a hash unless one of the keys exists; returns the first clash
+_ADD = """
+for i = 2, #ARGV, 2 do
+  if redis.call('HEXISTS', KEYS[1], ARGV[i]) == 1 then return ARGV[i] end
+end
+for i = 2, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+return false
+"""
+
+# Holds the grant if the pet's feeding seq is still the one the state was built from
+# and no other holder (ARGV[5], the feeder) has an unconfirmed grant; the holder's
+# own repeated check renews it
+_RESERVE = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+local seq = raw and cjson.decode(raw).seq or 0
+if seq ~= tonumber(ARGV[2]) then return 0 end
+local held = redis.call('GET', KEYS[2])
+if held and cjson.decode(held).holder ~= ARGV[5] then return 0 end
+redis.call('SET', KEYS[2], ARGV[3], 'PX', ARGV[4])
+return 1
+"""
+
+# Drops the grant if ARGV[1] holds it
+_RELEASE = """
+local held = redis.call('GET', KEYS[1])
+if held and cjson.decode(held).holder == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+# Books the reserved grant (or ARGV[4] without one) and returns the new feeding record
+_RECORD = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+local feeding = raw and cjson.decode(raw) or {seq = 0, consumed = 0, mealsUsed = {}}
+local grant = cjson.decode(redis.call('GET', KEYS[2]) or ARGV[4])
+if feeding.day ~= ARGV[3] then
+  feeding.day = ARGV[3]
+  feeding.consumed = 0
+  feeding.mealsUsed = {}
+end
+feeding.consumed = feeding.consumed + grant.portion
+if grant.meal ~= cjson.null then table.insert(feeding.mealsUsed, grant.meal) end
+feeding.seq = feeding.seq + 1
+feeding.lastFeeding = ARGV[2]
+raw = cjson.encode(feeding)
+redis.call('HSET', KEYS[1], ARGV[1], raw)
+redis.call('DEL', KEYS[2])
+redis.call('HINCRBY', KEYS[3], 'feedings', 1)
+return raw
+"""
+
+_DROP_UNKNOWN = """
+local kept = {}
+for _, raw in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+  if cjson.decode(raw).rfid ~= ARGV[1] then table.insert(kept, raw) end
+end
+redis.call('DEL', KEYS[1])
+for i = 1, #kept, 1000 do  -- in chunks: unpack() is limited to a few thousand values
+  redis.call('RPUSH', KEYS[1], unpack(kept, i, math.min(i + 999, #kept)))
+end
+redis.call('HINCRBY', KEYS[2], 'unknown', 1)
+"""
+
+
+def _grant(state: dict, holder: str | None = None) -> str:
+    return json.dumps({"portion": state["portion"], "meal": state["meal"], "holder": holder})
+
+
+def _feeding(raw: str) -> dict:
+    feeding = json.loads(raw)
+    return {
+        "seq": feeding["seq"],
+        "lastFeeding": datetime.fromisoformat(feeding["lastFeeding"]),
+        "day": date.fromisoformat(feeding["day"]),
+        "consumed": feeding["consumed"],
+        "mealsUsed": feeding["mealsUsed"] or [],   # an empty Lua table comes back as {}
+    }
+
+
+class MemoryStore:
+    """The datasets globals themselves; correct for a single process only."""
+
+    shared = False
+
+    def sync(self) -> set[str]:
+        return set()
+
+    def add(self, kind: str, records: list[dict]) -> str | None:
+        return None
+
+    def put(self, kind: str, records: list[dict]):
+        pass
+
+    def remove(self, kind: str, key: str):
+        pass
+
+    def add_unknown(self, event: dict):
+        pass
+
+    def drop_unknown(self, rfid: str):
+        pass
+
+    def reserve(self, schedule: dict, state: dict, holder: str) -> bool:
+        return True
+
+    def claim(self, name: str, ttl_ms: int) -> bool:
+        return True
+
+    def release(self, rfid: str, holder: str):
+        pass
+
+    def record_feeding(self, schedule: dict, now: datetime) -> dict:
+        return schedule_engine.record_feeding(schedule, now)
+
+
+class RedisStore:
+    """Records in Redis, shared by every process using the same server and prefix."""
+
+    shared = True
+
+    def __init__(self, client, prefix: str = PREFIX):
+        self.redis = client
+        self.prefix = prefix
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._add = client.register_script(_ADD)
+        self._reserve = client.register_script(_RESERVE)
+        self._release = client.register_script(_RELEASE)
+        self._record = client.register_script(_RECORD)
+        self._drop_unknown = client.register_script(_DROP_UNKNOWN)
+
+    def _key(self, name: str) -> str:
+        return self.prefix + name
+
+    # ----------- writes -----------
+
+    def add(self, kind: str, records: list[dict]) -> str | None:
+        """Stores new records; returns the first RFID that already exists (nothing stored then)."""
+        args = [kind]
+        for record in records:
+            args += [record["rfid"], _MODELS[kind](**record).model_dump_json()]
+        return self._add(keys=[self._key(kind), self._key("rev")], args=args)
+
+    def put(self, kind: str, records: list[dict]):
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key(kind), mapping={r["rfid"]: _MODELS[kind](**r).model_dump_json() for r in records})
+        pipe.hincrby(self._key("rev"), kind, 1)
+        pipe.execute()
+
+    def remove(self, kind: str, key: str):
+        pipe = self.redis.pipeline()
+        pipe.hdel(self._key(kind), key)
+        pipe.hincrby(self._key("rev"), kind, 1)
+        pipe.execute()
+
+    def add_unknown(self, event: dict):
+        pipe = self.redis.pipeline()
+        pipe.rpush(self._key("unknown"), json.dumps({"rfid": event["rfid"],
+                                                     "timestamp": event["timestamp"].isoformat()}))
+        pipe.hincrby(self._key("rev"), "unknown", 1)
+        pipe.execute()
+
+    def drop_unknown(self, rfid: str):
+        self._drop_unknown(keys=[self._key("unknown"), self._key("rev")], args=[rfid])
+
+    # ----------- feedings -----------
+
+    def reserve(self, schedule: dict, state: dict, holder: str) -> bool:
+        """Holds the state's grant for holder (the feeder); False if a feeding was booked
+        elsewhere since it was computed or another feeder holds a grant for the pet."""
+        rfid = schedule["rfid"]
+        return bool(self._reserve(keys=[self._key("feedings"), self._key(f"reserved:{rfid}")],
+                                  args=[rfid, state["seq"], _grant(state, holder), RESERVE_TTL_MS, holder]))
+
+    def release(self, rfid: str, holder: str):
+        """Drops holder's grant for the pet without booking it (nothing was dispensed)."""
+        self._release(keys=[self._key(f"reserved:{rfid}")], args=[holder])
+
+    def claim(self, name: str, ttl_ms: int) -> bool:
+        """True for the first process to claim name within ttl_ms."""
+        return bool(self.redis.set(self._key(f"claim:{name}"), "1", nx=True, px=ttl_ms))
+
+    def record_feeding(self, schedule: dict, now: datetime) -> dict:
+        rfid = schedule["rfid"]
+        state = datasets.schedule_states.get(rfid) or schedule_engine.refresh(schedule, now)
+        raw = self._record(keys=[self._key("feedings"), self._key(f"reserved:{rfid}"), self._key("rev")],
+                           args=[rfid, now.isoformat(), now.date().isoformat(), _grant(state)])
+        return schedule_engine.restore(schedule, _feeding(raw), now)
+
+    # ----------- reads -----------
+
+    def sync(self) -> set[str]:
+        """Reloads the collections changed by any process since the last call."""
+        with self._lock:
+            revisions = self.redis.hgetall(self._key("rev"))
+            changed = {kind for kind in KINDS if revisions.get(kind) != self._seen.get(kind)}
+            if changed:
+                self._load(changed)
+                self._seen = revisions
+        return changed
+
+    def _load(self, changed: set[str]):
+        pipe = self.redis.pipeline(transaction=False)
+        for kind in ("pets", "schedules"):
+            pipe.hvals(self._key(kind))
+        pipe.hgetall(self._key("feedings"))
+        pipe.lrange(self._key("unknown"), 0, -1)
+        pets, schedules, feedings, unknown = pipe.execute()
+        now = datetime.now()
+
+        if "pets" in changed:
+            stale = [f"pet:{p['rfid']}" for p in datasets.pets]
+            datasets.pets = sorted((models.Pet.model_validate_json(v).model_dump() for v in pets),
+                                   key=lambda p: p["rfid"])
+            response_cache.invalidate("pets", *stale, *(f"pet:{p['rfid']}" for p in datasets.pets))
+        if "schedules" in changed:
+            datasets.feeding_schedules = sorted(
+                (models.FeedingSchedule.model_validate_json(v).model_dump() for v in schedules),
+                key=lambda s: s["rfid"])
+            for schedule in datasets.feeding_schedules:
+                schedule_engine.refresh(schedule, now)
+            response_cache.invalidate("schedules")
+        if "feedings" in changed:
+            by_rfid = {s["rfid"]: s for s in datasets.feeding_schedules}
+            for rfid, raw in feedings.items():
+                feeding = _feeding(raw)
+                datasets.last_feedings[rfid] = feeding["lastFeeding"]
+                state = datasets.schedule_states.get(rfid)
+                if rfid in by_rfid and (state is None or state["seq"] != feeding["seq"]):
+                    schedule_engine.restore(by_rfid[rfid], feeding, now)
+        if "unknown" in changed:
+            datasets.unknown_rfid_events = [
+                {"rfid": e["rfid"], "timestamp": datetime.fromisoformat(e["timestamp"])}
+                for e in map(json.loads, unknown)
+            ]
+        dashboard_view.touch()
+
+
+def open_store(url: str):
+    if url in ("", "memory"):
+        return MemoryStore()
+    if url.startswith("fakeredis://"):
+        import fakeredis
+        return RedisStore(fakeredis.FakeRedis(decode_responses=True))
+    if redis is None:
+        raise RuntimeError("STORAGE_URL needs the redis package")
+    return RedisStore(redis.Redis.from_url(url, decode_responses=True))
+
+
+store = open_store(os.environ.get("STORAGE_URL", "memory"))
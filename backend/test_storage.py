@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import device_auth
+import storage
+from events import EventHub
+
+STATE = {"seq": 0, "portion": 20.0, "meal": None}
+SCHEDULE = {"rfid": "a1b2c3"}
+
+
+def _stores(count: int) -> list:
+    # Separate clients on one server, like two backend instances
+    server = fakeredis.FakeServer()
+    return [storage.RedisStore(fakeredis.FakeRedis(server=server, decode_responses=True)) for _ in range(count)]
+
+
+def test_concurrent_reservers_get_one_grant():
+    stores = _stores(2)
+    start = threading.Barrier(len(stores))
+    results = {}
+
+    def reserve(i: int):
+        start.wait()
+        results[i] = stores[i].reserve(SCHEDULE, STATE, f"feeder-{i}")
+
+    threads = [threading.Thread(target=reserve, args=(i,)) for i in range(len(stores))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results.values()) == [False, True]
+
+
+def test_holder_renews_its_own_grant():
+    a, b = _stores(2)
+    assert a.reserve(SCHEDULE, STATE, "feeder-1")
+    assert b.reserve(SCHEDULE, STATE, "feeder-1")
+    assert not b.reserve(SCHEDULE, STATE, "feeder-2")
+
+
+def test_stale_seq_is_refused():
+    (a,) = _stores(1)
+    assert not a.reserve(SCHEDULE, {**STATE, "seq": 1}, "feeder-1")
+
+
+def test_drop_unknown_keeps_other_tags():
+    (a,) = _stores(1)
+    # More entries than Lua's unpack() takes at once
+    for i in range(16000):
+        a.add_unknown({"rfid": "dead" if i % 2 else f"tag{i}", "timestamp": datetime(2026, 1, 1)})
+    a.drop_unknown("dead")
+    left = a.redis.lrange(a._key("unknown"), 0, -1)
+    assert len(left) == 8000
+    assert '"dead"' not in "".join(left)
+
+
+def test_event_feed_is_shared():
+    hubs = [EventHub(retain=2) for _ in range(2)]
+    for hub, store in zip(hubs, _stores(2)):
+        hub.share(store.redis, store.prefix)
+    try:
+        a, b = hubs
+        assert a.epoch == b.epoch
+        seq = a.publish("command", {"command": "reboot"}, device="feeder-1")
+        events, reset, last = b.since(seq - 1, "feeder-1", b.epoch)
+        assert not reset and last == seq
+        assert [e["data"] for e in events] == [{"command": "reboot"}]
+        for _ in range(2):
+            b.publish("pet.deleted", {"rfid": "a1b2c3"})
+        assert a.since(seq - 1, "feeder-1", a.epoch)[1]  # trimmed away
+    finally:
+        for hub in hubs:
+            hub.close()
+
+
+def test_replay_is_refused_by_every_process():
+    filters = [device_auth.ReplayFilter(bits=1 << 10) for _ in range(2)]
+    for replays, store in zip(filters, _stores(2)):
+        replays.share(store.redis, store.prefix)
+    digest = bytes(range(32))
+    assert not filters[0].seen(digest)
+    assert filters[1].seen(digest)
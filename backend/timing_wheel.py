@@ -0,0 +1,110 @@
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ("expires", "callback", "args", "slot")
+
+    def __init__(self, expires: int, callback, args: tuple):
+        self.expires = expires    # absolute tick
+        self.callback = callback
+        self.args = args
+        self.slot = None          # dict the timer currently sits in, None once fired/cancelled
+
+
+class TimingWheel:
+    """Hierarchical hashed timing wheel.
+
+    Level 0 has one slot per tick, every higher level covers `slots` times
+    the range of the one below. A timer is hashed into the lowest level
+    whose range reaches its expiry and moves down a level ("cascades") when
+    that slot comes around, so insert and cancel are O(1) no matter how
+    many timers are pending. With the defaults (1 s tick, 64 slots, 4
+    levels) timers can be up to ~194 days out; later ones are parked in the
+    top level and re-hashed until they fit.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 4):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.levels = levels
+        self.current = 0
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _place(self, timer: Timer):
+        delta = timer.expires - self.current
+        if delta < 0:
+            timer.expires = self.current
+            delta = 0
+        for level in range(self.levels):
+            if delta < 1 << (self.bits * (level + 1)) or level == self.levels - 1:
+                if delta >= 1 << (self.bits * (level + 1)):
+                    # Beyond the top level: park in the slot just before "now" on the top level
+                    idx = ((self.current >> (self.bits * level)) - 1) & self.mask
+                else:
+                    idx = (timer.expires >> (self.bits * level)) & self.mask
+                slot = self._wheels[level][idx]
+                slot[id(timer)] = timer
+                timer.slot = slot
+                return
+
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        """Runs callback(*args) after delay seconds (rounded up to whole ticks)."""
+        ticks = max(1, -int(-delay // self.tick))
+        with self._lock:
+            timer = Timer(self.current + ticks, callback, args)
+            self._place(timer)
+            self._count += 1
+        return timer
+
+    def cancel(self, timer: Timer | None) -> bool:
+        if timer is None:
+            return False
+        with self._lock:
+            if timer.slot is None:
+                return False
+            del timer.slot[id(timer)]
+            timer.slot = None
+            self._count -= 1
+            return True
+
+    def advance(self, ticks: int = 1) -> int:
+        """Moves time forward and runs every timer that expired; returns how many ran."""
+        fired = 0
+        for _ in range(ticks):
+            with self._lock:
+                self.current += 1
+                # Cascade higher levels whose slot boundary we just crossed
+                for level in range(1, self.levels):
+                    if (self.current >> (self.bits * (level - 1))) & self.mask:
+                        break
+                    idx = (self.current >> (self.bits * level)) & self.mask
+                    slot = self._wheels[level][idx]
+                    pending = list(slot.values())
+                    slot.clear()
+                    for timer in pending:
+                        self._place(timer)
+                slot = self._wheels[0][self.current & self.mask]
+                due = [t for t in slot.values() if t.expires <= self.current]
+                for timer in due:
+                    del slot[id(timer)]
+                    timer.slot = None
+                self._count -= len(due)
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    # One failing job must not take the others in this slot down
+                    log.exception("timer callback %r failed", timer.callback)
+            fired += len(due)
+        return fired